@@ -10,8 +10,8 @@ from sqlalchemy import text
 from dbd.log.dbd_exception import DbdException
 from dbd.config.dbd_profile import DbdProfile
 from dbd.config.dbd_project import DbdProject
-from dbd.executors.model_executor import ModelExecutor, InvalidModelException
 from dbd.log.dbd_logger import setup_logging
+from dbd.utils.profiling_utils import StatementTimer
 
 log = logging.getLogger(__name__)
 
@@ -114,9 +114,19 @@ def init(dbd, dest):
 @click.option('--only', envvar='DBD_ONLY', default=None, help='Comma separated list of fully qualified table names '
                                                               '(<schema>.<table-name-no suffix>) to execute.')
 @click.option('--deps/--no-deps', envvar='DBD_DEPS', default=True, help='Ignores dependencies for the --only list.')
+@click.option('--jobs', envvar='DBD_JOBS', default=1, type=click.IntRange(min=1),
+              help='Number of independent tasks executed in parallel.')
+@click.option('--full-refresh', envvar='DBD_FULL_REFRESH', is_flag=True, default=False,
+              help='Executes all tasks, including the tasks whose inputs did not change since the last run.')
+@click.option('--report', envvar='DBD_REPORT', default=None,
+              help='JSON file that the run report (wall time, rows, and bytes of each task phase) is written to.')
+@click.option('--sql-timing', envvar='DBD_SQL_TIMING', is_flag=True, default=False,
+              help='Measures the executed SQL statements and prints the slowest ones at the end of the run.')
 @click.argument('dest', required=False, default='.')
 @click.pass_obj
-def run(dbd, only, deps, dest):
+def run(dbd, only, deps, jobs, full_refresh, report, sql_timing, dest):
+    # the model executor (pandas etc.) is loaded only by the commands that need it
+    from dbd.executors.model_executor import ModelExecutor, InvalidModelException
     try:
         log.debug("Loading configuration.")
         prf = DbdProfile.load(os.path.join('.', dbd.profile()))
@@ -124,7 +134,8 @@ def run(dbd, only, deps, dest):
         log.debug("Creating model.")
         model = ModelExecutor(prj)
         log.debug("Connecting database.")
-        engine = prj.alchemy_engine_from_project()
+        statement_timer = StatementTimer() if sql_timing else None
+        engine = prj.alchemy_engine_from_project(statement_timer)
 #       engine.execution_options(supports_statement_cache=False)
         log.debug("Executing model.")
         if not deps and only is None:
@@ -133,12 +144,14 @@ def run(dbd, only, deps, dest):
         if only is not None:
             only_list = only.split(',')
             try:
-                model.execute(engine, only_list, deps)
+                model.execute(engine, only_list, deps, jobs=jobs, full_refresh=full_refresh, report_file=report,
+                              statement_timer=statement_timer)
             except InvalidModelException as e:
                 log.error(f"Can't run {only_list}: {e}")
                 raise DbdException(f"Can't run {only_list}: {e}")
         else:
-            model.execute(engine)
+            model.execute(engine, jobs=jobs, full_refresh=full_refresh, report_file=report,
+                          statement_timer=statement_timer)
         log.debug("Finished.")
         click.echo("All tasks finished!")
     except DbdException as d:
@@ -149,6 +162,7 @@ def run(dbd, only, deps, dest):
 @click.argument('dest', required=False, default='.')
 @click.pass_obj
 def validate(dbd, dest):
+    from dbd.executors.model_executor import ModelExecutor
     try:
         prf = DbdProfile.load(os.path.join('.', dbd.profile()))
         prj = DbdProject.load(prf, os.path.join(dest, dbd.project()))
@@ -8,9 +8,11 @@ from sqlalchemy import event
 from sqlalchemy.engine import Engine
 import yaml
 from sqlalchemy import engine_from_config
+from sqlalchemy.util import asbool
 
 from dbd.log.dbd_exception import DbdException
 from dbd.utils.jinja_utils import apply_template
+from dbd.utils.profiling_utils import StatementTimer
 
 log = logging.getLogger(__name__)
 
@@ -18,6 +20,9 @@ ENV_VARS = {key: str(value) for key, value in os.environ.items()}
 
 CONFIG_PREFIX = 'db.'
 
+# connection pool parameters that SQLAlchemy engine_from_config doesn't convert from strings
+POOL_BOOLEAN_PARAMETERS = ['pool_pre_ping']
+
 DbdProfileType = TypeVar('DbdProfileType', bound='DbdProfile')
 
 
@@ -90,10 +95,11 @@ class DbdProfile:
                 raise DbdProfileConfigException(
                     f"Your dbd profile '{self.__profile_file}' doesn't contain 'storages' key.")
 
-    def alchemy_engine_from_profile(self, connection_name: str) -> Engine:
+    def alchemy_engine_from_profile(self, connection_name: str, statement_timer: StatementTimer = None) -> Engine:
         """
         Returns SQLAlchemy engine initialized from profile
         :param str connection_name: connection name
+        :param StatementTimer statement_timer: if set, the engine's SQL statements are measured by the timer
         :return: SQLAlchemy engine initialized from profile
         :rtype: sqlalchemy.engine.Engine
         """
@@ -101,12 +107,18 @@ class DbdProfile:
         if connection_name in databases:
             try:
                 log.debug(f"Connecting to database '{connection_name}'")
-                engine = engine_from_config(databases.get(connection_name), prefix=CONFIG_PREFIX)
+                config = dict(databases.get(connection_name))
+                for parameter in POOL_BOOLEAN_PARAMETERS:
+                    if f"{CONFIG_PREFIX}{parameter}" in config:
+                        config[f"{CONFIG_PREFIX}{parameter}"] = asbool(config[f"{CONFIG_PREFIX}{parameter}"])
+                engine = engine_from_config(config, prefix=CONFIG_PREFIX)
 
                 if engine.dialect.name == 'mysql':
                     event.listen(engine, 'connect', self.__connect_listener_mysql, insert=True)
                 if engine.dialect.name == 'snowflake':
                     event.listen(engine, 'connect', self.__connect_listener_snowflake, insert=True)
+                if statement_timer is not None:
+                    statement_timer.attach(engine)
 
                 return engine
             except Exception as e:
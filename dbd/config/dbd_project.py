@@ -7,12 +7,19 @@ import yaml
 
 from dbd.config.dbd_profile import DbdProfile
 from dbd.log.dbd_exception import DbdException
+from dbd.utils.download_cache import DownloadCache, DEFAULT_DOWNLOAD_CACHE_SIZE_MB, default_cache_directory
+from dbd.utils.download_manager import DEFAULT_DOWNLOAD_WORKERS
 from dbd.utils.jinja_utils import apply_template
+from dbd.utils.profiling_utils import StatementTimer
 
 ENV_VARS = {key: str(value) for key, value in os.environ.items()}
 
 DbdProjectType = TypeVar('DbdProjectType', bound='DbdProject')
 
+DEFAULT_RUN_STATE_FILE = os.path.join('.dbd', 'run_state.json')
+DEFAULT_METADATA_SNAPSHOT_FILE = os.path.join('.dbd', 'metadata_snapshot.pickle')
+DEFAULT_MODEL_CACHE_FILE = os.path.join('.dbd', 'model_cache.json')
+
 
 class DbdProjectConfigException(DbdException):
     pass
@@ -54,14 +61,15 @@ class DbdProject:
         raise DbdProjectConfigException(
             f"Can't find DBD project file. Searched the current dir and your home dir for '{project_file_name_path}'")
 
-    def alchemy_engine_from_project(self) -> sqlalchemy.engine.Engine:
+    def alchemy_engine_from_project(self, statement_timer: StatementTimer = None) -> sqlalchemy.engine.Engine:
         """
         Returns SQLAlchemy engine initialized from project parameters
+        :param StatementTimer statement_timer: if set, the engine's SQL statements are measured by the timer
         :return: SQLAlchemy engine initialized from project parameters
         :rtype: sqlalchemy.engine.Engine
         """
         if self.__config is not None and 'database' in self.__config:
-            return self.__profile.alchemy_engine_from_profile(self.__config.get('database'))
+            return self.__profile.alchemy_engine_from_profile(self.__config.get('database'), statement_timer)
         else:
             raise DbdProjectConfigException(f"Project file '{self.__project_directory}{os.sep}{self.__project_file}' "
                                             f"doesn't contain 'database' key.")
@@ -97,6 +105,78 @@ class DbdProject:
                                                 f"in your profile file '{self.__profile.profile_path()}'.")
         return None
 
+    def sqlite_pragmas_from_project(self) -> Dict[str, Any]:
+        """
+        Returns SQLite PRAGMAs that dbd sets when loading data to SQLite
+        :return: PRAGMA names and values e.g. dict(journal_mode='WAL', synchronous='NORMAL')
+        :rtype: Dict[str, Any]
+        """
+        sqlite_pragmas = self.__config.get('sqlite_pragmas')
+        if sqlite_pragmas is not None and not isinstance(sqlite_pragmas, dict):
+            raise DbdProjectConfigException(f"The 'sqlite_pragmas' parameter in your project file "
+                                            f"'{self.__project_file}' must be a dictionary.")
+        return sqlite_pragmas
+
+    def download_workers_from_project(self) -> int:
+        """
+        Returns maximal number of concurrent downloads
+        :return: maximal number of concurrent downloads
+        :rtype: int
+        """
+        download_workers = self.__config.get('download_workers', DEFAULT_DOWNLOAD_WORKERS)
+        if not isinstance(download_workers, int) or download_workers < 1:
+            raise DbdProjectConfigException(f"The 'download_workers' parameter in your project file "
+                                            f"'{self.__project_file}' must be a positive integer.")
+        return download_workers
+
+    def download_cache_from_project(self) -> DownloadCache:
+        """
+        Returns persistent download cache initialized from project
+        :return: download cache or None if the 'download_cache' parameter is false
+        :rtype: DownloadCache
+        """
+        if not self.__config.get('download_cache', True):
+            return None
+        cache_directory = self.__config.get('cache_directory')
+        cache_directory = os.path.join(self.__project_directory, os.path.expanduser(cache_directory)) \
+            if cache_directory is not None else default_cache_directory()
+        cache_size = self.__config.get('download_cache_size', DEFAULT_DOWNLOAD_CACHE_SIZE_MB)
+        if not isinstance(cache_size, int) or cache_size < 0:
+            raise DbdProjectConfigException(f"The 'download_cache_size' parameter in your project file "
+                                            f"'{self.__project_file}' must be a non-negative integer (megabytes).")
+        return DownloadCache(os.path.normpath(cache_directory), cache_size)
+
+    def run_state_file_from_project(self) -> str:
+        """
+        Returns run state manifest file that stores hashes of the executed tasks' inputs
+        :return: run state manifest file
+        :rtype: str
+        """
+        run_state_file = self.__config.get('run_state_file', DEFAULT_RUN_STATE_FILE)
+        return os.path.normpath(os.path.join(self.__project_directory, os.path.expanduser(run_state_file)))
+
+    def model_cache_file_from_project(self) -> str:
+        """
+        Returns file that caches the parsed model files
+        :return: model cache file or None if the 'model_cache' parameter isn't true
+        :rtype: str
+        """
+        if not self.__config.get('model_cache', False):
+            return None
+        model_cache_file = self.__config.get('model_cache_file', DEFAULT_MODEL_CACHE_FILE)
+        return os.path.normpath(os.path.join(self.__project_directory, os.path.expanduser(model_cache_file)))
+
+    def metadata_snapshot_file_from_project(self) -> str:
+        """
+        Returns file that stores the snapshot of the reflected database metadata
+        :return: metadata snapshot file or None if the 'metadata_snapshot' parameter isn't true
+        :rtype: str
+        """
+        if not self.__config.get('metadata_snapshot', False):
+            return None
+        snapshot_file = self.__config.get('metadata_snapshot_file', DEFAULT_METADATA_SNAPSHOT_FILE)
+        return os.path.normpath(os.path.join(self.__project_directory, os.path.expanduser(snapshot_file)))
+
     def profile(self) -> DbdProfile:
         """
         Returns associated profile
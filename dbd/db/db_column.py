@@ -122,7 +122,8 @@ class DbColumn:
                 'unique': {'type': 'boolean'},
                 'index': {'type': 'boolean'},
                 'default': {'type': ['string', 'boolean', 'date', 'datetime', 'float', 'integer', 'number']},
-                'foreign_keys': {'type': 'list'}
+                'foreign_keys': {'type': 'list'},
+                'format': {'type': 'string'}
             })
         validation_result = column_validator.validate(column_code)
         if not validation_result:
@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+import sqlalchemy.engine
+
+
+@contextmanager
+def connection_scope(alchemy_engine: sqlalchemy.engine.Engine,
+                     connection: sqlalchemy.engine.Connection = None) -> Iterator[sqlalchemy.engine.Connection]:
+    """
+    Returns the connection that the caller (e.g. the model executor) holds for the whole task. If there is no such
+    connection, a new connection is checked out from the engine's pool and returned to it afterwards.
+    :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+    :param sqlalchemy.engine.Connection connection: connection held by the caller or None
+    :return: connection
+    :rtype: Iterator[sqlalchemy.engine.Connection]
+    """
+    if connection is not None and not connection.closed:
+        yield connection
+    else:
+        with alchemy_engine.connect() as conn:
+            yield conn
@@ -0,0 +1,219 @@
+import logging
+from typing import List, Sequence, Any, Callable, Dict
+
+import sqlalchemy.engine
+from sqlalchemy import Column
+from sqlalchemy import types
+
+from dbd.db.db_connection import connection_scope
+
+log = logging.getLogger(__name__)
+
+INTROSPECTION_SUBQUERY_ALIAS = 'dbd_introspection'
+
+# PEP 249 cursor.description item indexes
+DESCRIPTION_NAME = 0
+DESCRIPTION_TYPE_CODE = 1
+DESCRIPTION_INTERNAL_SIZE = 3
+DESCRIPTION_PRECISION = 4
+DESCRIPTION_SCALE = 5
+
+
+def __varchar(description: Sequence[Any]) -> types.TypeEngine:
+    size = description[DESCRIPTION_INTERNAL_SIZE]
+    return types.VARCHAR(size) if isinstance(size, int) and 0 < size < 65536 else types.TEXT()
+
+
+def __char(description: Sequence[Any]) -> types.TypeEngine:
+    size = description[DESCRIPTION_INTERNAL_SIZE]
+    return types.CHAR(size) if isinstance(size, int) and size > 0 else types.CHAR()
+
+
+def __numeric(description: Sequence[Any]) -> types.TypeEngine:
+    precision = description[DESCRIPTION_PRECISION]
+    scale = description[DESCRIPTION_SCALE]
+    if isinstance(precision, int) and precision > 0 and isinstance(scale, int) and scale >= 0:
+        return types.NUMERIC(precision, scale)
+    return types.NUMERIC()
+
+
+def __snowflake_fixed(description: Sequence[Any]) -> types.TypeEngine:
+    scale = description[DESCRIPTION_SCALE]
+    return types.INTEGER() if scale is None or scale == 0 else __numeric(description)
+
+
+# Postgres (and Redshift) type OIDs
+POSTGRES_TYPES: Dict[Any, Callable[[Sequence[Any]], types.TypeEngine]] = {
+    16: lambda d: types.BOOLEAN(),
+    20: lambda d: types.BIGINT(),
+    21: lambda d: types.SMALLINT(),
+    23: lambda d: types.INTEGER(),
+    25: lambda d: types.TEXT(),
+    700: lambda d: types.REAL(),
+    701: lambda d: types.FLOAT(),
+    1042: __char,
+    1043: __varchar,
+    1082: lambda d: types.DATE(),
+    1083: lambda d: types.TIME(),
+    1114: lambda d: types.TIMESTAMP(),
+    1184: lambda d: types.TIMESTAMP(timezone=True),
+    1700: __numeric,
+}
+
+# MySQL field types (MySQLdb.constants.FIELD_TYPE)
+MYSQL_TYPES: Dict[Any, Callable[[Sequence[Any]], types.TypeEngine]] = {
+    0: __numeric,
+    1: lambda d: types.SMALLINT(),
+    2: lambda d: types.SMALLINT(),
+    3: lambda d: types.INTEGER(),
+    4: lambda d: types.FLOAT(),
+    5: lambda d: types.FLOAT(),
+    7: lambda d: types.TIMESTAMP(),
+    8: lambda d: types.BIGINT(),
+    9: lambda d: types.INTEGER(),
+    10: lambda d: types.DATE(),
+    11: lambda d: types.TIME(),
+    12: lambda d: types.DATETIME(),
+    246: __numeric,
+    252: lambda d: types.TEXT(),
+    253: lambda d: types.TEXT(),
+    254: lambda d: types.TEXT(),
+}
+
+# Snowflake connector type codes (snowflake.connector.constants.FIELD_TYPES indexes)
+SNOWFLAKE_TYPES: Dict[Any, Callable[[Sequence[Any]], types.TypeEngine]] = {
+    0: __snowflake_fixed,
+    1: lambda d: types.FLOAT(),
+    2: __varchar,
+    3: lambda d: types.DATE(),
+    4: lambda d: types.TIMESTAMP(),
+    6: lambda d: types.TIMESTAMP(timezone=True),
+    7: lambda d: types.TIMESTAMP(timezone=True),
+    8: lambda d: types.TIMESTAMP(),
+    12: lambda d: types.TIME(),
+    13: lambda d: types.BOOLEAN(),
+}
+
+# BigQuery DB-API type codes (field types)
+BIGQUERY_TYPES: Dict[Any, Callable[[Sequence[Any]], types.TypeEngine]] = {
+    'STRING': lambda d: types.String(),
+    'INTEGER': lambda d: types.Integer(),
+    'INT64': lambda d: types.Integer(),
+    'FLOAT': lambda d: types.Float(),
+    'FLOAT64': lambda d: types.Float(),
+    'NUMERIC': lambda d: types.Numeric(),
+    'BIGNUMERIC': lambda d: types.Numeric(),
+    'BOOLEAN': lambda d: types.Boolean(),
+    'BOOL': lambda d: types.Boolean(),
+    'DATE': lambda d: types.Date(),
+    'DATETIME': lambda d: types.DateTime(),
+    'TIMESTAMP': lambda d: types.TIMESTAMP(timezone=True),
+    'TIME': lambda d: types.Time(),
+}
+
+DIALECT_TYPES = {
+    'postgresql': POSTGRES_TYPES,
+    'redshift': POSTGRES_TYPES,
+    'mysql': MYSQL_TYPES,
+    'snowflake': SNOWFLAKE_TYPES,
+    'bigquery': BIGQUERY_TYPES,
+}
+
+
+def description_to_columns(dialect_name: str, description: Sequence[Sequence[Any]]) -> List[Column]:
+    """
+    Converts DB-API cursor description to SQLAlchemy columns
+    :param str dialect_name: SQLAlchemy dialect name
+    :param Sequence[Sequence[Any]] description: DB-API cursor description
+    :return: list of columns or None if the dialect's type codes or some column's type code isn't supported
+    :rtype: List[Column]
+    """
+    dialect_types = DIALECT_TYPES.get(dialect_name)
+    if dialect_types is None or description is None:
+        return None
+    columns = []
+    for column_description in description:
+        type_code = column_description[DESCRIPTION_TYPE_CODE]
+        if isinstance(type_code, str):
+            type_code = type_code.upper()
+        type_factory = dialect_types.get(type_code)
+        if type_factory is None:
+            log.debug(f"Unsupported type code '{type_code}' of column '{column_description[DESCRIPTION_NAME]}'.")
+            return None
+        columns.append(Column(column_description[DESCRIPTION_NAME], type_factory(column_description)))
+    return columns
+
+
+def sql_result_columns(sql: str, alchemy_engine: sqlalchemy.engine.Engine,
+                       connection: sqlalchemy.engine.Connection = None) -> List[Column]:
+    """
+    Introspects SELECT statement result's columns and types with a query that returns no rows
+    :param str sql: SELECT statement
+    :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+    :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+    :return: list of the SELECT result columns or None if the dialect can't report the result's types
+    :rtype: List[Column]
+    """
+    dialect_name = alchemy_engine.dialect.name
+    if dialect_name not in DIALECT_TYPES:
+        return None
+    introspection_sql = f"SELECT * FROM ({sql}) {INTROSPECTION_SUBQUERY_ALIAS} WHERE 1=0"
+    log.debug(f"Introspecting sql='{introspection_sql}'")
+    with connection_scope(alchemy_engine, connection) as conn:
+        result = conn.execution_options(no_parameters=True).exec_driver_sql(introspection_sql)
+        try:
+            columns = description_to_columns(dialect_name, result.cursor.description)
+        finally:
+            result.close()
+    if columns is not None and alchemy_engine.dialect.requires_name_normalize:
+        # e.g. Snowflake reports case-insensitive names in upper case
+        columns = [Column(alchemy_engine.dialect.normalize_name(c.name), c.type) for c in columns]
+    return columns
+
+
+def arrow_type_to_alchemy_type(arrow_type: Any) -> types.TypeEngine:
+    """
+    Converts Arrow (e.g. Parquet column) data type to SQLAlchemy data type
+    :param pyarrow.DataType arrow_type: Arrow data type
+    :return: SQLAlchemy data type (TEXT for the nested and unknown types)
+    :rtype: types.TypeEngine
+    """
+    import pyarrow.types as pat
+    if pat.is_dictionary(arrow_type):
+        return arrow_type_to_alchemy_type(arrow_type.value_type)
+    elif pat.is_boolean(arrow_type):
+        return types.BOOLEAN()
+    elif pat.is_int8(arrow_type) or pat.is_int16(arrow_type) or pat.is_uint8(arrow_type):
+        return types.SMALLINT()
+    elif pat.is_int32(arrow_type) or pat.is_uint16(arrow_type):
+        return types.INTEGER()
+    elif pat.is_int64(arrow_type) or pat.is_uint32(arrow_type):
+        return types.BIGINT()
+    elif pat.is_uint64(arrow_type):
+        return types.NUMERIC(20, 0)
+    elif pat.is_float16(arrow_type) or pat.is_float32(arrow_type):
+        return types.REAL()
+    elif pat.is_float64(arrow_type):
+        return types.FLOAT()
+    elif pat.is_decimal(arrow_type):
+        return types.NUMERIC(arrow_type.precision, arrow_type.scale)
+    elif pat.is_date(arrow_type):
+        return types.DATE()
+    elif pat.is_timestamp(arrow_type):
+        return types.TIMESTAMP(timezone=arrow_type.tz is not None)
+    elif pat.is_time(arrow_type):
+        return types.TIME()
+    elif pat.is_binary(arrow_type) or pat.is_large_binary(arrow_type) or pat.is_fixed_size_binary(arrow_type):
+        return types.LargeBinary()
+    return types.TEXT()
+
+
+def arrow_schema_columns(arrow_schema: Any) -> List[Column]:
+    """
+    Converts Arrow schema (e.g. Parquet file's schema) to SQLAlchemy columns
+    :param pyarrow.Schema arrow_schema: Arrow schema
+    :return: list of columns
+    :rtype: List[Column]
+    """
+    return [Column(field.name, arrow_type_to_alchemy_type(field.type)) for field in arrow_schema
+            if field.name not in (arrow_schema.pandas_metadata or {}).get('index_columns', [])]
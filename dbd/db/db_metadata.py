@@ -0,0 +1,23 @@
+import threading
+import weakref
+
+import sqlalchemy
+
+__metadata_locks = weakref.WeakKeyDictionary()
+__metadata_locks_lock = threading.Lock()
+
+
+def metadata_lock(alchemy_metadata: sqlalchemy.MetaData) -> threading.RLock:
+    """
+    Returns the lock that guards the changes of the MetaData (adding, reflecting, and removing tables).
+    SQLAlchemy MetaData isn't thread-safe and the tasks that run in parallel share the MetaData of their schema.
+    :param sqlalchemy.MetaData alchemy_metadata: SQLAlchemy MetaData
+    :return: lock of the MetaData
+    :rtype: threading.RLock
+    """
+    with __metadata_locks_lock:
+        lock = __metadata_locks.get(alchemy_metadata)
+        if lock is None:
+            lock = threading.RLock()
+            __metadata_locks[alchemy_metadata] = lock
+        return lock
@@ -5,10 +5,13 @@ from typing import List, Dict, TypeVar, Any, Tuple
 import sqlalchemy.engine
 from cerberus import Validator
 from sqlalchemy import CheckConstraint, Table, PrimaryKeyConstraint, ForeignKeyConstraint, UniqueConstraint, Index, \
-    text
+    text, select, func, tablesample
+from sqlalchemy.types import NullType
 from sqlalchemy.exc import ProgrammingError
 
 from dbd.db.db_column import DbColumn
+from dbd.db.db_metadata import metadata_lock
+from dbd.db.db_connection import connection_scope
 from dbd.generator.jinja_generator_env import JINJA_GENERATOR_ENV
 from dbd.log.dbd_exception import DbdException
 from dbd.utils.sql_parser import SqlParser
@@ -21,6 +24,27 @@ class DbTableCreationException(DbdException):
     pass
 
 
+class DbTableFingerprintException(DbdException):
+    pass
+
+
+class DbTableSwapException(DbdException):
+    pass
+
+
+class DbTableMergeException(DbdException):
+    pass
+
+
+# dialects that support the TABLESAMPLE BERNOULLI clause
+TABLESAMPLE_DIALECTS = ['postgresql', 'snowflake']
+
+# shadow table (and its indexes and constraints) suffix for the swap and merge modes
+SWAP_TABLE_SUFFIX = '__dbd_new'
+# suffix of the replaced table during the swap
+SWAP_OLD_TABLE_SUFFIX = '__dbd_old'
+
+
 class DbTable:
     """
     Database table definition
@@ -112,125 +136,343 @@ class DbTable:
         template = JINJA_GENERATOR_ENV.get_template('table.j2')
         return template.render(dict(t=self.__alchemy_table))
 
-    def create(self):
+    def create(self, connection: sqlalchemy.engine.Connection = None):
         """
         TODO: exception handling
         Generates SQL and creates the table in the target database
+        :param sqlalchemy.engine.Connection connection: connection to use instead of the engine bound to the metadata
         """
         try:
-            self.__alchemy_table.create(checkfirst=True)
+            self.__alchemy_table.create(bind=connection, checkfirst=True)
         except sqlalchemy.exc.NoReferencedTableError as e:
             raise DbTableCreationException(f"Table {self.name()} has foreign key constraint "
                                            f"referencing non-existent table '{e.table_name}': {e}")
 
-    def drop(self, alchemy_engine: sqlalchemy.engine.Engine):
+    def drop(self, alchemy_engine: sqlalchemy.engine.Engine, connection: sqlalchemy.engine.Connection = None):
         """
         TODO: exception handling
         Drops the table in the target database. Also drops it if its a view.
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
         try:
-            self.__alchemy_table.drop(checkfirst=True)
+            self.__alchemy_table.drop(bind=connection, checkfirst=True)
         except ProgrammingError:
             # it may be view
-            with alchemy_engine.connect() as conn:
+            with connection_scope(alchemy_engine, connection) as conn:
                 view_name = fully_qualified_table_name(self.__alchemy_table.schema, self.__alchemy_table.name,
                                                        quoted=True if alchemy_engine.dialect.name != 'bigquery' else False)
                 # TODO: make sure this works for all DBs
                 conn.execute(text(f"DROP VIEW IF EXISTS {view_name}"))
 
-    def truncate(self, alchemy_engine: sqlalchemy.engine.Engine):
+    def truncate(self, alchemy_engine: sqlalchemy.engine.Engine, connection: sqlalchemy.engine.Connection = None):
         """
         TODO: exception handling
         Truncates table data
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
-        with alchemy_engine.connect() as conn:
+        with connection_scope(alchemy_engine, connection) as conn:
             table_name = fully_qualified_table_name(self.__alchemy_table.schema, self.__alchemy_table.name,
                                                     quoted=True if alchemy_engine.dialect.name != 'bigquery' else False)
             # TODO: make sure this works for all DBs
-            conn.execute(text(f"TRUNCATE TABLE {table_name}"))
-            conn.commit()
+            # TRUNCATE isn't auto-committed by SQLAlchemy, the connection may be reused by the next statements
+            conn.execute(text(f"TRUNCATE TABLE {table_name}").execution_options(autocommit=True))
 
-    def __column_fingerprint(self, column: DbColumn, alchemy_engine: sqlalchemy.engine.Engine) -> Dict[str, Any]:
+    def swap(self, alchemy_engine: sqlalchemy.engine.Engine, connection: sqlalchemy.engine.Connection = None):
         """
-        Computes column fingerprint
-        :param DbColumn column: column to compute fingerprint for
+        Replaces the target table with this shadow table (see from_code shadow_table). The target table is renamed,
+        the shadow table gets the target's name, and the replaced table is dropped in one short transaction
+        (or with an atomic rename / swap statement on databases without transactional DDL). The indexes and
+        constraints of the shadow table get the target's names too, so the next swap doesn't collide with them.
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
-        :return: column fingerprint
-        :rtype: Dict[str, Any]
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        """
+        if not self.__name.endswith(SWAP_TABLE_SUFFIX):
+            raise DbTableSwapException(f"Table '{self.__name}' isn't a swap table.")
+        dialect_name = alchemy_engine.dialect.name
+        preparer = alchemy_engine.dialect.identifier_preparer
+        schema = self.__alchemy_table.schema
+        target_name = self.__name[:-len(SWAP_TABLE_SUFFIX)]
+        old_name = f"{target_name}{SWAP_OLD_TABLE_SUFFIX}"
+
+        def qualified(table_name: str) -> str:
+            return f"{preparer.quote_schema(schema)}.{preparer.quote(table_name)}" if schema \
+                else preparer.quote(table_name)
+
+        with connection_scope(alchemy_engine, connection) as conn:
+            target_exists = sqlalchemy.inspect(conn).has_table(target_name, schema)
+            if dialect_name == 'snowflake':
+                statements = [f"ALTER TABLE {qualified(target_name)} SWAP WITH {qualified(self.__name)}",
+                              f"DROP TABLE {qualified(self.__name)}"] if target_exists \
+                    else [f"ALTER TABLE {qualified(self.__name)} RENAME TO {qualified(target_name)}"]
+            elif dialect_name == 'mysql':
+                renames = ([f"{qualified(target_name)} TO {qualified(old_name)}"] if target_exists else []) + \
+                          [f"{qualified(self.__name)} TO {qualified(target_name)}"]
+                statements = [f"RENAME TABLE {', '.join(renames)}"] + \
+                             ([f"DROP TABLE {qualified(old_name)}"] if target_exists else [])
+            else:
+                statements = ([f"ALTER TABLE {qualified(target_name)} RENAME TO {preparer.quote(old_name)}"]
+                              if target_exists else []) + \
+                             [f"ALTER TABLE {qualified(self.__name)} RENAME TO {preparer.quote(target_name)}"] + \
+                             ([f"DROP TABLE {qualified(old_name)}"] if target_exists else [])
+            # other databases commit DDL statements implicitly
+            transaction = conn.begin() if dialect_name in ['postgresql', 'sqlite'] else None
+            try:
+                if dialect_name == 'sqlite':
+                    # pysqlite doesn't begin a transaction before DDL statements
+                    conn.exec_driver_sql("BEGIN")
+                for statement in statements:
+                    conn.execute(text(statement).execution_options(autocommit=True))
+                for statement in self.__swapped_names_statements(alchemy_engine, conn, qualified(target_name),
+                                                                 target_name):
+                    conn.execute(text(statement).execution_options(autocommit=True))
+                if transaction is not None:
+                    transaction.commit()
+            except Exception:
+                if transaction is not None:
+                    transaction.rollback()
+                raise
+
+    # noinspection PyMethodMayBeStatic
+    def __swapped_names_statements(self, alchemy_engine: sqlalchemy.engine.Engine,
+                                   conn: sqlalchemy.engine.Connection, qualified_target_name: str,
+                                   target_name: str) -> List[str]:
+        """
+        Returns statements that remove the SWAP_TABLE_SUFFIX from the names of the swapped table's indexes and
+        constraints (e.g. 'population__dbd_new_pkey' -> 'population_pkey')
+        :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection conn: connection
+        :param str qualified_target_name: quoted fully qualified name of the swapped table
+        :param str target_name: name of the swapped table
+        :return: list of SQL statements
+        :rtype: List[str]
+        """
+        dialect_name = alchemy_engine.dialect.name
+        preparer = alchemy_engine.dialect.identifier_preparer
+        schema = self.__alchemy_table.schema
+        schema_prefix = f"{preparer.quote_schema(schema)}." if schema else ''
+        statements = []
+        if dialect_name == 'postgresql':
+            inspector = sqlalchemy.inspect(conn)
+            constraint_names = [inspector.get_pk_constraint(target_name, schema).get('name')] + \
+                               [c['name'] for c in inspector.get_unique_constraints(target_name, schema)] + \
+                               [c['name'] for c in inspector.get_foreign_keys(target_name, schema)] + \
+                               [c['name'] for c in inspector.get_check_constraints(target_name, schema)]
+            swapped_constraint_names = [n for n in constraint_names if n is not None and SWAP_TABLE_SUFFIX in n]
+            # renaming a primary key or unique constraint renames its index too
+            statements += [f"ALTER TABLE {qualified_target_name} RENAME CONSTRAINT {preparer.quote(n)} "
+                           f"TO {preparer.quote(n.replace(SWAP_TABLE_SUFFIX, '', 1))}"
+                           for n in swapped_constraint_names]
+            statements += [f"ALTER INDEX {schema_prefix}{preparer.quote(i['name'])} "
+                           f"RENAME TO {preparer.quote(i['name'].replace(SWAP_TABLE_SUFFIX, '', 1))}"
+                           for i in inspector.get_indexes(target_name, schema)
+                           if SWAP_TABLE_SUFFIX in i['name'] and i.get('duplicates_constraint') is None]
+        elif dialect_name == 'mysql':
+            statements += [f"ALTER TABLE {qualified_target_name} RENAME INDEX {preparer.quote(i['name'])} "
+                           f"TO {preparer.quote(i['name'].replace(SWAP_TABLE_SUFFIX, '', 1))}"
+                           for i in sqlalchemy.inspect(conn).get_indexes(target_name, schema)
+                           if SWAP_TABLE_SUFFIX in i['name']]
+        elif dialect_name == 'sqlite':
+            # SQLite can't rename indexes
+            for i in sqlalchemy.inspect(conn).get_indexes(target_name, schema):
+                if SWAP_TABLE_SUFFIX in i['name']:
+                    columns = ', '.join(preparer.quote(c) for c in i['column_names'])
+                    statements += [f"DROP INDEX {schema_prefix}{preparer.quote(i['name'])}",
+                                   f"CREATE {'UNIQUE ' if i['unique'] else ''}INDEX {schema_prefix}"
+                                   f"{preparer.quote(i['name'].replace(SWAP_TABLE_SUFFIX, '', 1))} "
+                                   f"ON {preparer.quote(target_name)} ({columns})"]
+        return statements
+
+    def merge(self, alchemy_engine: sqlalchemy.engine.Engine, connection: sqlalchemy.engine.Connection = None) -> int:
+        """
+        Merges (upserts) this shadow table (see from_code shadow_table) to the target table by the shadow table's
+        primary key and drops the shadow table. Rows of the target table that aren't in the shadow table are kept.
+        The target table's structure isn't altered. If the target table doesn't exist, the shadow table replaces it
+        (see swap).
+        :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        :return: number of inserted or updated rows (0 if the database doesn't report it)
+        :rtype: int
+        """
+        if not self.__name.endswith(SWAP_TABLE_SUFFIX):
+            raise DbTableMergeException(f"Table '{self.__name}' isn't a merge table.")
+        key_columns = [c.name for c in self.__alchemy_table.primary_key.columns]
+        if len(key_columns) == 0:
+            raise DbTableMergeException(f"Table '{self.__name[:-len(SWAP_TABLE_SUFFIX)]}' can't be merged "
+                                        f"without a primary key.")
+        dialect_name = alchemy_engine.dialect.name
+        preparer = alchemy_engine.dialect.identifier_preparer
+        schema = self.__alchemy_table.schema
+        target_name = self.__name[:-len(SWAP_TABLE_SUFFIX)]
+
+        def qualified(table_name: str) -> str:
+            return f"{preparer.quote_schema(schema)}.{preparer.quote(table_name)}" if schema \
+                else preparer.quote(table_name)
+
+        with connection_scope(alchemy_engine, connection) as conn:
+            if not sqlalchemy.inspect(conn).has_table(target_name, schema):
+                self.swap(alchemy_engine, conn)
+                return conn.execute(select(func.count()).select_from(
+                    sqlalchemy.table(target_name, schema=schema))).scalar()
+            merge_statement = self.__merge_statement(dialect_name, preparer, qualified(target_name),
+                                                     qualified(self.__name), key_columns)
+            # other databases commit DML and DDL statements implicitly
+            transaction = conn.begin() if dialect_name in ['postgresql', 'sqlite'] else None
+            try:
+                if dialect_name == 'sqlite':
+                    # pysqlite doesn't begin a transaction before DDL statements
+                    conn.exec_driver_sql("BEGIN")
+                rows = conn.execute(text(merge_statement).execution_options(autocommit=True)).rowcount
+                conn.execute(text(f"DROP TABLE {qualified(self.__name)}").execution_options(autocommit=True))
+                if transaction is not None:
+                    transaction.commit()
+            except Exception:
+                if transaction is not None:
+                    transaction.rollback()
+                raise
+        return rows if rows is not None and rows > 0 else 0
+
+    def __merge_statement(self, dialect_name: str, preparer: sqlalchemy.sql.compiler.IdentifierPreparer,
+                          qualified_target_name: str, qualified_shadow_name: str, key_columns: List[str]) -> str:
+        """
+        Returns the dialect's upsert statement that merges the shadow table to the target table
+        (INSERT ... ON CONFLICT for PostgreSQL and SQLite, INSERT ... ON DUPLICATE KEY UPDATE for MySQL,
+        and MERGE for the other databases)
+        :param str dialect_name: SQLAlchemy dialect name
+        :param sqlalchemy.sql.compiler.IdentifierPreparer preparer: dialect's identifier preparer
+        :param str qualified_target_name: quoted fully qualified name of the target table
+        :param str qualified_shadow_name: quoted fully qualified name of the shadow table
+        :param List[str] key_columns: primary key column names
+        :return: SQL statement
+        :rtype: str
+        """
+        column_names = [c.name for c in self.__alchemy_table.columns]
+        columns = ', '.join(preparer.quote(c) for c in column_names)
+        update_columns = [preparer.quote(c) for c in column_names if c not in key_columns]
+        if dialect_name in ['postgresql', 'sqlite']:
+            keys = ', '.join(preparer.quote(c) for c in key_columns)
+            on_conflict = f"DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in update_columns)}" \
+                if len(update_columns) > 0 else "DO NOTHING"
+            # WHERE clause makes the ON CONFLICT clause unambiguous for SQLite
+            return f"INSERT INTO {qualified_target_name} ({columns}) SELECT {columns} FROM " \
+                   f"{qualified_shadow_name} WHERE true ON CONFLICT ({keys}) {on_conflict}"
+        elif dialect_name == 'mysql':
+            source_columns = ', '.join(f"src.{preparer.quote(c)}" for c in column_names)
+            updates = ', '.join(f"{c} = src.{c}" for c in update_columns) if len(update_columns) > 0 \
+                else ', '.join(f"{preparer.quote(c)} = {preparer.quote(c)}" for c in key_columns)
+            return f"INSERT INTO {qualified_target_name} ({columns}) SELECT {source_columns} FROM " \
+                   f"{qualified_shadow_name} AS src ON DUPLICATE KEY UPDATE {updates}"
+        else:
+            condition = ' AND '.join(f"{qualified_target_name}.{preparer.quote(c)} = src.{preparer.quote(c)}"
+                                     for c in key_columns)
+            source_columns = ', '.join(f"src.{preparer.quote(c)}" for c in column_names)
+            when_matched = f" WHEN MATCHED THEN UPDATE SET {', '.join(f'{c} = src.{c}' for c in update_columns)}" \
+                if len(update_columns) > 0 else ''
+            return f"MERGE INTO {qualified_target_name} USING {qualified_shadow_name} AS src ON {condition}" \
+                   f"{when_matched} WHEN NOT MATCHED THEN INSERT ({columns}) VALUES ({source_columns})"
+
+    def __column_fingerprint_kind(self, column: DbColumn) -> str:
+        """
+        Returns which statistics the column fingerprint contains
+        :param DbColumn column: column
+        :return: 'string', 'date', 'number', or None (NULL counts only)
+        :rtype: str
         """
-        column_fingerprint = {}
-        schema_with_dot = self.__alchemy_table.schema + '.' if self.__alchemy_table.schema else ''
-        table_name = self.__alchemy_table.name
-        table_name_with_schema = schema_with_dot + table_name
         column_type = column.alchemy_column().type
         # Snowflake fix
         if str(column_type).upper().startswith('TIMESTAMP_'):
             column_python_type = datetime
         else:
-            column_python_type = column_type.python_type
-        with alchemy_engine.connect() as conn:
-            result = conn.execute(
-                text(f"SELECT COUNT(*) FROM {table_name_with_schema} WHERE {table_name}.{column.name()} IS NULL"))
-            data = result.fetchone()
-            column_fingerprint['null_count'] = str(data[0])
-            result = conn.execute(
-                text(f"SELECT COUNT(*) FROM {table_name_with_schema} WHERE {table_name}.{column.name()} IS NOT NULL"))
-            data = result.fetchone()
-            column_fingerprint['not_null_count'] = str(data[0])
-            result = conn.execute(
-                text(f"SELECT COUNT(*) FROM {table_name_with_schema} WHERE {table_name}.{column.name()} IS NOT NULL"))
-            column_fingerprint['not_null_count'] = result.fetchone()[0]
-            if isinstance(column_python_type, type) and issubclass(column_python_type, bool):
-                pass
-            elif isinstance(column_python_type, type) and issubclass(column_python_type, str):
-                if alchemy_engine.dialect.name in ['sqlite', 'snowflake']:
-                    length_function = 'LENGTH'
-                else:
-                    length_function = 'CHAR_LENGTH'
-                    result = conn.execute(
-                        text(
-                            f"SELECT COUNT(*) FROM {table_name_with_schema} WHERE {table_name}.{column.name()} IS NOT NULL"))
-                    column_fingerprint['not_null_count'] = result.fetchone()[0]
-                result = conn.execute(text(f"SELECT "
-                                           f"SUM({length_function}({table_name}.{column.name()})), "
-                                           f"MAX({length_function} ({table_name}.{column.name()})), "
-                                           f"MIN({length_function} ({table_name}.{column.name()})) "
-                                           f"FROM {table_name_with_schema}"))
-                data = result.fetchone()
-                column_fingerprint['sum_length'] = str(data[0])
-                column_fingerprint['max_length'] = str(data[1])
-                column_fingerprint['min_length'] = str(data[2])
-            elif isinstance(column_python_type, type) and issubclass(column_python_type, date):
-                result = conn.execute(text(f"SELECT "
-                                           f"MAX({table_name}.{column.name()}), "
-                                           f"MIN({table_name}.{column.name()}) "
-                                           f"FROM {table_name_with_schema}"))
-                data = result.fetchone()
-                column_fingerprint['max'] = SqlParser.format_date(data[0])
-                column_fingerprint['min'] = SqlParser.format_date(data[0])
-            elif isinstance(column_python_type, type) and issubclass(column_python_type, (int, float, Decimal)) and not \
-                str(column_type).upper().startswith(('BOOL', 'TINYINT')):
-                result = conn.execute(text(f"SELECT "
-                                           f"SUM({table_name}.{column.name()}), "
-                                           f"MAX({table_name}.{column.name()}), "
-                                           f"MIN({table_name}.{column.name()}) "
-                                           f"FROM {table_name_with_schema}"))
-                data = result.fetchone()
-                column_fingerprint['sum'] = str(round(data[0], 2)).replace('.00', '')
-                column_fingerprint['max'] = str(round(data[1], 2)).replace('.00', '')
-                column_fingerprint['min'] = str(round(data[2], 2)).replace('.00', '')
-        return column_fingerprint
-
-    def fingerprint(self, alchemy_engine: sqlalchemy.engine.Engine) -> Dict[str, Any]:
-        """
-        Computes table fingerprint that includes various characteristics of the data
+            try:
+                column_python_type = column_type.python_type
+            except NotImplementedError:
+                return None
+        if issubclass(column_python_type, bool):
+            return None
+        elif issubclass(column_python_type, str):
+            return 'string'
+        elif issubclass(column_python_type, date):
+            return 'date'
+        elif issubclass(column_python_type, (int, float, Decimal)) and \
+                not str(column_type).upper().startswith(('BOOL', 'TINYINT')):
+            return 'number'
+        return None
+
+    def __fingerprint_source(self, alchemy_engine: sqlalchemy.engine.Engine, sample_rows: int = None,
+                             sample_percent: float = None) -> sqlalchemy.sql.FromClause:
+        """
+        Returns the table or its sample that the fingerprint is computed from
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param int sample_rows: number of rows (the first rows that the database returns)
+        :param float sample_percent: percentage of randomly sampled rows (TABLESAMPLE)
+        :return: table or its sample
+        :rtype: sqlalchemy.sql.FromClause
+        """
+        if sample_rows is not None and sample_percent is not None:
+            raise DbTableFingerprintException("Specify either sample_rows or sample_percent, not both.")
+        if sample_rows is not None:
+            return select(self.__alchemy_table).limit(sample_rows).subquery('fingerprint_sample')
+        if sample_percent is not None:
+            if alchemy_engine.dialect.name not in TABLESAMPLE_DIALECTS:
+                raise DbTableFingerprintException(f"Sampling by percentage (TABLESAMPLE) isn't supported "
+                                                  f"for '{alchemy_engine.dialect.name}'. Use sample_rows instead.")
+            return tablesample(self.__alchemy_table, func.bernoulli(sample_percent), name='fingerprint_sample')
+        return self.__alchemy_table
+
+    def fingerprint(self, alchemy_engine: sqlalchemy.engine.Engine, sample_rows: int = None,
+                    sample_percent: float = None, connection: sqlalchemy.engine.Connection = None) -> Dict[str, Any]:
         """
-        column_fingerprints = {}
+        Computes table fingerprint that includes various characteristics of the data.
+        All column statistics are computed with a single aggregate query (one table scan).
+        :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param int sample_rows: computes the fingerprint from the first sample_rows rows only
+        :param float sample_percent: computes the fingerprint from randomly sampled percentage of rows (TABLESAMPLE)
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        :return: column fingerprints
+        :rtype: Dict[str, Any]
+        """
+        source = self.__fingerprint_source(alchemy_engine, sample_rows, sample_percent)
+        if alchemy_engine.dialect.name in ['sqlite', 'snowflake']:
+            length_function = func.length
+        else:
+            length_function = func.char_length
+        # NullType skips the SQLAlchemy result processing, so the values are the raw DBAPI values
+        raw = NullType()
+        aggregates = [func.count()]
+        column_kinds = []
         for column in self.__columns:
-            column_fingerprints[column.name()] = self.__column_fingerprint(column, alchemy_engine)
+            kind = self.__column_fingerprint_kind(column)
+            c = source.c[column.name()]
+            aggregates.append(func.count(c))
+            if kind == 'string':
+                aggregates += [func.sum(length_function(c), type_=raw), func.max(length_function(c), type_=raw),
+                               func.min(length_function(c), type_=raw)]
+            elif kind == 'date':
+                aggregates += [func.max(c, type_=raw), func.min(c, type_=raw)]
+            elif kind == 'number':
+                aggregates += [func.sum(c, type_=raw), func.max(c, type_=raw), func.min(c, type_=raw)]
+            column_kinds.append((column, kind))
+        with connection_scope(alchemy_engine, connection) as conn:
+            data = list(conn.execute(select(*aggregates).select_from(source)).fetchone())
+        row_count = data.pop(0)
+        column_fingerprints = {}
+        for column, kind in column_kinds:
+            not_null_count = data.pop(0)
+            column_fingerprint = dict(null_count=str(row_count - not_null_count), not_null_count=not_null_count)
+            if kind == 'string':
+                column_fingerprint['sum_length'] = str(data.pop(0))
+                column_fingerprint['max_length'] = str(data.pop(0))
+                column_fingerprint['min_length'] = str(data.pop(0))
+            elif kind == 'date':
+                column_fingerprint['max'] = SqlParser.format_date(data.pop(0))
+                column_fingerprint['min'] = SqlParser.format_date(data.pop(0))
+            elif kind == 'number':
+                for statistic in ['sum', 'max', 'min']:
+                    value = data.pop(0)
+                    column_fingerprint[statistic] = str(round(value, 2) if value is not None else value) \
+                        .replace('.00', '')
+            column_fingerprints[column.name()] = column_fingerprint
         return column_fingerprints
 
     @classmethod
@@ -247,29 +489,36 @@ class DbTable:
 
     @classmethod
     def from_code(cls, name: str, table_code: Dict[str, Any], alchemy_metadata: sqlalchemy.MetaData,
-                  schema: str = None) -> DbTableType:
+                  schema: str = None, shadow_table: bool = False) -> DbTableType:
         """
         Creates database table from passed code
         :param str name: table name
         :param Dict[str, Any] table_code: DbTable's code definition
         :param sqlalchemy.MetaData alchemy_metadata: SQLAlchemy MetaData object
         :param str schema: table's schema
+        :param bool shadow_table: if True, creates the shadow table that replaces the table or is merged to it later
+            (see swap and merge). The table's and its indexes' names get the SWAP_TABLE_SUFFIX.
         :return: new DbTable instance
         """
+        suffix = SWAP_TABLE_SUFFIX if shadow_table else ''
         columns = cls.__extract_columns_from_table_code(table_code)
         constraints = cls.__extract_constraints_from_table_code(table_code)
-        indexes = cls.__extract_indexes_from_table_code(name, table_code)
+        indexes = cls.__extract_indexes_from_table_code(name, table_code, suffix)
 
         arguments = [c.alchemy_column() for c in columns] + constraints + indexes
-        return DbTable(name, columns, Table(name, alchemy_metadata, schema=schema,
-                                            extend_existing=True, *arguments))
+        with metadata_lock(alchemy_metadata):
+            alchemy_table = Table(f"{name}{suffix}", alchemy_metadata, schema=schema, extend_existing=True,
+                                  *arguments)
+        return DbTable(f"{name}{suffix}", columns, alchemy_table)
 
     @classmethod
-    def __extract_indexes_from_table_code(cls, name: str, table_code: Dict[str, Any]) -> List[Index]:
+    def __extract_indexes_from_table_code(cls, name: str, table_code: Dict[str, Any],
+                                          suffix: str = '') -> List[Index]:
         """
         Extracts index definitions from DbTable's code
         :param str name: table name for constructing default index name
         :param Dict[str, Any] table_code: DbTable code
+        :param str suffix: index name suffix (e.g. SWAP_TABLE_SUFFIX)
         :return: Index array of SQLAlchemy indexes
         :rtype: List[Index]
         """
@@ -278,7 +527,7 @@ class DbTable:
         for index in ti:
             cols = index.get('columns')
             unique = index.get('unique', False)
-            index_name = index.get('name', f"idx_{name}_{len(indexes) + 1}")
+            index_name = f"{index.get('name', f'idx_{name}_{len(indexes) + 1}')}{suffix}"
             index_arguments = [index_name] + cols
             indexes.append(Index(*index_arguments, unique=unique))
         return indexes
@@ -0,0 +1,87 @@
+import logging
+import os
+import pickle
+from typing import Dict, Set, Tuple
+
+import sqlalchemy
+import sqlalchemy.engine
+from sqlalchemy import MetaData
+
+log = logging.getLogger(__name__)
+
+METADATA_SNAPSHOT_VERSION = 2
+
+
+class MetadataSnapshot:
+    """
+    On-disk snapshot of the reflected database metadata (one SQLAlchemy MetaData per schema). It lets the next run
+    skip the reflection of tables that dbd already knows. The snapshot is deleted as soon as it's loaded and saved
+    again only after a run that doesn't execute DDL files, so a failed run never leaves a stale snapshot behind.
+    The snapshot is used only by the same SQLAlchemy version and dialect that saved it.
+    """
+
+    def __init__(self, snapshot_file: str, database: str, dialect: str):
+        """
+        Constructor
+        :param str snapshot_file: snapshot file
+        :param str database: database identification (e.g. URL without password)
+        :param str dialect: SQLAlchemy dialect name (e.g. 'postgresql')
+        """
+        self.__snapshot_file = snapshot_file
+        self.__database = database
+        self.__dialect = dialect
+
+    def load(self, alchemy_engine: sqlalchemy.engine.Engine) -> Tuple[Dict[str, MetaData], Dict[str, Set[str]]]:
+        """
+        Loads and deletes the snapshot
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine that the loaded metadata is bound to
+        :return: metadata cache (MetaData per schema) and names of the tables reflected to each schema's MetaData.
+            Empty dicts if there is no valid snapshot for the database.
+        :rtype: Tuple[Dict[str, MetaData], Dict[str, Set[str]]]
+        """
+        metadata_cache, reflected_names = {}, {}
+        if os.path.exists(self.__snapshot_file):
+            try:
+                with open(self.__snapshot_file, 'rb') as f:
+                    snapshot = pickle.load(f)
+                if snapshot.get('version') == METADATA_SNAPSHOT_VERSION \
+                        and snapshot.get('sqlalchemy_version') == sqlalchemy.__version__ \
+                        and snapshot.get('dialect') == self.__dialect \
+                        and snapshot.get('database') == self.__database:
+                    metadata_cache = snapshot.get('metadata_cache', {})
+                    reflected_names = snapshot.get('reflected_names', {})
+                    for metadata in metadata_cache.values():
+                        metadata.bind = alchemy_engine
+                    log.debug(f"Metadata snapshot '{self.__snapshot_file}' loaded.")
+            # any error of the unpickled objects (e.g. after a SQLAlchemy upgrade) falls back to the full reflection
+            except Exception as e:
+                log.warning(f"Ignoring invalid metadata snapshot '{self.__snapshot_file}': {e}")
+                metadata_cache, reflected_names = {}, {}
+            self.invalidate()
+        return metadata_cache, reflected_names
+
+    def save(self, metadata_cache: Dict[str, MetaData], reflected_names: Dict[str, Set[str]]):
+        """
+        Saves the snapshot
+        :param Dict[str, MetaData] metadata_cache: metadata cache (MetaData per schema)
+        :param Dict[str, Set[str]] reflected_names: names of the tables reflected to each schema's MetaData
+        """
+        snapshot = dict(version=METADATA_SNAPSHOT_VERSION, sqlalchemy_version=sqlalchemy.__version__,
+                        dialect=self.__dialect, database=self.__database, metadata_cache=metadata_cache,
+                        reflected_names=reflected_names)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.__snapshot_file)), exist_ok=True)
+            with open(f"{self.__snapshot_file}.tmp", 'wb') as f:
+                pickle.dump(snapshot, f)
+            os.replace(f"{self.__snapshot_file}.tmp", self.__snapshot_file)
+            log.debug(f"Metadata snapshot '{self.__snapshot_file}' saved.")
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+            log.warning(f"Can't save metadata snapshot '{self.__snapshot_file}': {e}")
+
+    def invalidate(self):
+        """
+        Deletes the snapshot
+        """
+        if os.path.exists(self.__snapshot_file):
+            os.remove(self.__snapshot_file)
+            log.debug(f"Metadata snapshot '{self.__snapshot_file}' invalidated.")
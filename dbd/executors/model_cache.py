@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any, List
+
+log = logging.getLogger(__name__)
+
+MODEL_CACHE_VERSION = 3
+
+
+class ModelCache:
+    """
+    On-disk (JSON) cache of parsed model files. Each entry holds a parsed task definition together with a key derived
+    from the modification time and size of the model file, its YAML file, and the templates they include,
+    and from the template parameters. Entries with a different key are parsed again. Entries of the files
+    that weren't requested are dropped when the cache is saved.
+    """
+
+    def __init__(self, cache_file: str):
+        """
+        Constructor
+        :param str cache_file: cache file
+        """
+        self.__cache_file = cache_file
+        self.__entries: Dict[str, List[Any]] = {}
+        self.__used_entries: Dict[str, List[Any]] = {}
+        self.__modified = False
+        self.__lock = threading.Lock()
+        self.__load()
+
+    def __load(self):
+        """
+        Loads the cache file (if it exists)
+        """
+        if os.path.exists(self.__cache_file):
+            try:
+                with open(self.__cache_file, encoding='utf-8') as f:
+                    cache = json.load(f)
+                if isinstance(cache, dict) and cache.get('version') == MODEL_CACHE_VERSION:
+                    self.__entries = cache.get('entries', {})
+            except (OSError, ValueError) as e:
+                log.warning(f"Ignoring invalid model cache '{self.__cache_file}': {e}")
+
+    def get(self, model_file: str, key: List[Any]) -> Any:
+        """
+        Returns the parsed model file
+        :param str model_file: model file
+        :param List[Any] key: cache key (e.g. list of the file's modification time, size, etc.)
+        :return: parsed model file or None if it isn't cached or its key changed
+        :rtype: Any
+        """
+        with self.__lock:
+            entry = self.__entries.get(model_file)
+            if not isinstance(entry, list) or len(entry) != 2 or entry[0] != key:
+                return None
+            self.__used_entries[model_file] = entry
+            return entry[1]
+
+    def put(self, model_file: str, key: List[Any], value: Any):
+        """
+        Stores the parsed model file. Values that don't survive the JSON round trip unchanged
+        (e.g. YAML dates or non-string keys) aren't cached.
+        :param str model_file: model file
+        :param List[Any] key: cache key (e.g. list of the file's modification time, size, etc.)
+        :param Any value: parsed model file
+        """
+        try:
+            cached = json.loads(json.dumps(value))
+        except (TypeError, ValueError):
+            cached = None
+        if cached is None or cached != value:
+            log.debug(f"Model file '{model_file}' can't be cached.")
+            return
+        with self.__lock:
+            self.__used_entries[model_file] = [key, cached]
+            self.__modified = True
+
+    def save(self):
+        """
+        Saves the cache file if any entry changed
+        """
+        with self.__lock:
+            if not self.__modified and len(self.__used_entries) == len(self.__entries):
+                return
+            cache = dict(version=MODEL_CACHE_VERSION, entries=self.__used_entries)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.__cache_file)), exist_ok=True)
+                with open(f"{self.__cache_file}.tmp", 'w', encoding='utf-8') as f:
+                    json.dump(cache, f)
+                os.replace(f"{self.__cache_file}.tmp", self.__cache_file)
+                log.debug(f"Model cache '{self.__cache_file}' saved.")
+            except OSError as e:
+                log.warning(f"Can't save model cache '{self.__cache_file}': {e}")
@@ -1,31 +1,62 @@
+import hashlib
+import heapq
+import json
 import logging
 import os
 import re
 import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from os.path import exists
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set, Iterable, Tuple
 
 import click
 import networkx as nx
 import sqlalchemy.engine
 import yaml
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, meta
 from sqlalchemy import MetaData
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
 
 from dbd.config.dbd_project import DbdProject
+from dbd.db.db_metadata import metadata_lock
+from dbd.executors.metadata_snapshot import MetadataSnapshot
+from dbd.executors.model_cache import ModelCache
+from dbd.executors.run_state import RunState
 from dbd.log.dbd_exception import DbdException
-from dbd.tasks.data_task import DataTask
+from dbd.tasks.data_task import DataTask, COMPRESSIBLE_DATA_FILE_EXTENSIONS
 from dbd.tasks.db_table_task import DbTableTask
 from dbd.tasks.ddl_task import DdlTask
 from dbd.tasks.elt_task import EltTask
 from dbd.tasks.task import Task
-from dbd.utils.io_utils import is_url, is_kaggle
+from dbd.utils.profiling_utils import RunReport, StatementTimer, PHASE_DROP, PHASE_SWAP, PHASE_MERGE
+from dbd.utils.download_manager import DownloadManager
+from dbd.utils.io_utils import is_url, is_kaggle, data_file_url, data_file_download, url_validators, \
+    COMPRESSION_EXTENSIONS
 from dbd.utils.sql_parser import SqlParser
-from dbd.utils.text_utils import relative_path_to_base_dir_no_ext, remove_prefix, relative_path_to_base_dir
+from dbd.utils.text_utils import relative_path_to_base_dir_no_ext, remove_prefix, relative_path_to_base_dir, \
+    sql_literal
 
 log = logging.getLogger(__name__)
 
+# libyaml parser is much faster than the pure Python one
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+MODEL_FILE_SQL = 'SQL'
+MODEL_FILE_DDL = 'DDL'
+MODEL_FILE_DATA = 'data'
+MODEL_FILE_REF = 'reference'
+MODEL_FILE_TYPES = {
+    '.sql': MODEL_FILE_SQL,
+    '.ddl': MODEL_FILE_DDL,
+    '.ref': MODEL_FILE_REF,
+    **{extension: MODEL_FILE_DATA for extension in ['.csv', '.json', '.jsonl', '.ndjson', '.xls', '.xlsx', '.xlsm',
+                                                    '.xlsb', '.odf', '.ods', '.odt', '.parquet']},
+    # compressed data files (e.g. population.csv.gz)
+    **{f"{extension}{compression}": MODEL_FILE_DATA for extension in COMPRESSIBLE_DATA_FILE_EXTENSIONS
+       for compression in COMPRESSION_EXTENSIONS}
+}
+
 
 class ModelExecutionException(DbdException):
     pass
@@ -52,18 +83,28 @@ class ModelExecutor:
         self.__model_directory = f"{project.model_directory_from_project()}{os.sep}"
         self.__tasks = {}
         self.__ddl_tasks = {}
+        # fully qualified target name -> tasks with the target
+        self.__task_index = {}
         self.__metadata_cache = {}
+        # lower-case names of the tables (and views) that were reflected to the metadata cache per schema
+        self.__reflected_names = {}
+        self.__task_graph = nx.DiGraph()
+        self.__run_state = None
+        self.__task_hashes = {}
+        self.__run_report = RunReport()
 
         self.__jinja_model_env = Environment(loader=FileSystemLoader(self.__model_directory))
         self.__jinja_model_env.globals.update()
 
     def reflect_metadata_cache(self, alchemy_engine: sqlalchemy.engine.Engine):
         """
-        Reflects all cached metadata. This is necessary for detecting deletions
+        Reflects the metadata cache from scratch (e.g. after the database was changed outside of dbd).
+        Only the tables that the model's tasks target or reference are reflected.
         :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine database connection (both target and source)
         """
-        # TODO: this approach can be slow - need to figure out, how to rebuild the cache incrementally
         log.debug(f"Reflecting metadata cache.")
+        self.__metadata_cache = {}
+        self.__reflected_names = {}
         self.__build_metadata_cache(alchemy_engine)
 
     def validate(self):
@@ -85,6 +126,44 @@ class ModelExecutor:
             log.debug(f"Task validation finished: '{task.task_id()}'.")
         return validation_result, task_errors
 
+    def add_tasks(self, tasks: Iterable[Task]):
+        """
+        Adds tasks to the model in addition to the tasks populated from the model directory (e.g. tasks of
+        a generated model)
+        :param Iterable[Task] tasks: table and DDL tasks
+        """
+        for task in tasks:
+            if isinstance(task, DdlTask):
+                self.__ddl_tasks[task.task_id()] = task
+            else:
+                self.__tasks[task.task_id()] = task
+
+    def plan(self, task_list: List[str] = None, deps: bool = True) -> List[Task]:
+        """
+        Populates the model from the model directory and orders its tasks by dependencies
+        :param List[str] task_list: list of tasks fully qualified names (schema.task) to plan. If None, all tasks
+        are planned.
+        :param bool deps: if True, dependencies processed for the specific task_list. If False, dependencies are not
+        processed.
+        :return: tasks ordered by dependencies (they are executed in the reverse order)
+        :rtype: List[Task]
+        """
+        self.__populate_model_from_directory()
+        if task_list is not None and len(task_list) > 0:
+            self.__tasks = self.__filter_task_list(task_list, deps)
+        log.debug(f"Processing tasks: '{self.__tasks}'.")
+        log.debug(f"Ordering tasks by dependencies.")
+        return self.__order_tasks_by_dependencies()
+
+    def __index_tasks(self):
+        """
+        Indexes the tasks by their fully qualified target names
+        """
+        task_index = {}
+        for task in self.__tasks.values():
+            task_index.setdefault(task.fully_qualified_target(quoted=False), []).append(task)
+        self.__task_index = task_index
+
     def __filter_task_list(self, task_list: List[str], deps: bool = True) -> Dict[str, Task]:
         """
         Limits the populated tasks to the passed list and its dependencies
@@ -94,6 +173,7 @@ class ModelExecutor:
         :return Dict[str, Task]: filtered tasks
         :rtype Dict[str, Task]:
         """
+        self.__index_tasks()
         new_tasks = {}
         for task_name in task_list:
             task = self.__find_task_by_fully_qualified_target_name(task_name)
@@ -105,7 +185,9 @@ class ModelExecutor:
             new_tasks.update({task.task_id(): task for task in task_table_dependencies})
         return new_tasks
 
-    def execute(self, alchemy_engine: sqlalchemy.engine.Engine, task_list: List[str] = None, deps: bool = True):
+    def execute(self, alchemy_engine: sqlalchemy.engine.Engine, task_list: List[str] = None, deps: bool = True,
+                jobs: int = 1, full_refresh: bool = False, report_file: str = None,
+                statement_timer: StatementTimer = None):
         """
         Executes files stored in a model directory. The execution is performed in the database connected via
         SQLAlchemy engine.
@@ -114,58 +196,362 @@ class ModelExecutor:
         are executed.
         :param bool deps: if True, dependencies processed for the specific task_list. If False, dependencies are not
         processed.
-        """
+        :param int jobs: number of tasks that can be executed concurrently. Independent tasks are executed in
+        parallel if jobs > 1.
+        :param bool full_refresh: if True, all tasks are executed. If False, the tasks whose inputs didn't change since
+        their last successful execution (and whose target tables exist) are skipped.
+        :param str report_file: if set, the run report (wall time, rows, and bytes of each task and its phases)
+        is written to this JSON file
+        :param StatementTimer statement_timer: timer attached to the engine (see alchemy_engine_from_project). If set,
+        the slowest SQL statements are printed at the end of the run and added to the run report.
+        """
+        if jobs < 1:
+            raise ModelExecutionException(f"Invalid number of parallel jobs '{jobs}'. It must be 1 or more.")
         try:
-            self.__populate_model_from_directory()
-            if task_list is not None and len(task_list) > 0:
-                self.__tasks = self.__filter_task_list(task_list, deps)
-            log.debug(f"Processing tasks: '{self.__tasks}'.")
-            log.debug(f"Building metadata cache.")
-            self.__build_metadata_cache(alchemy_engine)
-            log.debug(f"Ordering tasks by dependencies.")
-            ordered_tasks = self.__order_tasks_by_dependencies()
+            ordered_tasks = self.plan(task_list, deps)
             log.debug(f"Ordered tasks: '{ordered_tasks}'.")
-            self.__drop_tables(ordered_tasks, alchemy_engine)
-            self.reflect_metadata_cache(alchemy_engine)
-            with tempfile.TemporaryDirectory() as tmpdirname_for_all_tasks:
-                for task in reversed(ordered_tasks):
-                    schema = task.target_schema() if task.target_schema() is not None else Task.TOP_LEVEL_SCHEMA_NAME
-                    click.echo(f"Executing task: '{task.task_id()}'.")
-                    log.debug(f"Executing task: '{task.task_id()}'.")
-                    task.create(self.__metadata_cache[schema], alchemy_engine,
-                                copy_stage_storage=self.__project.copy_stage_from_project(),
-                                global_tmpdir=tmpdirname_for_all_tasks)
-                    log.debug(f"Task execution finished: '{task.task_id()}'.")
+            database = alchemy_engine.url.render_as_string(hide_password=True)
+            metadata_snapshot_file = self.__project.metadata_snapshot_file_from_project()
+            metadata_snapshot = MetadataSnapshot(metadata_snapshot_file, database, alchemy_engine.dialect.name) \
+                if metadata_snapshot_file is not None else None
+            if metadata_snapshot is not None and full_refresh:
+                metadata_snapshot.invalidate()
+            log.debug(f"Building metadata cache.")
+            self.__build_metadata_cache(alchemy_engine, metadata_snapshot if not full_refresh else None)
+            self.__run_state = RunState.load(self.__project.run_state_file_from_project(), database)
+            self.__task_hashes = self.__compute_task_hashes(ordered_tasks)
+            if not full_refresh:
+                ordered_tasks = self.__skip_unchanged_tasks(ordered_tasks, alchemy_engine)
+            self.__run_report = RunReport()
+            try:
+                self.__drop_tables(ordered_tasks, alchemy_engine)
+                with tempfile.TemporaryDirectory() as tmpdirname_for_all_tasks, \
+                        DownloadManager(os.path.join(tmpdirname_for_all_tasks, 'downloads'),
+                                        self.__project.download_workers_from_project(),
+                                        self.__project.download_cache_from_project()) as download_manager:
+                    self.__prefetch_downloads(reversed(ordered_tasks), download_manager)
+                    if jobs > 1:
+                        self.__execute_tasks_in_parallel(ordered_tasks, alchemy_engine, tmpdirname_for_all_tasks,
+                                                         jobs, download_manager)
+                    else:
+                        for task in reversed(ordered_tasks):
+                            self.__execute_task(task, alchemy_engine, tmpdirname_for_all_tasks, download_manager)
+            finally:
+                self.__run_state.save()
+                self.__run_report.finish()
+                self.__run_report.echo_summary()
+                if statement_timer is not None:
+                    statement_timer.echo_summary()
+                    self.__run_report.set_statements(statement_timer.slowest())
+                if report_file is not None:
+                    self.__run_report.save(report_file)
+            # DDL files can change any database object, so the snapshot is kept only for runs without them
+            if metadata_snapshot is not None and not any(isinstance(t, DdlTask) for t in ordered_tasks):
+                metadata_snapshot.save(self.__metadata_cache, self.__reflected_names)
         except OperationalError as o:
             log.error(f"Can't execute model because of: '{o}'.")
             raise ModelExecutionException(f"Can't execute model because of: '{o}'.")
 
-    def __build_metadata_cache(self, alchemy_engine: sqlalchemy.engine.Engine):
+    def __compute_task_hashes(self, tasks_ordered_by_dependencies: List[Task]) -> Dict[str, str]:
+        """
+        Computes hashes of the table tasks' inputs. The hash of a task covers its own inputs (see Task.content_hash),
+        the hashes of the tasks it depends on, and the global and schema prolog DDL. Changes of tables that no
+        planned task produces can't be detected, so the tasks that depend on them have no hash.
+        :param List[Task] tasks_ordered_by_dependencies: tasks ordered by dependencies
+            (as returned from __order_tasks_by_dependencies)
+        :return: task IDs and their hashes (None if the task's inputs can't be hashed)
+        :rtype: Dict[str, str]
+        """
+        execution_order = list(reversed(tasks_ordered_by_dependencies))
+        urls = {data_file_url(f) for t in execution_order if isinstance(t, DataTask) for f in t.data_files()}
+        urls.discard(None)
+        with ThreadPoolExecutor(max_workers=self.__project.download_workers_from_project()) as pool:
+            known_url_validators = dict(zip(urls, pool.map(url_validators, urls)))
+        ddl_hashes = {t.task_id(): t.content_hash() for t in execution_order if isinstance(t, DdlTask)}
+        global_prolog_id = Task.generate_task_id(Task.TASK_TARGET_PROLOG, None)
+        task_hashes = {}
+        for task in execution_order:
+            if not isinstance(task, DbTableTask):
+                continue
+            task_id = task.task_id()
+            schema_prolog_id = Task.generate_task_id(Task.TASK_TARGET_PROLOG, task.target_schema())
+            dependencies = sorted(d for d in self.__task_graph.successors(task_id) if d in task_hashes) \
+                if self.__task_graph.has_node(task_id) else []
+            external_dependencies = [t for t in task.depends_on() if t not in self.__task_index]
+            if len(external_dependencies) > 0:
+                log.debug(f"Task '{task_id}' depends on tables outside the model: '{external_dependencies}'.")
+                task_hashes[task_id] = None
+                continue
+            hashes = [task.content_hash(url_validators=known_url_validators)] + \
+                     [task_hashes[d] for d in dependencies] + \
+                     [ddl_hashes.get(global_prolog_id, ''), ddl_hashes.get(schema_prolog_id, '')]
+            task_hashes[task_id] = None if None in hashes \
+                else hashlib.sha256('|'.join(hashes).encode('utf-8')).hexdigest()
+        return task_hashes
+
+    def __skip_unchanged_tasks(self, tasks_ordered_by_dependencies: List[Task],
+                               alchemy_engine: sqlalchemy.engine.Engine) -> List[Task]:
+        """
+        Removes table tasks whose inputs didn't change since their last successful execution and whose target table
+        exists. A task is never skipped when any task it depends on executes.
+        :param List[Task] tasks_ordered_by_dependencies: tasks ordered by dependencies
+            (as returned from __order_tasks_by_dependencies)
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        :return: tasks to execute ordered by dependencies
+        :rtype: List[Task]
+        """
+        skipped = set()
+        with alchemy_engine.connect() as connection:
+            inspector = sqlalchemy.inspect(connection)
+            for task in reversed(tasks_ordered_by_dependencies):
+                task_id = task.task_id()
+                if not isinstance(task, DbTableTask):
+                    continue
+                task_hash = self.__task_hashes.get(task_id)
+                dependencies = set(self.__task_graph.successors(task_id)) if self.__task_graph.has_node(task_id) \
+                    else set()
+                executed_dependencies = {d for d in dependencies if d in self.__tasks and d not in skipped}
+                # the metadata cache (e.g. loaded from the snapshot) doesn't know about tables dropped outside dbd
+                if task_hash is not None and task_hash == self.__run_state.task_hash(task_id) \
+                        and len(executed_dependencies) == 0 \
+                        and inspector.has_table(task.target(), schema=task.target_schema()):
+                    click.echo(f"Skipping unchanged task: '{task_id}'.")
+                    skipped.add(task_id)
+        return [t for t in tasks_ordered_by_dependencies if t.task_id() not in skipped]
+
+    def __target_exists(self, task: Task) -> bool:
+        """
+        Checks whether the task's target table (or view) exists in the database
+        :param Task task: task
+        :return: True if the target exists
+        :rtype: bool
+        """
+        schema = task.target_schema() if task.target_schema() is not None else Task.TOP_LEVEL_SCHEMA_NAME
+        metadata = self.__metadata_cache.get(schema)
+        return metadata is not None and task.fully_qualified_target(quoted=False) in metadata.tables
+
+    def __prefetch_downloads(self, tasks: Iterable[Task], download_manager: DownloadManager):
+        """
+        Starts downloading all URLs and Kaggle datasets referenced by the data tasks in background. The downloads
+        run in the task execution order, so the data of the first tasks are available first.
+        :param Iterable[Task] tasks: tasks in execution order
+        :param DownloadManager download_manager: download manager
+        """
+        for task in tasks:
+            if isinstance(task, DataTask):
+                for data_file in task.data_files():
+                    url = data_file_download(data_file)
+                    if url is not None:
+                        download_manager.prefetch(url)
+
+    def __execute_task(self, task: Task, alchemy_engine: sqlalchemy.engine.Engine, tmpdirname_for_all_tasks: str,
+                       download_manager: DownloadManager = None):
+        """
+        Executes a single task
+        :param Task task: task to execute
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine database connection (both target and source)
+        :param str tmpdirname_for_all_tasks: temporary directory shared by all tasks
+        :param DownloadManager download_manager: download manager that prefetches the data tasks' URLs
+        """
+        schema = task.target_schema() if task.target_schema() is not None else Task.TOP_LEVEL_SCHEMA_NAME
+        click.echo(f"Executing task: '{task.task_id()}'.")
+        log.debug(f"Executing task: '{task.task_id()}'.")
+        # the task's target is incomplete until the task finishes
+        self.__run_state.set_task_hash(task.task_id(), None)
+        # all statements of the task share a single connection (one pool checkout per task)
+        with self.__run_report.task(task.task_id()), alchemy_engine.connect() as connection:
+            watermark = self.__incremental_watermark(task, alchemy_engine, connection)
+            task.create(self.__metadata_cache[schema], alchemy_engine,
+                        copy_stage_storage=self.__project.copy_stage_from_project(),
+                        sqlite_pragmas=self.__project.sqlite_pragmas_from_project(),
+                        global_tmpdir=tmpdirname_for_all_tasks,
+                        download_manager=download_manager,
+                        run_report=self.__run_report,
+                        connection=connection,
+                        watermark=watermark)
+            if isinstance(task, DbTableTask) and task.swap_load():
+                click.echo(f"\tSwapping table '{task.fully_qualified_target(quoted=False)}'.")
+                with self.__run_report.phase(task.task_id(), PHASE_SWAP):
+                    task.swap(self.__metadata_cache[schema], alchemy_engine, connection)
+            elif isinstance(task, DbTableTask) and task.merge_load():
+                click.echo(f"\tMerging table '{task.fully_qualified_target(quoted=False)}'.")
+                with self.__run_report.phase(task.task_id(), PHASE_MERGE) as merge:
+                    merge.add(rows=task.merge(self.__metadata_cache[schema], alchemy_engine, connection))
+        if isinstance(task, DbTableTask) and not self.__target_exists(task):
+            # e.g. views are created by plain SQL, so they must be reflected to keep the metadata cache complete
+            self.__reflect_tables(self.__metadata_cache[schema], {task.target().lower()})
+        if isinstance(task, DbTableTask):
+            self.__run_state.set_task_hash(task.task_id(), self.__task_hashes.get(task.task_id()))
+        log.debug(f"Task execution finished: '{task.task_id()}'.")
+
+    def __incremental_watermark(self, task: Task, alchemy_engine: sqlalchemy.engine.Engine,
+                                connection: sqlalchemy.engine.Connection) -> Any:
+        """
+        Reads the incremental task's watermark from its target table. The SQL of the incremental ELT tasks
+        is rendered again with the watermark.
+        :param Task task: task to execute
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection that the task uses
+        :return: watermark or None if the task isn't incremental or its target table is empty
+        :rtype: Any
+        """
+        if not isinstance(task, DbTableTask) or task.incremental_column() is None:
+            return None
+        watermark = task.watermark(alchemy_engine, connection)
+        if watermark is not None:
+            click.echo(f"\tLoading rows with '{task.incremental_column()}' above '{watermark}'.")
+        runtime_def = task.runtime_def()
+        if isinstance(task, EltTask) and runtime_def.get('sql_file') is not None:
+            task.set_sql(self.__render_sql_file(runtime_def['sql_file'], runtime_def['schema'],
+                                                runtime_def['table'], watermark))
+        return watermark
+
+    def __execute_tasks_in_parallel(self, tasks_ordered_by_dependencies: List[Task],
+                                    alchemy_engine: sqlalchemy.engine.Engine, tmpdirname_for_all_tasks: str,
+                                    jobs: int, download_manager: DownloadManager = None):
+        """
+        Executes tasks on a thread pool. A task is submitted as soon as all tasks it depends on are finished.
+        Ready tasks are submitted in the same order as the sequential execution would run them.
+        :param List[Task] tasks_ordered_by_dependencies: tasks ordered by dependencies
+            (as returned from __order_tasks_by_dependencies)
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine database connection (both target and source)
+        :param str tmpdirname_for_all_tasks: temporary directory shared by all tasks
+        :param int jobs: maximal number of concurrently executed tasks
+        :param DownloadManager download_manager: download manager that prefetches the data tasks' URLs
+        """
+        pool = alchemy_engine.pool
+        # each running task holds a connection, the metadata reflection needs one more
+        # (QueuePool doesn't expose max_overflow, negative value means unlimited overflow)
+        max_overflow = getattr(pool, '_max_overflow', -1)
+        if isinstance(pool, QueuePool) and 0 <= max_overflow and pool.size() + max_overflow < jobs + 1:
+            log.warning(f"The connection pool ({pool.size()} + {max_overflow} overflow connections) is smaller than "
+                        f"{jobs + 1} connections needed for {jobs} parallel jobs. Increase 'db.pool_size' or "
+                        f"'db.max_overflow' in the profile.")
+        execution_order = list(reversed(tasks_ordered_by_dependencies))
+        task_positions = {t.task_id(): i for i, t in enumerate(execution_order)}
+        dependencies = self.__task_dependencies(execution_order)
+        dependents = {task_id: [] for task_id in dependencies}
+        for task_id, task_dependencies in dependencies.items():
+            for dependency in task_dependencies:
+                dependents[dependency].append(task_id)
+        unfinished_dependencies = {task_id: len(d) for task_id, d in dependencies.items()}
+        ready = [(task_positions[task_id], task_id) for task_id, c in unfinished_dependencies.items() if c == 0]
+        heapq.heapify(ready)
+        running = {}
+        error = None
+        log.debug(f"Executing tasks in parallel with {jobs} jobs.")
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while (ready and error is None) or running:
+                while ready and error is None and len(running) < jobs:
+                    position, task_id = heapq.heappop(ready)
+                    future = pool.submit(self.__execute_task, execution_order[position], alchemy_engine,
+                                         tmpdirname_for_all_tasks, download_manager)
+                    running[future] = task_id
+                finished, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task_id = running.pop(future)
+                    if future.exception() is not None:
+                        log.error(f"Task '{task_id}' failed: '{future.exception()}'.")
+                        # stop scheduling new tasks, but let the running ones finish
+                        error = error if error is not None else future.exception()
+                        continue
+                    for dependent in dependents[task_id]:
+                        unfinished_dependencies[dependent] -= 1
+                        if unfinished_dependencies[dependent] == 0:
+                            heapq.heappush(ready, (task_positions[dependent], dependent))
+        if error is not None:
+            raise error
+
+    def __task_dependencies(self, execution_order: List[Task]) -> Dict[str, Set[str]]:
+        """
+        Computes the IDs of tasks that each task must wait for. Table tasks wait for the tasks they depend on
+        (foreign keys, SQL) and for the prolog of their schema and the global prolog. Schema epilog waits
+        for all tasks in its schema. The global epilog waits for all other tasks.
+        :param List[Task] execution_order: tasks in the sequential execution order
+        :return: IDs of tasks that each task depends on
+        :rtype: Dict[str, Set[str]]
+        """
+        task_ids = set([t.task_id() for t in execution_order])
+        global_prolog_id = Task.generate_task_id(Task.TASK_TARGET_PROLOG, None)
+        global_epilog_id = Task.generate_task_id(Task.TASK_TARGET_EPILOG, None)
+        dependencies = {}
+        for task in execution_order:
+            task_id = task.task_id()
+            schema_prolog_id = Task.generate_task_id(Task.TASK_TARGET_PROLOG, task.target_schema())
+            if task_id == global_prolog_id:
+                task_dependencies = set()
+            elif task_id == global_epilog_id:
+                task_dependencies = task_ids - {task_id}
+            elif isinstance(task, DdlTask) and task.target() == Task.TASK_TARGET_PROLOG:
+                task_dependencies = {global_prolog_id}
+            elif isinstance(task, DdlTask) and task.target() == Task.TASK_TARGET_EPILOG:
+                task_dependencies = {t.task_id() for t in execution_order
+                                     if t.target_schema() == task.target_schema() and t.task_id() != task_id}
+                task_dependencies.update([global_prolog_id, schema_prolog_id])
+            else:
+                task_dependencies = set(self.__task_graph.successors(task_id)) \
+                    if self.__task_graph.has_node(task_id) else set()
+                task_dependencies.update([global_prolog_id, schema_prolog_id])
+            dependencies[task_id] = task_dependencies & task_ids
+        return dependencies
+
+    def __reflection_targets(self) -> Dict[str, Set[str]]:
+        """
+        Collects the tables that the tasks target or depend on. Only these tables are reflected to the metadata cache.
+        :return: lower-case table names per schema (Task.TOP_LEVEL_SCHEMA_NAME for the top-level schema)
+        :rtype: Dict[str, Set[str]]
+        """
+        schemas = set([t.target_schema() for t in self.__tasks.values() if t.target_schema() is not None])
+        reflection_targets = {s: set() for s in schemas}
+        reflection_targets[Task.TOP_LEVEL_SCHEMA_NAME] = set()
+        for task in self.__tasks.values():
+            for table in [task.fully_qualified_target(quoted=False)] + task.depends_on():
+                name_parts = table.split('.')
+                schema = name_parts[-2] if len(name_parts) > 1 else Task.TOP_LEVEL_SCHEMA_NAME
+                # tables in schemas without tasks aren't cached
+                if schema in reflection_targets:
+                    reflection_targets[schema].add(name_parts[-1].lower())
+        return reflection_targets
+
+    def __reflect_tables(self, metadata: MetaData, table_names: Set[str]):
+        """
+        Reflects the tables (or views) to the metadata. Tables that don't exist are ignored.
+        :param MetaData metadata: SQLAlchemy MetaData of the tables' schema
+        :param Set[str] table_names: lower-case table names
+        """
+        log.debug(f"Reflecting tables '{table_names}' in schema '{metadata.schema}'.")
+        with metadata_lock(metadata):
+            metadata.reflect(views=True, quote=True, schema=metadata.schema,
+                             only=lambda table_name, _: table_name.lower() in table_names)
+
+    def __build_metadata_cache(self, alchemy_engine: sqlalchemy.engine.Engine, snapshot: MetadataSnapshot = None):
         # noinspection GrazieInspection
         """
-        Builds cache of SQLAlchemy MetaData objects. There is one MetaData object per schema.
+        Builds cache of SQLAlchemy MetaData objects. There is one MetaData object per schema. Only the tables
+        that the tasks target or depend on are reflected. Tables that are already known from the metadata
+        snapshot aren't reflected again.
         :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine / database connection (both target and source
         schemas) for database objects creation, ELT tasks, etc.
-        """
-        # distinct schemas
-        schemas = list(set([s.target_schema() for s in self.__tasks.values() if s.target_schema() is not None]))
-        log.debug(f"Processing schemas: '{schemas}'.")
-        for s in schemas:
-            log.debug(f"Adding metadata cache for schema {s}.")
-            m = MetaData(bind=alchemy_engine, schema=s if s is not None and len(s) > 0 else None, quote_schema=True)
-            log.debug(f"Metadata created.")
-            m.reflect(views=True, quote=True, schema=s if s is not None and len(s) > 0 else None)
-            log.debug(f"Metadata reflected.")
-            self.__metadata_cache[s] = m
-            log.debug(f"Metadata cache for schema {s} added.")
-        # MetaData for the top-level objects and DDL
-        log.debug(f"Adding metadata cache for top level schema.")
-        m = MetaData(bind=alchemy_engine, schema=None, quote_schema=True)
-        log.debug(f"Metadata created.")
-        m.reflect(views=True, quote=True)
-        log.debug(f"Metadata reflected.")
-        self.__metadata_cache[Task.TOP_LEVEL_SCHEMA_NAME] = m
-        log.debug(f"Metadata cache for top level schema added.")
+        :param MetadataSnapshot snapshot: metadata snapshot from the previous run or None
+        """
+        reflection_targets = self.__reflection_targets()
+        if snapshot is not None:
+            self.__metadata_cache, self.__reflected_names = snapshot.load(alchemy_engine)
+        log.debug(f"Processing schemas: '{list(reflection_targets.keys())}'.")
+        for s, table_names in reflection_targets.items():
+            m = self.__metadata_cache.get(s)
+            if m is None:
+                log.debug(f"Adding metadata cache for schema {s}.")
+                # MetaData for the top-level objects and DDL has no schema
+                m = MetaData(bind=alchemy_engine, schema=s if s != Task.TOP_LEVEL_SCHEMA_NAME else None,
+                             quote_schema=True)
+                self.__metadata_cache[s] = m
+            reflected_names = self.__reflected_names.setdefault(s, set())
+            missing_names = table_names - reflected_names
+            if len(missing_names) > 0:
+                self.__reflect_tables(m, missing_names)
+                reflected_names.update(missing_names)
+            log.debug(f"Metadata cache for schema {s} ready.")
 
     def __apply_template(self, file: str, params: Dict[Any, Any]) -> str:
         """
@@ -197,7 +583,8 @@ class ModelExecutor:
                     references.append(relative_path_to_base_dir_no_ext('', self.__model_directory, line))
         return references
 
-    def __process_reference_file(self, model_root: str, dir_name: str, file_name: str, file_extension: str):
+    def __process_reference_file(self, model_root: str, dir_name: str, file_name: str,
+                                 file_extension: str) -> Tuple[Dict[str, Any], List[str]]:
         """
         Process file with multiple references to other files (either on a filesystem or URLs).
         Creates multiple data tasks.
@@ -205,6 +592,8 @@ class ModelExecutor:
         :param str dir_name: schema directory
         :param str file_name: data file
         :param str file_extension: data file extension
+        :return: data task definition and list of references
+        :rtype: Tuple[Dict[str, Any], List[str]]
         """
         file_name_absolute = relative_path_to_base_dir(self.__model_directory, model_root, file_name, file_extension)
         log.debug(f"Processing reference file '{file_name_absolute}'.")
@@ -213,57 +602,73 @@ class ModelExecutor:
         refs = self.__read_references(processed_file, model_root)
         # do we have corresponding yaml config file?
         task_def = self.__load_yaml_metadata(model_root, dir_name, file_name, template_params)
-        task = DataTask.from_code(task_def)
-        task.set_data_files(refs)
-        self.__tasks[task.task_id()] = task
-        log.debug(f"Added reference file task: task_id='{task.task_id()}', task_data='{task.task_data()}'.")
+        return task_def, refs
 
-    def __process_data_file(self, model_root: str, dir_name: str, file_name: str, file_extension: str):
+    def __process_data_file(self, model_root: str, dir_name: str, file_name: str,
+                            file_extension: str) -> Tuple[Dict[str, Any], List[str]]:
         """
         Process CSV file. Creates EltTask
         :param str model_root: model root directory
         :param str dir_name: schema directory
         :param str file_name: data file
         :param str file_extension: data file extension
+        :return: data task definition and list of data files
+        :rtype: Tuple[Dict[str, Any], List[str]]
         """
         file_name_absolute = relative_path_to_base_dir(self.__model_directory, model_root, file_name, file_extension)
         log.debug(f"Processing CSV file '{file_name_absolute}'.")
         template_params = dict(schema=dir_name, table=file_name, session=self)
         # do we have corresponding yaml config file?
         task_def = self.__load_yaml_metadata(model_root, dir_name, file_name, template_params)
-        task = DataTask.from_code(task_def)
-        task.set_data_files([os.path.join(self.__model_directory, file_name_absolute)])
-        self.__tasks[task.task_id()] = task
-        log.debug(f"Added data file task: task_id='{task.task_id()}', task_data='{task.task_data()}'.")
+        return task_def, [os.path.join(self.__model_directory, file_name_absolute)]
 
-    def __process_sql_file(self, model_root: str, dir_name: str, file_name: str, file_extension: str):
+    def __process_sql_file(self, model_root: str, dir_name: str, file_name: str,
+                           file_extension: str) -> Tuple[Dict[str, Any], str]:
         """
         Process SQL (usually INSERT from SELECT) file. Creates EltTask
         :param str model_root: model root directory
         :param str dir_name: schema directory
         :param str file_name: SQL file
         :param str file_extension: SDL file extension
+        :return: ELT task definition and SQL statement
+        :rtype: Tuple[Dict[str, Any], str]
         """
 
         file_name_absolute = relative_path_to_base_dir(self.__model_directory, model_root, file_name, file_extension)
         log.debug(f"Processing SQL file '{file_name_absolute}'.")
         template_params = dict(schema=dir_name, table=file_name, session=self)
-        processed_file = self.__apply_template(file_name_absolute, template_params)
-        sql = SqlParser.compact_sql(processed_file)
+        # the SQL of the full load, incremental tasks are rendered again with the watermark before execution
+        sql = self.__render_sql_file(file_name_absolute, dir_name, file_name)
         # do we have corresponding yaml config file?
         task_def = self.__load_yaml_metadata(model_root, dir_name, file_name, template_params)
-        task = EltTask.from_code(task_def)
-        task.set_task_data(sql)
-        self.__tasks[task.task_id()] = task
-        log.debug(f"Added SQL file task: task_id='{task.task_id()}', task_data='{task.task_data()}'.")
+        task_def['runtime']['sql_file'] = file_name_absolute
+        return task_def, sql
 
-    def __process_ddl_file(self, model_root: str, dir_name: str, file_name: str, file_extension: str):
+    def __render_sql_file(self, file_name_absolute: str, dir_name: str, file_name: str, watermark: Any = None) -> str:
+        """
+        Renders SQL file's Jinja2 template
+        :param str file_name_absolute: SQL file relative to the model directory
+        :param str dir_name: schema directory
+        :param str file_name: SQL file name without extension
+        :param Any watermark: incremental load's watermark. The template gets its SQL literal
+            in the 'watermark' variable (None if there is no watermark).
+        :return: SQL statement
+        :rtype: str
+        """
+        template_params = dict(schema=dir_name, table=file_name, session=self,
+                               watermark=sql_literal(watermark) if watermark is not None else None)
+        return SqlParser.compact_sql(self.__apply_template(file_name_absolute, template_params))
+
+    def __process_ddl_file(self, model_root: str, dir_name: str, file_name: str,
+                           file_extension: str) -> Tuple[Dict[str, Any], List[str]]:
         """
         Process DDL (SQL DDL & DML statements)  file. Creates DdlTask
         :param str model_root: model root directory
         :param str dir_name: schema directory
         :param str file_name: DDL file
         :param str file_extension: DDL file extension
+        :return: DDL task definition (runtime only) and DDL statements
+        :rtype: Tuple[Dict[str, Any], List[str]]
         """
         file_name_absolute = relative_path_to_base_dir(self.__model_directory, model_root, file_name, file_extension)
         log.debug(f"Processing DDL file '{file_name_absolute}'.")
@@ -271,11 +676,7 @@ class ModelExecutor:
         processed_file = self.__apply_template(file_name_absolute, template_params)
         sql_without_comments = SqlParser.remove_sql_comments(processed_file)
         ddl = re.split(r';\s*$', sql_without_comments, flags=re.MULTILINE)
-
-        task = DdlTask.from_code(file_name, dir_name)
-        task.set_task_data(ddl)
-        self.__ddl_tasks[task.task_id()] = task
-        log.debug(f"Added DDL file task: task_id='{task.task_id()}', task_data='{task.task_data()}'.")
+        return dict(runtime=dict(table=file_name, schema=dir_name)), ddl
 
     def __load_yaml_metadata(self, model_root: str, dir_name: str, file_name: str, template_params: Dict[Any, Any]):
         """
@@ -291,32 +692,153 @@ class ModelExecutor:
         if exists(os.path.join(self.__model_directory, yaml_file_name_absolute)):
             log.debug(f"YAML config found '{os.path.join(self.__model_directory, yaml_file_name_absolute)}'.")
             processed_yaml = self.__apply_template(yaml_file_name_absolute, template_params)
-            config = yaml.safe_load(processed_yaml)
+            config = yaml.load(processed_yaml, Loader=YAML_LOADER)
             task_def.update(config)
             log.debug(f"Task definition enriched to task_def='{task_def}'.")
         return task_def
 
+    def __template_dependencies(self, template_files: List[str]) -> Set[str]:
+        """
+        Returns the templates that the template files include, import, or extend (recursively)
+        :param List[str] template_files: template files relative to the model directory
+        :return: referenced templates or None if a template references a template by a dynamic (computed) name
+        :rtype: Set[str]
+        """
+        dependencies = set()
+        pending = list(template_files)
+        while len(pending) > 0:
+            template_file = pending.pop()
+            try:
+                source = self.__jinja_model_env.loader.get_source(self.__jinja_model_env, template_file)[0]
+            except TemplateNotFound:
+                continue
+            # files without Jinja2 statements can't reference other templates
+            if '{%' not in source:
+                continue
+            for referenced_template in meta.find_referenced_templates(self.__jinja_model_env.parse(source)):
+                if referenced_template is None:
+                    return None
+                if referenced_template not in dependencies:
+                    dependencies.add(referenced_template)
+                    pending.append(referenced_template)
+        return dependencies
+
+    def __model_file_cache_key(self, model_root: str, dir_name: str, file_name: str,
+                               file_extension: str) -> List[Any]:
+        """
+        Returns model cache key of the model file. The key changes when the model file, its YAML file, or any template
+        they include changes (modification time or size) or when the file's template parameters change.
+        :param str model_root: model root directory
+        :param str dir_name: schema directory
+        :param str file_name: model file name without extension
+        :param str file_extension: model file extension
+        :return: model cache key or None if the model file can't be cached (e.g. it includes a template
+            by a dynamic name)
+        :rtype: List[Any]
+        """
+        model_files = [relative_path_to_base_dir(self.__model_directory, model_root, file_name, file_extension),
+                       relative_path_to_base_dir(self.__model_directory, model_root, file_name, 'yaml')]
+        # data files aren't templates
+        template_files = model_files if MODEL_FILE_TYPES.get(file_extension.lower()) != MODEL_FILE_DATA \
+            else model_files[1:]
+        dependencies = self.__template_dependencies(template_files)
+        if dependencies is None:
+            return None
+        file_stats = []
+        for f in model_files + sorted(dependencies):
+            try:
+                stat = os.stat(os.path.join(self.__model_directory, f))
+                file_stats.append([f, stat.st_mtime_ns, stat.st_size])
+            except FileNotFoundError:
+                file_stats.append([f, None])
+        template_params = json.dumps(dict(schema=dir_name, table=file_name, model_directory=self.__model_directory),
+                                     sort_keys=True)
+        return file_stats + [hashlib.sha256(template_params.encode('utf-8')).hexdigest()]
+
+    def __parse_model_file(self, model_file: Tuple[str, str, str, str, str],
+                           model_cache: ModelCache = None) -> Tuple[Dict[str, Any], Any, List[str]]:
+        """
+        Parses a model file (or returns it from the model cache)
+        :param Tuple[str, str, str, str, str] model_file: model file type, model root directory, schema directory,
+            file name and file extension
+        :param ModelCache model_cache: model cache or None
+        :return: task definition, task data, and tables that the SQL statement depends on (SQL files only)
+        :rtype: Tuple[Dict[str, Any], Any, List[str]]
+        """
+        file_type, model_root, dir_name, file_name, file_extension = model_file
+        cache_entry, cache_key = None, None
+        if model_cache is not None:
+            cache_entry = relative_path_to_base_dir(self.__model_directory, model_root, file_name, file_extension)
+            cache_key = self.__model_file_cache_key(model_root, dir_name, file_name, file_extension)
+            parsed_file = model_cache.get(cache_entry, cache_key) if cache_key is not None else None
+            if parsed_file is not None:
+                log.debug(f"Model file '{cache_entry}' found in the model cache.")
+                return parsed_file
+        if file_type == MODEL_FILE_SQL:
+            task_def, sql = self.__process_sql_file(model_root, dir_name, file_name, file_extension)
+            parsed_file = [task_def, sql, SqlParser.extract_tables(sql)]
+        elif file_type == MODEL_FILE_DDL:
+            parsed_file = list(self.__process_ddl_file(model_root, dir_name, file_name, file_extension)) + [None]
+        elif file_type == MODEL_FILE_REF:
+            parsed_file = list(self.__process_reference_file(model_root, dir_name, file_name, file_extension)) + [None]
+        else:
+            parsed_file = list(self.__process_data_file(model_root, dir_name, file_name, file_extension)) + [None]
+        if model_cache is not None and cache_key is not None:
+            model_cache.put(cache_entry, cache_key, parsed_file)
+        return parsed_file
+
+    def __add_task(self, file_type: str, task_def: Dict[str, Any], task_data: Any, sql_tables: List[str] = None):
+        """
+        Creates a task from the parsed model file and adds it to the model
+        :param str file_type: model file type
+        :param Dict[str, Any] task_def: task definition
+        :param Any task_data: task data (SQL statement, DDL statements, data files, or references)
+        :param List[str] sql_tables: tables that the SQL statement depends on (SQL files only)
+        """
+        if file_type == MODEL_FILE_DDL:
+            task = DdlTask.from_code(task_def['runtime']['table'], task_def['runtime']['schema'])
+            task.set_task_data(task_data)
+            self.__ddl_tasks[task.task_id()] = task
+            log.debug(f"Added DDL file task: task_id='{task.task_id()}', task_data='{task.task_data()}'.")
+        elif file_type == MODEL_FILE_SQL:
+            task = EltTask.from_code(task_def)
+            task.set_sql(task_data, sql_tables)
+            self.__tasks[task.task_id()] = task
+            log.debug(f"Added SQL file task: task_id='{task.task_id()}', task_data='{task.task_data()}'.")
+        else:
+            task = DataTask.from_code(task_def)
+            task.set_data_files(task_data)
+            self.__tasks[task.task_id()] = task
+            log.debug(f"Added {file_type} file task: task_id='{task.task_id()}', task_data='{task.task_data()}'.")
+
     def __populate_model_from_directory(self):
         """
         Crawls the model directory and collects all code files to a directory
-        hashed by a target's name (e.g. database table name)
+        hashed by a target's name (e.g. database table name). The files are parsed concurrently and
+        the parsed files are cached in the model cache (unless it's disabled in the project).
         """
+        model_files = []
         for model_root, dirs, files in os.walk(self.__model_directory, topdown=True):
             for filename in files:
                 dir_name = f"{remove_prefix(model_root, self.__model_directory)}".split('/')[-1]
                 schema_name = dir_name if len(dir_name) > 0 else None
                 file_name, extension = os.path.splitext(filename)
-                if extension.lower() == '.sql':
-                    self.__process_sql_file(model_root, schema_name, file_name, extension)
-                if extension.lower() == '.ddl':
-                    self.__process_ddl_file(model_root, schema_name, file_name, extension)
-                elif extension.lower() in ['.csv', '.json', '.xls', '.xlsx', '.xlsm', '.xlsb', '.odf', '.ods', '.odt',
-                                           '.parquet']:
-                    self.__process_data_file(model_root, schema_name, file_name, extension)
-                elif extension.lower() in ['.ref']:
-                    self.__process_reference_file(model_root, schema_name, file_name, extension)
-                elif extension.lower() == '.yaml':
-                    pass
+                if extension.lower() in COMPRESSION_EXTENSIONS:
+                    # the table name is the stem of a compressed data file (e.g. population.csv.gz)
+                    file_name, data_extension = os.path.splitext(file_name)
+                    extension = f"{data_extension}{extension}"
+                file_type = MODEL_FILE_TYPES.get(extension.lower())
+                if file_type is not None:
+                    model_files.append((file_type, model_root, schema_name, file_name, extension))
+        model_cache_file = self.__project.model_cache_file_from_project()
+        model_cache = ModelCache(model_cache_file) if model_cache_file is not None else None
+        with ThreadPoolExecutor(thread_name_prefix='dbd-model') as pool:
+            parsed_files = list(pool.map(lambda f: self.__parse_model_file(f, model_cache), model_files))
+        # tasks are added in the directory walk order, so the model is the same as with sequential parsing
+        for model_file, parsed_file in zip(model_files, parsed_files):
+            self.__add_task(model_file[0], *parsed_file)
+        if model_cache is not None:
+            model_cache.save()
 
     def __drop_tables(self, tasks_ordered_by_dependencies: List[Task], alchemy_engine: sqlalchemy.engine.Engine):
         # noinspection GrazieInspection
@@ -327,21 +849,34 @@ class ModelExecutor:
                 :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
                 (both target and source schemas) for database objects creation, ELT tasks, etc.
                 """
-        for task in tasks_ordered_by_dependencies:
-            schema = task.target_schema() if task.target_schema() is not None else Task.TOP_LEVEL_SCHEMA_NAME
-            if isinstance(task, DbTableTask):
-                # TODO: decide whether the default=drop is a good idea
-                mode = task.process_def().get('mode', 'drop')
-                if mode == 'drop':
-                    log.debug(f"Dropping task with task_id='{task.task_id()}'.")
-                    click.echo(f"Dropping tables for task_id='{task.task_id()}'.")
-                    task.drop(self.__metadata_cache[schema], alchemy_engine)
-                    log.debug(f"Dropped task with task_id='{task.task_id()}'.")
-                elif mode == 'truncate':
-                    log.debug(f"Truncating task with task_id='{task.task_id()}'.")
-                    click.echo(f"Truncating tables for task_id='{task.task_id()}'.")
-                    task.truncate(self.__metadata_cache[schema], alchemy_engine)
-                    log.debug(f"Truncated task with task_id='{task.task_id()}'.")
+        # all tables are dropped on a single connection
+        with alchemy_engine.connect() as connection:
+            for task in tasks_ordered_by_dependencies:
+                schema = task.target_schema() if task.target_schema() is not None else Task.TOP_LEVEL_SCHEMA_NAME
+                if isinstance(task, DbTableTask):
+                    # TODO: decide whether the default=drop is a good idea
+                    mode = task.process_def().get('mode', 'drop')
+                    if task.shadow_load():
+                        # the target table is kept until the new data are loaded
+                        log.debug(f"Dropping shadow tables of task_id='{task.task_id()}'.")
+                        task.drop_shadow_tables(alchemy_engine, connection)
+                    elif mode in ['drop', 'swap', 'merge']:
+                        log.debug(f"Dropping task with task_id='{task.task_id()}'.")
+                        click.echo(f"Dropping tables for task_id='{task.task_id()}'.")
+                        with self.__run_report.phase(task.task_id(), PHASE_DROP):
+                            task.drop(self.__metadata_cache[schema], alchemy_engine, connection)
+                        # keep the metadata cache in sync without reflecting it again
+                        with metadata_lock(self.__metadata_cache[schema]):
+                            dropped_table = self.__metadata_cache[schema].tables.get(
+                                task.fully_qualified_target(quoted=False))
+                            if dropped_table is not None:
+                                self.__metadata_cache[schema].remove(dropped_table)
+                        log.debug(f"Dropped task with task_id='{task.task_id()}'.")
+                    elif mode == 'truncate':
+                        log.debug(f"Truncating task with task_id='{task.task_id()}'.")
+                        click.echo(f"Truncating tables for task_id='{task.task_id()}'.")
+                        task.truncate(self.__metadata_cache[schema], alchemy_engine, connection)
+                        log.debug(f"Truncated task with task_id='{task.task_id()}'.")
 
     def __find_task_by_fully_qualified_target_name(self, fully_qualified_target_name):
         """
@@ -349,8 +884,7 @@ class ModelExecutor:
         :param fully_qualified_target_name: fully qualified target name
         :return: task with the target with matching name
         """
-        found = [t for t in self.__tasks.values()
-                 if t.fully_qualified_target(quoted=False) == fully_qualified_target_name]
+        found = self.__task_index.get(fully_qualified_target_name, [])
         if len(found) < 1:
             raise InvalidModelException(
                 f"Invalid model: task with fully qualified name '{fully_qualified_target_name}' "
@@ -369,6 +903,7 @@ class ModelExecutor:
         :rtype: List[Task]
         """
         log.debug(f"Ordering tasks '{self.__tasks.keys()}'.")
+        self.__index_tasks()
         dag_edges = []
         # order task by dependencies (items with most dependencies are at the beginning)
         for task in self.__tasks.values():
@@ -382,12 +917,10 @@ class ModelExecutor:
                     pass
         graph = nx.DiGraph()
         graph.add_edges_from(dag_edges)
+        self.__task_graph = graph
         ordered_task_ids = list(nx.topological_sort(graph))
         ordered_tasks = [self.__tasks[tid] for tid in ordered_task_ids]
-        independent_tasks = []
-        for task in self.__tasks.values():
-            if task not in ordered_tasks:
-                independent_tasks.append(task)
+        independent_tasks = [t for t in self.__tasks.values() if not graph.has_node(t.task_id())]
         dag_order = independent_tasks + ordered_tasks
         # now we need to place the DDL tasks prolog at the end of each schema, epilog at the beginning
         # first remove the global epilog and prolog if they exist
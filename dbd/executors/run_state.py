@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, TypeVar
+
+from dbd.log.dbd_exception import DbdException
+
+log = logging.getLogger(__name__)
+
+RunStateType = TypeVar('RunStateType', bound='RunState')
+
+RUN_STATE_VERSION = 1
+
+
+class RunStateException(DbdException):
+    pass
+
+
+class RunState:
+    """
+    Run state manifest. Stores hashes of the inputs of the tasks that were successfully executed in a database,
+    so the next run can skip tasks whose inputs didn't change. The manifest file can hold states of multiple databases.
+    """
+
+    def __init__(self, state_file: str, database: str, task_hashes: Dict[str, str]):
+        """
+        Constructor
+        :param str state_file: run state manifest file
+        :param str database: database identification (e.g. URL without password)
+        :param Dict[str, str] task_hashes: task hashes of the database
+        """
+        self.__state_file = state_file
+        self.__database = database
+        self.__task_hashes = task_hashes
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def load(cls, state_file: str, database: str) -> RunStateType:
+        """
+        Loads the database's run state from the manifest file
+        :param str state_file: run state manifest file
+        :param str database: database identification (e.g. URL without password)
+        :return: run state (empty if the manifest file doesn't exist)
+        :rtype: RunState
+        """
+        task_hashes = {}
+        if os.path.exists(state_file):
+            try:
+                with open(state_file, 'r') as f:
+                    state = json.load(f)
+                if state.get('version') == RUN_STATE_VERSION:
+                    task_hashes = state.get('databases', {}).get(database, {})
+                else:
+                    log.warning(f"Ignoring run state file '{state_file}' with unsupported version.")
+            except ValueError as e:
+                log.warning(f"Ignoring corrupted run state file '{state_file}': {e}")
+        return RunState(state_file, database, task_hashes)
+
+    def task_hash(self, task_id: str) -> str:
+        """
+        Returns the hash of the task's inputs from its last successful execution
+        :param str task_id: task ID
+        :return: hash of the task's inputs or None if the task hasn't been executed
+        :rtype: str
+        """
+        with self.__lock:
+            return self.__task_hashes.get(task_id)
+
+    def set_task_hash(self, task_id: str, task_hash: str):
+        """
+        Records the hash of the task's inputs after its successful execution
+        :param str task_id: task ID
+        :param str task_hash: hash of the task's inputs (None removes the task from the state)
+        """
+        with self.__lock:
+            if task_hash is None:
+                self.__task_hashes.pop(task_id, None)
+            else:
+                self.__task_hashes[task_id] = task_hash
+
+    def save(self):
+        """
+        Saves the database's run state to the manifest file. States of other databases are preserved.
+        """
+        with self.__lock:
+            state = dict(version=RUN_STATE_VERSION, databases={})
+            if os.path.exists(self.__state_file):
+                try:
+                    with open(self.__state_file, 'r') as f:
+                        existing_state = json.load(f)
+                    if existing_state.get('version') == RUN_STATE_VERSION:
+                        state = existing_state
+                except ValueError:
+                    pass
+            state.setdefault('databases', {})[self.__database] = self.__task_hashes
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.__state_file)), exist_ok=True)
+                with open(f"{self.__state_file}.tmp", 'w') as f:
+                    json.dump(state, f, indent=2, sort_keys=True)
+                os.replace(f"{self.__state_file}.tmp", self.__state_file)
+            except OSError as e:
+                raise RunStateException(f"Can't save run state file '{self.__state_file}': {e}")
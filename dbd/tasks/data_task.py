@@ -1,26 +1,34 @@
 import csv
+import hashlib
+import itertools
+import json
 import logging
 import os
 import tempfile
 from datetime import datetime, date
-from io import StringIO
-from typing import Dict, List, Any, TypeVar
+from decimal import Decimal
+from typing import Dict, List, Any, TypeVar, Iterator, Tuple, Callable
 
 import click
 import pandas as pd
-import s3fs
 import sqlalchemy.engine
 from requests import HTTPError
-from snowflake.connector.pandas_tools import write_pandas
 from sqlalchemy import Column, TEXT, TIMESTAMP, DATE, INT, FLOAT, BOOLEAN
 
 from dbd.config.dbd_project import DbdProjectConfigException
+from dbd.db.db_connection import connection_scope
+from dbd.db.db_introspection import arrow_schema_columns
 from dbd.db.db_table import DbTable
 from dbd.log.dbd_exception import DbdException
 from dbd.tasks.db_table_task import DbTableTask
-from dbd.utils.io_utils import download_file, url_to_filename, is_zip, extract_zip_file, zip_to_url_and_locator, \
-    is_kaggle, extract_kaggle_dataset_id_and_zip_name, download_kaggle
+from dbd.utils.download_manager import DownloadManager
+from dbd.utils.io_utils import download_file, url_to_filename, is_zip, zip_to_url_and_locator, zip_member_locator, \
+    is_kaggle, extract_kaggle_dataset_id_and_zip_name, download_kaggle, data_file_url, data_file_download, \
+    file_hash, url_validators, open_data_file, data_file_size, split_compression_extension
 from dbd.utils.io_utils import is_url
+from dbd.utils.profiling_utils import RunReport, PhaseTimer, PHASE_DOWNLOAD, PHASE_PARSE, PHASE_COERCE, \
+    PHASE_CREATE_TABLE, PHASE_LOAD
+from dbd.utils.psql_copy import PsqlCopyStream, PSQL_COPY_BUFFER_SIZE
 from dbd.utils.sql_parser import SqlParser
 
 log = logging.getLogger(__name__)
@@ -44,36 +52,14 @@ class DbdDataLoadError(DbdException):
 
 DataTaskType = TypeVar('DataTaskType', bound='DataTask')
 
+# PRAGMAs set for the duration of SQLite data loading
+SQLITE_LOAD_PRAGMAS = {'journal_mode': 'MEMORY', 'synchronous': 'OFF', 'cache_size': -65536}
 
-def psql_writer(table, conn, keys, data_iter):
-    """
-    Execute SQL statement inserting data
-
-    Parameters
-    ----------
-    table : pandas.io.sql.SQLTable
-    conn : sqlalchemy.engine.Engine or sqlalchemy.engine.Connection
-    keys : list of str
-        Column names
-    data_iter : Iterable that iterates the values to be inserted
-    """
-    # gets a DBAPI connection that can provide a cursor
-    dbapi_conn = conn.connection
-    with dbapi_conn.cursor() as cur:
-        s_buf = StringIO()
-        writer = csv.writer(s_buf)
-        writer.writerows(data_iter)
-        s_buf.seek(0)
-
-        columns = ', '.join('"{}"'.format(k) for k in keys)
-        if table.schema:
-            table_name = '{}.{}'.format(table.schema, table.name)
-        else:
-            table_name = table.name
+# dialects that load Parquet files natively (without reading them to dataframes)
+PARQUET_NATIVE_LOAD_DIALECTS = ['snowflake', 'bigquery']
 
-        sql = 'COPY {} ({}) FROM STDIN WITH CSV'.format(
-            table_name, columns)
-        cur.copy_expert(sql=sql, file=s_buf)
+# data files that can be compressed (e.g. population.csv.gz)
+COMPRESSIBLE_DATA_FILE_EXTENSIONS = ['.csv', '.json', '.jsonl', '.ndjson']
 
 
 class DataTask(DbTableTask):
@@ -103,6 +89,33 @@ class DataTask(DbTableTask):
         """
         self.set_task_data(data_files)
 
+    def content_hash(self, **kwargs) -> str:
+        """
+        Returns hash of the task's inputs (the rendered YAML task definition, the data files' content and the
+        URLs' validators)
+        :param Dict[str, str] url_validators: already fetched URL validators (the missing ones are fetched)
+        :return: hex digest of the task's inputs or None if some data file can't be fingerprinted
+        :rtype: str
+        """
+        known_url_validators = kwargs.get('url_validators', {})
+        fingerprints = [super().content_hash()]
+        for data_file in self.data_files():
+            if len(data_file) == 0:
+                continue
+            url = data_file_url(data_file)
+            if url is not None:
+                fingerprint = known_url_validators[url] if url in known_url_validators else url_validators(url)
+            elif is_kaggle(data_file):
+                # Kaggle API doesn't provide the dataset validators
+                fingerprint = None
+            else:
+                local_file = zip_to_url_and_locator(data_file)[0] if is_zip(data_file) else data_file
+                fingerprint = file_hash(local_file) if os.path.isfile(local_file) else None
+            if fingerprint is None:
+                return None
+            fingerprints.append(fingerprint)
+        return hashlib.sha256('|'.join(fingerprints).encode('utf-8')).hexdigest()
+
     @classmethod
     def from_code(cls, task_def: Dict[str, Any]) -> DataTaskType:
         """
@@ -142,17 +155,16 @@ class DataTask(DbTableTask):
 
         # noinspection DuplicatedCode
 
-    def __override_data_file_column_definitions(self, data_frame: pd.DataFrame) -> Dict[str, Any]:
+    def __override_data_file_column_definitions(self, data_file_columns: List[sqlalchemy.Column]) -> Dict[str, Any]:
         """
         Merges the data file column definitions with the column definitions from the task_def.
         The column definitions override the introspected data file types
-        :param pd.DataFrame data_frame: Pandas dataframe with populated data
+        :param List[sqlalchemy.Column] data_file_columns: introspected data file columns
         :return: data file columns overridden with the task's explicit column definitions
         :rtype: Dict[str, Any]
         """
         table_def = self.table_def()
         column_overrides = table_def.get('columns', {})
-        data_file_columns = self.__data_file_columns(data_frame)
         ordered_columns = {}
         for c in data_file_columns:
             overridden_column = column_overrides.get(c.name)
@@ -172,82 +184,400 @@ class DataTask(DbTableTask):
         Executes the task. Creates the target table and loads data
         :param sqlalchemy.MetaData target_alchemy_metadata: MetaData SQLAlchemy MetaData
         :param Dict[str, str] copy_stage_storage: copy stage storage parameters e.g. AWS S3 dict(url, access_key, secret_key)
+        :param Dict[str, Any] sqlite_pragmas: SQLite PRAGMAs set for the data loading (overrides SQLITE_LOAD_PRAGMAS)
+        :param DownloadManager download_manager: download manager that (pre)fetches the task's URLs
+        :param RunReport run_report: run report that records the task phases (download, parse, load, etc.)
+        :param sqlalchemy.engine.Connection connection: connection that the executor holds for the task
+        :param Any watermark: incremental load's watermark (see DbTableTask.watermark). Only the rows whose
+            incremental column is above the watermark are loaded.
         :param sqlalchemy.engine.Engine alchemy_engine:
         """
         try:
             copy_stage_storage = kwargs.get('copy_stage_storage')
             global_tmpdir = kwargs.get('global_tmpdir')
-            for data_file in self.data_files():
-                if len(data_file) > 0:
-                    with tempfile.TemporaryDirectory() as locaL_tmpdir:
-                        current_tmpdir = locaL_tmpdir
-                        zip_locator = None
-                        if is_zip(data_file):
-                            data_file, zip_locator = zip_to_url_and_locator(data_file)
-
-                        if is_url(data_file):
-                            absolute_file_name = os.path.join(current_tmpdir, url_to_filename(data_file))
-                            click.echo(f"\tDownloading file from URL: '{data_file}'.")
-                            download_file(data_file, absolute_file_name)
-                            data_file = absolute_file_name
-
-                        if is_kaggle(data_file):
-                            current_tmpdir = global_tmpdir
-                            kaggle_dataset_id, kaggle_zip_name = extract_kaggle_dataset_id_and_zip_name(data_file)
-                            absolute_file_name = os.path.join(current_tmpdir, f"{kaggle_zip_name}.zip")
-                            click.echo(f"\tDownloading Kaggle dataset: '{data_file}'.")
-                            download_kaggle(kaggle_dataset_id, current_tmpdir)
-                            data_file = absolute_file_name
-
-                        if zip_locator is not None and len(zip_locator) > 0:
-                            absolute_file_name = os.path.join(current_tmpdir, os.path.basename(zip_locator))
-                            click.echo(f"\tExtracting file from archive: '{data_file}'.")
-                            extract_zip_file(data_file, zip_locator, current_tmpdir)
-                            data_file = absolute_file_name
-
-                        click.echo(f"\tProcessing local file: '{data_file}'.")
-                        absolute_file_name = data_file
-
-                        df = self.__read_file_to_dataframe(absolute_file_name)
-
-                        mysql_bulk_load_config = alchemy_engine.url.query.get('local_infile') == '1'
-
-                        if self.db_table() is None:
-                            table_def = self.__override_data_file_column_definitions(df)
-                            db_table = DbTable.from_code(self.target(), table_def, target_alchemy_metadata,
-                                                         self.target_schema())
-                            self.set_db_table(db_table)
-                            db_table.create()
-                        dtype = self.__adjust_dataframe_datatypes(df, alchemy_engine.dialect.name)
-                        click.echo(f"\tLoading data to database.")
-                        if alchemy_engine.dialect.name == 'snowflake':
-                            self.__bulk_load_snowflake(df, alchemy_engine)
-                        elif alchemy_engine.dialect.name == 'postgresql':
-                            df.to_sql(self.target(), alchemy_engine, chunksize=1024, method=psql_writer,
-                                      schema=self.target_schema(), if_exists='append', index=False, dtype=dtype)
-                        elif alchemy_engine.dialect.name == 'mysql' and mysql_bulk_load_config:
-                            self.__bulk_load_mysql(df, alchemy_engine)
-                        elif alchemy_engine.dialect.name == 'bigquery':
-                            self.__bulk_load_bigquery(df, dtype, alchemy_engine)
-                        elif alchemy_engine.dialect.name == 'redshift' and copy_stage_storage is not None:
-                            self.__bulk_load_redshift(df, alchemy_engine, copy_stage_storage)
+            run_report = kwargs.get('run_report') or RunReport()
+            watermark = kwargs.get('watermark')
+            dialect_name = alchemy_engine.dialect.name
+            with connection_scope(alchemy_engine, kwargs.get('connection')) as conn:
+                local_files = self.__local_data_files(global_tmpdir, kwargs.get('download_manager'), run_report)
+                # the dataframes are read while they are loaded, the nested phases are subtracted from the load time
+                with run_report.phase(self.task_id(), PHASE_LOAD) as load:
+                    if dialect_name in ['postgresql', 'sqlite']:
+                        data_frames = self.__counted_data_frames(
+                            self.__data_frames(local_files, target_alchemy_metadata, alchemy_engine, run_report, conn,
+                                               watermark), load)
+                        if dialect_name == 'postgresql':
+                            self.__bulk_load_postgres(data_frames, alchemy_engine, conn)
                         else:
-                            if alchemy_engine.dialect.name == 'redshift':
-                                log.warning(
-                                    "Using default SQLAlchemy writer for Redshift. Specify 'copy_stage' parameter "
-                                    "in your profile configuration file to make loading faster.")
-                            if alchemy_engine.dialect.name == 'mysql':
-                                log.warning(
-                                    "Using default SQLAlchemy writer for MySQL. Specify 'local_infile=1' parameter "
-                                    "in a query parameter of your MySQL connection string to make loading faster.")
-                            df.to_sql(self.target(), alchemy_engine, chunksize=1024, method='multi',
-                                      schema=self.target_schema(), if_exists='append', index=False, dtype=dtype)
+                            self.__bulk_load_sqlite(data_frames, alchemy_engine, kwargs.get('sqlite_pragmas'), conn)
+                    else:
+                        for absolute_file_name in local_files:
+                            # native loads need a local file, ZIP members are read to dataframes
+                            if self.__is_parquet_file(absolute_file_name) and watermark is None \
+                                    and dialect_name in PARQUET_NATIVE_LOAD_DIALECTS and not is_zip(absolute_file_name):
+                                self.__load_parquet_file(absolute_file_name, target_alchemy_metadata, alchemy_engine,
+                                                         run_report, load, conn)
+                                continue
+                            data_frames = self.__counted_data_frames(
+                                self.__file_data_frames(absolute_file_name, target_alchemy_metadata, alchemy_engine,
+                                                        run_report, conn, watermark), load)
+                            for df, dtype in data_frames:
+                                click.echo(f"\tLoading data to database.")
+                                self.__load_data_frame(df, dtype, alchemy_engine, copy_stage_storage, conn)
         except sqlalchemy.exc.IntegrityError as e:
             raise DbdDataLoadError(f" Referential integrity error: {e}")
         except ValueError as e:
-            raise DbdInvalidDataFileFormatException(f"Error parsing file '{absolute_file_name}': {e}")
+            raise DbdInvalidDataFileFormatException(f"Error loading data to '{self.task_id()}': {e}")
+
+    # noinspection PyMethodMayBeStatic
+    def __counted_data_frames(self, data_frames: Iterator[Tuple[pd.DataFrame, Dict[str, Any]]],
+                              phase_timer: PhaseTimer) -> Iterator[Tuple[pd.DataFrame, Dict[str, Any]]]:
+        """
+        Records rows and (in-memory) bytes of the dataframes to the phase timer
+        :param Iterator[Tuple[pd.DataFrame, Dict[str, Any]]] data_frames: dataframes and their dtypes
+        :param PhaseTimer phase_timer: phase timer
+        :return: generator of the same dataframes and their dtypes
+        :rtype: Iterator[Tuple[pd.DataFrame, Dict[str, Any]]]
+        """
+        for df, dtype in data_frames:
+            phase_timer.add(rows=len(df), bytes_count=df.memory_usage(index=False).sum())
+            yield df, dtype
+
+    def __local_data_files(self, global_tmpdir: str, download_manager: DownloadManager = None,
+                           run_report: RunReport = None) -> Iterator[str]:
+        """
+        Downloads all task's data files and yields their local file names (or ZIP file locators of the members
+        of local ZIP files). The temporary files of a data file are deleted when the next data file is requested.
+        :param str global_tmpdir: temporary directory shared by all tasks
+        :param DownloadManager download_manager: download manager that (pre)fetches the task's URLs and Kaggle
+            datasets
+        :param RunReport run_report: run report that records the download phase
+        :return: generator of local data file names
+        :rtype: Iterator[str]
+        """
+        for data_file in self.data_files():
+            if len(data_file) > 0:
+                with tempfile.TemporaryDirectory() as local_tmpdir:
+                    try:
+                        absolute_file_name = self.__local_data_file(data_file, local_tmpdir, global_tmpdir,
+                                                                    download_manager, run_report)
+                        click.echo(f"\tProcessing local file: '{absolute_file_name}'.")
+                        yield absolute_file_name
+                    finally:
+                        url = data_file_download(data_file)
+                        if download_manager is not None and url is not None:
+                            download_manager.release(url)
+
+    def __data_frames(self, local_files: Iterator[str], target_alchemy_metadata: sqlalchemy.MetaData,
+                      alchemy_engine: sqlalchemy.engine.Engine, run_report: RunReport = None,
+                      connection: sqlalchemy.engine.Connection = None,
+                      watermark: Any = None) -> Iterator[Tuple[pd.DataFrame, Dict[str, Any]]]:
+        """
+        Reads all task's data files and yields their content as dataframes with adjusted datatypes
+        (see __file_data_frames)
+        :param Iterator[str] local_files: local data file names (see __local_data_files)
+        :param sqlalchemy.MetaData target_alchemy_metadata: MetaData SQLAlchemy MetaData
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        :param RunReport run_report: run report that records the task phases
+        :param sqlalchemy.engine.Connection connection: connection that creates the target table
+        :param Any watermark: incremental load's watermark or None
+        :return: generator of dataframes and their dtypes for to_sql
+        :rtype: Iterator[Tuple[pd.DataFrame, Dict[str, Any]]]
+        """
+        for absolute_file_name in local_files:
+            yield from self.__file_data_frames(absolute_file_name, target_alchemy_metadata, alchemy_engine,
+                                               run_report, connection, watermark)
+
+    def __file_data_frames(self, absolute_file_name: str, target_alchemy_metadata: sqlalchemy.MetaData,
+                           alchemy_engine: sqlalchemy.engine.Engine, run_report: RunReport = None,
+                           connection: sqlalchemy.engine.Connection = None,
+                           watermark: Any = None) -> Iterator[Tuple[pd.DataFrame, Dict[str, Any]]]:
+        """
+        Reads a data file and yields its content as dataframes with adjusted datatypes.
+        The target table is created from the first dataframe (or from the task's column definitions).
+        If the 'chunk_size' process option is set, the files are read in chunks of that many rows,
+        so the memory consumption doesn't depend on the data file size. Parquet files are read by row groups
+        and their column types are taken from the Parquet schema. The rows at or below the incremental
+        load's watermark are filtered out.
+        :param str absolute_file_name: local data file name
+        :param sqlalchemy.MetaData target_alchemy_metadata: MetaData SQLAlchemy MetaData
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        :param RunReport run_report: run report that records the task phases
+        :param sqlalchemy.engine.Connection connection: connection that creates the target table
+        :param Any watermark: incremental load's watermark or None
+        :return: generator of dataframes and their dtypes for to_sql
+        :rtype: Iterator[Tuple[pd.DataFrame, Dict[str, Any]]]
+        """
+        run_report = run_report if run_report is not None else RunReport()
+        chunk_size = self.process_def().get('chunk_size')
+        for df in run_report.timed(self.task_id(), PHASE_PARSE,
+                                   self.__read_file_to_dataframes(absolute_file_name, chunk_size)):
+            if self.db_table() is None:
+                data_file_columns = arrow_schema_columns(self.__parquet_schema(absolute_file_name)) \
+                    if self.__is_parquet_file(absolute_file_name) else self.__data_file_columns(df)
+                self.__create_db_table(data_file_columns, target_alchemy_metadata, run_report, connection)
+            with run_report.phase(self.task_id(), PHASE_COERCE) as coerce:
+                dtype = self.__adjust_dataframe_datatypes(df, alchemy_engine.dialect.name)
+                coerce.add(rows=len(df))
+            if watermark is not None:
+                df = df[self.__above_watermark(df[self.incremental_column()], watermark)]
+            yield df, dtype
+        run_report.add(self.task_id(), PHASE_PARSE, bytes_count=data_file_size(absolute_file_name))
+
+    def __create_db_table(self, data_file_columns: List[sqlalchemy.Column],
+                          target_alchemy_metadata: sqlalchemy.MetaData, run_report: RunReport,
+                          connection: sqlalchemy.engine.Connection):
+        """
+        Creates the target table from the data file columns overridden with the task's column definitions
+        :param List[sqlalchemy.Column] data_file_columns: data file columns
+        :param sqlalchemy.MetaData target_alchemy_metadata: MetaData SQLAlchemy MetaData
+        :param RunReport run_report: run report that records the task phases
+        :param sqlalchemy.engine.Connection connection: connection that creates the target table
+        """
+        with run_report.phase(self.task_id(), PHASE_CREATE_TABLE):
+            table_def = self.__override_data_file_column_definitions(data_file_columns)
+            db_table = DbTable.from_code(self.target(), table_def, target_alchemy_metadata,
+                                         self.target_schema(), shadow_table=self.shadow_load())
+            self.set_db_table(db_table)
+            db_table.create(connection)
+
+    # noinspection PyMethodMayBeStatic
+    def __is_parquet_file(self, absolute_file_name: str) -> bool:
+        """
+        Checks whether the data file is a Parquet file
+        :param str absolute_file_name: local data file name
+        :return: True if the data file is a Parquet file
+        :rtype: bool
+        """
+        return os.path.splitext(absolute_file_name)[1].lower() == '.parquet'
+
+    def __parquet_data_files(self) -> bool:
+        """
+        Checks whether all task's data files are Parquet files
+        :return: True if all data files are Parquet files
+        :rtype: bool
+        """
+        data_files = [f for f in self.data_files() if len(f) > 0]
+        return len(data_files) > 0 and all(self.__is_parquet_file(f) for f in data_files)
+
+    # noinspection PyMethodMayBeStatic
+    def __parquet_schema(self, absolute_file_name: str) -> Any:
+        """
+        Reads the Arrow schema of a Parquet file (from the file's footer only)
+        :param str absolute_file_name: Parquet file name
+        :return: Arrow schema
+        :rtype: pyarrow.Schema
+        """
+        # pyarrow is a hard dependency, but it's imported only when a Parquet file is read to keep the CLI startup fast
+        import pyarrow.parquet as pq
+        with open_data_file(absolute_file_name) as f:
+            return pq.read_schema(f)
+
+    def __load_parquet_file(self, absolute_file_name: str, target_alchemy_metadata: sqlalchemy.MetaData,
+                            alchemy_engine: sqlalchemy.engine.Engine, run_report: RunReport, phase_timer: PhaseTimer,
+                            connection: sqlalchemy.engine.Connection = None):
+        """
+        Loads the Parquet file itself to the database (Snowflake and BigQuery read Parquet natively).
+        The target table is created from the Parquet schema if it doesn't exist yet.
+        :param str absolute_file_name: Parquet file name
+        :param sqlalchemy.MetaData target_alchemy_metadata: MetaData SQLAlchemy MetaData
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        :param RunReport run_report: run report that records the task phases
+        :param PhaseTimer phase_timer: load phase timer that records the loaded rows and bytes
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        """
+        import pyarrow.parquet as pq
+        parquet_metadata = pq.read_metadata(absolute_file_name)
+        if self.db_table() is None:
+            self.__create_db_table(arrow_schema_columns(parquet_metadata.schema.to_arrow_schema()),
+                                   target_alchemy_metadata, run_report, connection)
+        click.echo(f"\tLoading Parquet file to database.")
+        if alchemy_engine.dialect.name == 'snowflake':
+            self.__bulk_load_snowflake_parquet(absolute_file_name, alchemy_engine, connection)
+        else:
+            self.__bulk_load_bigquery_parquet(absolute_file_name, alchemy_engine)
+        phase_timer.add(rows=parquet_metadata.num_rows, bytes_count=os.path.getsize(absolute_file_name))
+
+    # noinspection PyMethodMayBeStatic
+    def __local_data_file(self, data_file: str, local_tmpdir: str, global_tmpdir: str,
+                          download_manager: DownloadManager = None, run_report: RunReport = None) -> str:
+        """
+        Downloads the data file and returns its local file name. Members of ZIP files aren't extracted, the ZIP file
+        locator of the member of the local ZIP file is returned instead (see open_data_file).
+        :param str data_file: data file reference (local file, URL, Kaggle dataset, ZIP file locator)
+        :param str local_tmpdir: temporary directory for the data file
+        :param str global_tmpdir: temporary directory shared by all tasks
+        :param DownloadManager download_manager: download manager that (pre)fetches the task's URLs and Kaggle
+            datasets. URLs are downloaded to the local_tmpdir and Kaggle datasets to the global_tmpdir if it's None.
+        :param RunReport run_report: run report that records the download phase
+        :return: local data file name or ZIP file locator
+        :rtype: str
+        """
+        run_report = run_report if run_report is not None else RunReport()
+        try:
+            zip_locator = None
+            if is_zip(data_file):
+                data_file, zip_locator = zip_to_url_and_locator(data_file)
+
+            if is_url(data_file):
+                click.echo(f"\tDownloading file from URL: '{data_file}'.")
+                with run_report.phase(self.task_id(), PHASE_DOWNLOAD) as download:
+                    if download_manager is not None:
+                        absolute_file_name = download_manager.file(data_file)
+                    else:
+                        absolute_file_name = os.path.join(local_tmpdir, url_to_filename(data_file))
+                        download_file(data_file, absolute_file_name)
+                    download.add(bytes_count=os.path.getsize(absolute_file_name))
+                data_file = absolute_file_name
+
+            if is_kaggle(data_file):
+                click.echo(f"\tDownloading Kaggle dataset: '{data_file}'.")
+                with run_report.phase(self.task_id(), PHASE_DOWNLOAD) as download:
+                    if download_manager is not None:
+                        data_file = download_manager.file(data_file)
+                    else:
+                        kaggle_dataset_id, kaggle_zip_name = extract_kaggle_dataset_id_and_zip_name(data_file)
+                        download_kaggle(kaggle_dataset_id, global_tmpdir)
+                        data_file = os.path.join(global_tmpdir, f"{kaggle_zip_name}.zip")
+                    download.add(bytes_count=os.path.getsize(data_file) if os.path.exists(data_file) else 0)
+
+            if zip_locator is not None and len(zip_locator) > 0:
+                # the member is streamed from the archive while it's read
+                data_file = zip_member_locator(data_file, zip_locator)
+            return data_file
         except (FileNotFoundError, HTTPError) as e:
-            raise DbdInvalidDataFileReferenceException(f"Referenced file '{absolute_file_name}' doesn't exist: {e}")
+            raise DbdInvalidDataFileReferenceException(f"Referenced file '{data_file}' doesn't exist: {e}")
+
+    def __load_data_frame(self, df: pd.DataFrame, dtype: Dict[str, Any], alchemy_engine: sqlalchemy.engine.Engine,
+                          copy_stage_storage: Dict[str, str], connection: sqlalchemy.engine.Connection = None):
+        """
+        Loads dataframe to the target table using the dialect specific loader
+        :param pd.DataFrame df: pandas dataframe
+        :param Dict[str, Any] dtype: Data types for each column
+        :param sqlalchemy.engine.Engine alchemy_engine: SqlAlchemy engine
+        :param Dict[str, str] copy_stage_storage: copy stage storage parameters e.g. AWS S3 dict(url, access_key, secret_key)
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        """
+        mysql_bulk_load_config = alchemy_engine.url.query.get('local_infile') == '1'
+        if alchemy_engine.dialect.name == 'snowflake':
+            self.__bulk_load_snowflake(df, alchemy_engine, connection)
+        elif alchemy_engine.dialect.name == 'mysql' and mysql_bulk_load_config:
+            self.__bulk_load_mysql(df, alchemy_engine, connection)
+        elif alchemy_engine.dialect.name == 'bigquery':
+            self.__bulk_load_bigquery(df, dtype, alchemy_engine)
+        elif alchemy_engine.dialect.name == 'redshift' and copy_stage_storage is not None:
+            self.__bulk_load_redshift(df, alchemy_engine, copy_stage_storage, connection)
+        else:
+            if alchemy_engine.dialect.name == 'redshift':
+                log.warning(
+                    "Using default SQLAlchemy writer for Redshift. Specify 'copy_stage' parameter "
+                    "in your profile configuration file to make loading faster.")
+            if alchemy_engine.dialect.name == 'mysql':
+                log.warning(
+                    "Using default SQLAlchemy writer for MySQL. Specify 'local_infile=1' parameter "
+                    "in a query parameter of your MySQL connection string to make loading faster.")
+            df.to_sql(self.load_target(), connection if connection is not None else alchemy_engine, chunksize=1024,
+                      method='multi',
+                      schema=self.target_schema(), if_exists='append', index=False, dtype=dtype)
+
+    def __bulk_load_postgres(self, data_frames: Iterator[Tuple[pd.DataFrame, Dict[str, Any]]],
+                             alchemy_engine: sqlalchemy.engine.Engine, connection: sqlalchemy.engine.Connection = None):
+        """
+        Bulk load data to Postgres. All dataframes are streamed to the target table with a single COPY statement
+        on a single connection, so the data never round-trips through pandas.to_sql.
+        :param Iterator[Tuple[pd.DataFrame, Dict[str, Any]]] data_frames: dataframes and their dtypes
+        :param sqlalchemy.engine.Engine alchemy_engine: SqlAlchemy engine
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        """
+        # the first dataframe creates the target table, so it must be read before the COPY starts
+        first = next(data_frames, None)
+        if first is None:
+            return
+        columns = list(first[0].columns)
+        column_types = [self.db_table().column(c).type() for c in columns]
+        process_def = self.process_def()
+        buffer_size = process_def.get('copy_buffer_size', PSQL_COPY_BUFFER_SIZE)
+        copy_format = process_def.get('copy_format')
+        if copy_format is None:
+            # typed Parquet columns are streamed without converting them to text
+            copy_format = 'binary' if self.__parquet_data_files() and \
+                PsqlCopyStream.binary_format_supported(column_types) else 'csv'
+        if copy_format == 'binary' and not PsqlCopyStream.binary_format_supported(column_types):
+            log.warning(f"Binary COPY format isn't supported for all column types of '{self.task_id()}'. "
+                        f"Falling back to the CSV format.")
+            copy_format = 'csv'
+        stream = PsqlCopyStream(itertools.chain([first[0]], (df for df, _ in data_frames)), columns,
+                                column_types if copy_format == 'binary' else None)
+
+        preparer = alchemy_engine.dialect.identifier_preparer
+        table_name = preparer.format_table(self.db_table().alchemy_table())
+        column_list = ', '.join(preparer.quote(c) for c in columns)
+        sql = f"COPY {table_name} ({column_list}) FROM STDIN {stream.copy_options()}"
+        click.echo(f"\tLoading data to database.")
+        with connection_scope(alchemy_engine, connection) as conn:
+            dbapi_conn = conn.connection
+            with dbapi_conn.cursor() as cur:
+                cur.copy_expert(sql=sql, file=stream, size=buffer_size)
+            dbapi_conn.commit()
+
+    def __bulk_load_sqlite(self, data_frames: Iterator[Tuple[pd.DataFrame, Dict[str, Any]]],
+                           alchemy_engine: sqlalchemy.engine.Engine, sqlite_pragmas: Dict[str, Any] = None,
+                           connection: sqlalchemy.engine.Connection = None):
+        """
+        Bulk load data to SQLite. All dataframes are inserted with a prepared INSERT statement (executemany)
+        in a single transaction. The PRAGMAs are set for the loading only and restored afterwards.
+        :param Iterator[Tuple[pd.DataFrame, Dict[str, Any]]] data_frames: dataframes and their dtypes
+        :param sqlalchemy.engine.Engine alchemy_engine: SqlAlchemy engine
+        :param Dict[str, Any] sqlite_pragmas: PRAGMAs that override the SQLITE_LOAD_PRAGMAS defaults
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        """
+        # the first dataframe creates the target table, so it must be read before the transaction starts
+        first = next(data_frames, None)
+        if first is None:
+            return
+        columns = list(first[0].columns)
+        dialect = alchemy_engine.dialect
+        bind_processors = [self.db_table().column(c).type().dialect_impl(dialect).bind_processor(dialect)
+                           for c in columns]
+        preparer = dialect.identifier_preparer
+        table_name = preparer.format_table(self.db_table().alchemy_table())
+        column_list = ', '.join(preparer.quote(c) for c in columns)
+        sql = f"INSERT INTO {table_name} ({column_list}) VALUES ({', '.join(['?'] * len(columns))})"
+        pragmas = {**SQLITE_LOAD_PRAGMAS, **(sqlite_pragmas if sqlite_pragmas is not None else {})}
+        with connection_scope(alchemy_engine, connection) as conn:
+            original_pragmas = {}
+            for name, value in pragmas.items():
+                original_pragmas[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+            try:
+                with conn.begin():
+                    for df, _ in itertools.chain([first], data_frames):
+                        click.echo(f"\tLoading data to database.")
+                        conn.exec_driver_sql(sql, self.__sqlite_rows(df, columns, bind_processors))
+            finally:
+                for name, value in original_pragmas.items():
+                    conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+
+    # noinspection PyMethodMayBeStatic
+    def __sqlite_rows(self, df: pd.DataFrame, columns: List[str],
+                      bind_processors: List[Callable[[Any], Any]]) -> List[Tuple]:
+        """
+        Converts dataframe to list of rows for the SQLite executemany.
+        Nulls (NaN, NaT, NA) are converted to None and the other values by the column type bind processor.
+        :param pd.DataFrame df: pandas dataframe
+        :param List[str] columns: column names in the INSERT statement order
+        :param List[Callable[[Any], Any]] bind_processors: SQLAlchemy bind processors of the columns (or None)
+        :return: list of rows
+        :rtype: List[Tuple]
+        """
+        values = []
+        for column, processor in zip(columns, bind_processors):
+            s = df[column]
+            column_values = s.astype(object).where(s.notna(), None).tolist()
+            if processor is not None:
+                column_values = [processor(v) if v is not None else None for v in column_values]
+            values.append(column_values)
+        return list(zip(*values))
 
     def __bulk_load_bigquery(self, df: pd.DataFrame, dtype: Dict[str, str], alchemy_engine: sqlalchemy.engine.Engine):
         """
@@ -260,15 +590,16 @@ class DataTask(DbTableTask):
         target_schema = self.target_schema()
         dataset = target_schema if target_schema is not None and len(target_schema) > 0 \
             else alchemy_engine.engine.url.database
-        df.to_gbq(f"{dataset}.{self.target()}", if_exists='append', table_schema=table_schema)
+        df.to_gbq(f"{dataset}.{self.load_target()}", if_exists='append', table_schema=table_schema)
 
     def __bulk_load_redshift(self, df: pd.DataFrame, alchemy_engine: sqlalchemy.engine.Engine,
-                             copy_stage_storage: Dict[str, str]):
+                             copy_stage_storage: Dict[str, str], connection: sqlalchemy.engine.Connection = None):
         """
         Bulk load data to Redshift
         :param pd.DataFrame df: pandas dataframe
         :param sqlalchemy.engine.Engine alchemy_engine: SqlAlchemy engine
         :param Dict[str, str] copy_stage_storage: copy stage storage parameters e.g. AWS S3 dict(url, access_key, secret_key)
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
         if copy_stage_storage is not None:
             if 'url' in copy_stage_storage:
@@ -293,30 +624,36 @@ class DataTask(DbTableTask):
             df.to_csv(f"{temp_file_name}.csv.gz", index=False, quoting=csv.QUOTE_NONNUMERIC, compression='gzip',
                       storage_options={"key": aws_access_key,
                                        "secret": aws_secret_key})
-            with alchemy_engine.connect() as conn:
+            with connection_scope(alchemy_engine, connection) as conn:
                 target_schema = self.target_schema()
                 target_schema_with_dot = f"{target_schema}." if target_schema else ''
-                conn.execute(f"copy {target_schema_with_dot}{self.target()} from '{temp_file_name}.csv.gz' "
+                conn.execute(f"copy {target_schema_with_dot}{self.load_target()} from '{temp_file_name}.csv.gz' "
                              f"CREDENTIALS 'aws_access_key_id={aws_access_key};aws_secret_access_key={aws_secret_key}' "
                              f"FORMAT CSV DELIMITER AS ',' DATEFORMAT 'YYYY-MM-DD' EMPTYASNULL IGNOREHEADER 1 GZIP")
                 conn.connection.commit()
+            # S3 stack is loaded only for Redshift
+            import s3fs
             file = s3fs.S3FileSystem(anon=False, key=aws_access_key, secret=aws_secret_key)
             file.rm(f"{temp_file_name}.csv.gz")
         else:
             raise DbdProjectConfigException("Redshift requires 'copy_stage' parameter in your project file.")
 
-    def __bulk_load_snowflake(self, df: pd.DataFrame, alchemy_engine: sqlalchemy.engine.Engine):
+    def __bulk_load_snowflake(self, df: pd.DataFrame, alchemy_engine: sqlalchemy.engine.Engine,
+                              connection: sqlalchemy.engine.Connection = None):
         """
         Bulk load data to snowflake
         :param pandas.DataFrame df: DataFrame
         :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
         #df.columns = map(str.upper, df.columns)
         #table_name = self.target().upper()
-        table_name = self.target()
+        table_name = self.load_target()
         schema_name = self.target_schema()
         #schema_name = schema_name.upper() if schema_name else None
-        with alchemy_engine.connect() as conn:
+        # Snowflake connector is loaded only for Snowflake
+        from snowflake.connector.pandas_tools import write_pandas
+        with connection_scope(alchemy_engine, connection) as conn:
             write_pandas(
                 conn.connection, df,
                 table_name=table_name,
@@ -324,20 +661,61 @@ class DataTask(DbTableTask):
                 quote_identifiers=True)
             conn.connection.commit()
 
-    def __bulk_load_mysql(self, df: pd.DataFrame, alchemy_engine: sqlalchemy.engine.Engine):
+    def __bulk_load_snowflake_parquet(self, absolute_file_name: str, alchemy_engine: sqlalchemy.engine.Engine,
+                                      connection: sqlalchemy.engine.Connection = None):
+        """
+        Bulk load Parquet file to Snowflake. The file is uploaded to the table's stage and copied to the table
+        by the column names.
+        :param str absolute_file_name: Parquet file name
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        """
+        preparer = alchemy_engine.dialect.identifier_preparer
+        alchemy_table = self.db_table().alchemy_table()
+        schema_prefix = f"{preparer.quote_schema(alchemy_table.schema)}." if alchemy_table.schema else ''
+        table_stage = f"@{schema_prefix}%{preparer.quote(alchemy_table.name)}"
+        file_name = os.path.basename(absolute_file_name)
+        with connection_scope(alchemy_engine, connection) as conn:
+            conn.exec_driver_sql(f"PUT 'file://{os.path.abspath(absolute_file_name).replace(os.sep, '/')}' "
+                                 f"{table_stage} AUTO_COMPRESS = FALSE OVERWRITE = TRUE")
+            conn.exec_driver_sql(f"COPY INTO {preparer.format_table(alchemy_table)} FROM {table_stage} "
+                                 f"FILES = ('{file_name}') FILE_FORMAT = (TYPE = PARQUET) "
+                                 f"MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE PURGE = TRUE")
+            conn.connection.commit()
+
+    def __bulk_load_bigquery_parquet(self, absolute_file_name: str, alchemy_engine: sqlalchemy.engine.Engine):
+        """
+        Bulk load Parquet file to BigQuery with a load job
+        :param str absolute_file_name: Parquet file name
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        """
+        # BigQuery client is loaded only for BigQuery
+        from google.cloud import bigquery
+        target_schema = self.target_schema()
+        dataset = target_schema if target_schema is not None and len(target_schema) > 0 \
+            else alchemy_engine.engine.url.database
+        client = bigquery.Client(project=alchemy_engine.engine.url.host or None)
+        job_config = bigquery.LoadJobConfig(source_format=bigquery.SourceFormat.PARQUET,
+                                            write_disposition=bigquery.WriteDisposition.WRITE_APPEND)
+        with open(absolute_file_name, 'rb') as f:
+            client.load_table_from_file(f, f"{dataset}.{self.load_target()}", job_config=job_config).result()
+
+    def __bulk_load_mysql(self, df: pd.DataFrame, alchemy_engine: sqlalchemy.engine.Engine,
+                          connection: sqlalchemy.engine.Connection = None):
         """
         Bulk load data to MySQL
         :param pandas.DataFrame df: DataFrame
         :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
         with tempfile.TemporaryDirectory() as tmp_dir_name:
             temporary_file_name = f"{tmp_dir_name}/bulk.csv"
             df.to_csv(temporary_file_name, index=False, na_rep='\\N')
             target_schema = self.target_schema()
             target_schema_with_dot = f"{target_schema}." if target_schema else ''
-            with alchemy_engine.connect() as conn:
+            with connection_scope(alchemy_engine, connection) as conn:
                 query = f"LOAD DATA LOCAL INFILE '{temporary_file_name}' " \
-                        f"INTO TABLE {target_schema_with_dot}{self.target()} " \
+                        f"INTO TABLE {target_schema_with_dot}{self.load_target()} " \
                         f"FIELDS TERMINATED BY ',' " \
                         f"OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' IGNORE 1 LINES"
                 conn.execute(query)
@@ -351,72 +729,246 @@ class DataTask(DbTableTask):
         :return: dtype for to_sql
         """
         dtype = {}
+        column_defs = self.table_def().get('columns', {})
         for c in self.db_table().columns():
             column_name = c.name()
             column_type = c.type()
+            column_def = column_defs.get(column_name)
+            datetime_format = column_def.get('format') if column_def else None
             # Snowflake fix
             if str(column_type).upper().startswith('TIMESTAMP_'):
                 python_type = datetime
             else:
                 python_type = SqlParser.parse_alchemy_data_type(column_type).python_type
-            if isinstance(python_type, type) and issubclass(python_type, datetime):
+            if self.__has_native_type(df[column_name], python_type, dialect_name):
+                # e.g. Parquet columns keep their Arrow types
+                pass
+            elif isinstance(python_type, type) and issubclass(python_type, datetime):
                 if dialect_name in ['bigquery']:
-                    df[column_name] = pd.to_datetime(df[column_name]).dt.strftime('%Y-%m-%d %H:%M:%S')
+                    df[column_name] = SqlParser.parse_datetime_series(df[column_name], datetime_format) \
+                        .dt.strftime('%Y-%m-%d %H:%M:%S')
                     df[column_name] = df[column_name].astype('datetime64[ns]')
                 elif dialect_name in ['snowflake']:
-                    df[column_name] = pd.to_datetime(df[column_name]).dt.strftime('%Y-%m-%d %H:%M:%S')
+                    df[column_name] = SqlParser.parse_datetime_series(df[column_name], datetime_format) \
+                        .dt.strftime('%Y-%m-%d %H:%M:%S')
                 else:
-                    df[column_name] = pd.to_datetime(df[column_name])
+                    df[column_name] = SqlParser.parse_datetime_series(df[column_name], datetime_format)
             elif isinstance(python_type, type) and issubclass(python_type, date):
                 if dialect_name in ['bigquery']:
-                    df[column_name] = pd.to_datetime(df[column_name]).dt.strftime('%Y-%m-%d')
+                    df[column_name] = SqlParser.parse_datetime_series(df[column_name], datetime_format) \
+                        .dt.strftime('%Y-%m-%d')
                     df[column_name] = df[column_name].astype('datetime64[ns]')
                 elif dialect_name in ['snowflake']:
-                    df[column_name] = pd.to_datetime(df[column_name], ).dt.strftime('%Y-%m-%d')
+                    df[column_name] = SqlParser.parse_datetime_series(df[column_name], datetime_format) \
+                        .dt.strftime('%Y-%m-%d')
                 else:
-                    df[column_name] = pd.to_datetime(df[column_name])
+                    df[column_name] = SqlParser.parse_datetime_series(df[column_name], datetime_format)
             elif isinstance(python_type, type) and issubclass(python_type, bool):
                 if dialect_name in ['mysql']:
-                    df[column_name] = df[column_name].map(lambda x: SqlParser.parse_bool_int(x))
-                    df[column_name] = df[column_name].astype('float').astype('Int64')
+                    df[column_name] = SqlParser.parse_bool_int_series(df[column_name])
                 else:
-                    df[column_name] = df[column_name].map(lambda x: SqlParser.parse_bool(x))
-                    df[column_name] = df[column_name].astype('boolean')
+                    df[column_name] = SqlParser.parse_bool_series(df[column_name])
             elif isinstance(python_type, type) and issubclass(python_type, int):
                 df[column_name] = df[column_name].astype('float').astype('Int64')
             elif isinstance(python_type, type) and issubclass(python_type, float):
                 df[column_name] = df[column_name].astype(python_type)
             else:
                 # consistently interpret "" as NULL
-                df[column_name] = df[column_name].map(lambda x: SqlParser.parse_string(x))
-                df[column_name] = df[column_name].astype('object')
+                df[column_name] = SqlParser.parse_string_series(df[column_name])
             dtype[column_name] = column_type
         return dtype
 
     # noinspection PyMethodMayBeStatic
-    def __read_file_to_dataframe(self, absolute_file_name: str) -> pd.DataFrame:
+    def __has_native_type(self, series: pd.Series, python_type: Any, dialect_name: str) -> bool:
         """
-        Read the file content to Pandas dataframe
-        :param str absolute_file_name: filename to read the dataframe from
+        Checks whether the dataframe column already has a type that the loaders accept for the target column type,
+        so it doesn't have to be converted (e.g. integer Parquet column loaded to an integer table column)
+        :param pd.Series series: dataframe column
+        :param Any python_type: target column's Python type
+        :param str dialect_name: SQLAlchemy dialect name
+        :return: True if the column doesn't have to be converted
+        :rtype: bool
+        """
+        if not isinstance(python_type, type):
+            return False
+        elif issubclass(python_type, datetime):
+            return pd.api.types.is_datetime64_any_dtype(series) and dialect_name not in ['bigquery', 'snowflake']
+        elif issubclass(python_type, date):
+            return (pd.api.types.is_datetime64_any_dtype(series) or
+                    pd.api.types.infer_dtype(series, skipna=True) == 'date') \
+                and dialect_name not in ['bigquery', 'snowflake']
+        elif issubclass(python_type, bool):
+            return pd.api.types.is_bool_dtype(series) and dialect_name not in ['mysql']
+        elif issubclass(python_type, int):
+            return pd.api.types.is_integer_dtype(series)
+        elif issubclass(python_type, float):
+            return pd.api.types.is_float_dtype(series)
+        elif issubclass(python_type, Decimal):
+            return pd.api.types.infer_dtype(series, skipna=True) == 'decimal'
+        return False
+
+    # noinspection PyMethodMayBeStatic
+    def __above_watermark(self, series: pd.Series, watermark: Any) -> pd.Series:
+        """
+        Compares the incremental column's values with the watermark. The watermark is converted to the column's type
+        (e.g. SQLite returns timestamps as strings).
+        :param pd.Series series: incremental column with adjusted datatype
+        :param Any watermark: incremental load's watermark
+        :return: boolean mask of the values above the watermark (NULL values aren't above the watermark)
+        :rtype: pd.Series
+        """
+        if pd.api.types.is_datetime64_any_dtype(series):
+            mask = series > pd.Timestamp(watermark)
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            mask = series > pd.to_numeric(watermark)
+        else:
+            mask = series > str(watermark)
+        return mask.fillna(False).astype(bool)
+
+    def __read_json_lines_file_to_dataframes(self, absolute_file_name: str,
+                                             chunk_size: int = None) -> Iterator[pd.DataFrame]:
+        """
+        Reads JSON Lines file (one JSON document per line) to Pandas dataframes of chunk_size documents.
+        The documents are flattened (see __json_records_to_dataframe). All dataframes have the columns of the first
+        one, so the documents' keys that are missing in the first chunk are ignored.
+        :param str absolute_file_name: JSON Lines file name
+        :param int chunk_size: number of documents in each dataframe. The whole file is read to a single dataframe
+            if None.
+        :return: generator of Pandas DataFrames
+        :rtype: Iterator[pd.DataFrame]
+        """
+        # the table has the columns of the first chunk and the columns defined in the task's YAML file
+        # (or only the columns of the 'json_columns' process option)
+        json_columns = self.process_def().get('json_columns')
+        declared_columns = list(self.table_def().get('columns', {}).keys())
+        columns = None
+        warned_columns = set()
+        with open_data_file(absolute_file_name, encoding='utf-8') as f:
+            documents = (json.loads(line) for line in f if len(line.strip()) > 0)
+            chunks = iter(lambda: list(itertools.islice(documents, chunk_size)), []) if chunk_size \
+                else [list(documents)]
+            for chunk in chunks:
+                df = self.__json_records_to_dataframe(chunk)
+                if columns is None:
+                    columns = list(df.columns) if json_columns \
+                        else list(df.columns) + [c for c in declared_columns if c not in df.columns]
+                if list(df.columns) != columns:
+                    ignored_columns = set(df.columns) - set(columns) - warned_columns
+                    if len(ignored_columns) > 0:
+                        log.warning(f"Ignoring JSON keys {sorted(ignored_columns)} of '{absolute_file_name}' that "
+                                    f"aren't in the first chunk of '{self.task_id()}'. Declare the columns in the "
+                                    f"task's YAML file to load them.")
+                        warned_columns.update(ignored_columns)
+                    df = df.reindex(columns=columns)
+                yield df
+
+    def __json_records_to_dataframe(self, records: Any) -> pd.DataFrame:
+        """
+        Flattens JSON documents to a Pandas dataframe. Nested objects become columns named by their path joined
+        with '_' (e.g. 'user_name'), lists are stored as JSON strings. The records are taken from the path
+        in the 'json_path' process option (e.g. 'data.items') if it's set. If the 'json_columns' process option
+        is set, the dataframe has only its columns that get the values from their dot-separated paths
+        (e.g. 'user.address.city').
+        :param Any records: JSON document or list of JSON documents
         :return: Pandas DataFrame
         :rtype: pd.DataFrame
         """
+        json_path = self.process_def().get('json_path')
+        json_columns = self.process_def().get('json_columns')
         try:
-            # if is_url(absolute_file_name):
-            #    absolute_file_name = download_file(absolute_file_name, absolute_file_name)
-            file_name, file_extension = os.path.splitext(absolute_file_name)
+            df = pd.json_normalize(records, record_path=json_path.split('.') if json_path else None,
+                                   sep='.' if json_columns else '_')
+        except (KeyError, TypeError) as e:
+            raise DbdInvalidDataFileFormatException(f"JSON path '{json_path}' not found in the data file of "
+                                                    f"'{self.task_id()}': {e}")
+        if json_columns:
+            df = df.reindex(columns=list(json_columns.values()))
+            df.columns = list(json_columns.keys())
+        for column_name in df.columns[df.dtypes == object]:
+            df[column_name] = df[column_name].map(lambda v: json.dumps(v) if isinstance(v, (list, dict)) else v)
+        return df
+
+    # noinspection PyMethodMayBeStatic
+    def __read_parquet_file_to_dataframes(self, absolute_file_name: str,
+                                          chunk_size: int = None) -> Iterator[pd.DataFrame]:
+        """
+        Streams the Parquet file's row groups (or batches of chunk_size rows) to Pandas dataframes. The dataframes
+        keep the Arrow column types (nullable integers, booleans, and strings, timestamps, dates, decimals),
+        so the memory consumption depends on the row group size and not on the file size.
+        :param str absolute_file_name: Parquet file name
+        :param int chunk_size: number of rows in each dataframe. Each row group is read to a dataframe if None.
+        :return: generator of Pandas DataFrames
+        :rtype: Iterator[pd.DataFrame]
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pandas_dtypes = {pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(),
+                         pa.int64(): pd.Int64Dtype(), pa.uint8(): pd.UInt8Dtype(), pa.uint16(): pd.UInt16Dtype(),
+                         pa.uint32(): pd.UInt32Dtype(), pa.uint64(): pd.UInt64Dtype(), pa.bool_(): pd.BooleanDtype(),
+                         pa.string(): pd.StringDtype(), pa.large_string(): pd.StringDtype()}
+        with open_data_file(absolute_file_name) as f:
+            parquet_file = pq.ParquetFile(f)
+            if parquet_file.num_row_groups == 0:
+                yield parquet_file.schema_arrow.empty_table().to_pandas(types_mapper=pandas_dtypes.get)
+            elif chunk_size:
+                for batch in parquet_file.iter_batches(batch_size=chunk_size):
+                    yield batch.to_pandas(types_mapper=pandas_dtypes.get)
+            else:
+                for row_group in range(parquet_file.num_row_groups):
+                    yield parquet_file.read_row_group(row_group).to_pandas(types_mapper=pandas_dtypes.get)
+
+    # noinspection PyMethodMayBeStatic
+    def __read_file_to_dataframes(self, absolute_file_name: str, chunk_size: int = None) -> Iterator[pd.DataFrame]:
+        """
+        Reads the file content to Pandas dataframes. Compressed CSV and JSON files (e.g. 'population.csv.gz')
+        are decompressed while they are parsed.
+        :param str absolute_file_name: filename to read the dataframe from
+        :param int chunk_size: number of rows in each dataframe. The whole file is read to a single dataframe
+            if None. Excel and JSON (without the 'json_path' process option) files aren't read in chunks.
+        :return: generator of Pandas DataFrames
+        :rtype: Iterator[pd.DataFrame]
+        """
+        try:
+            file_name, compression_extension = split_compression_extension(absolute_file_name)
+            file_extension = os.path.splitext(file_name)[1]
+            if compression_extension != '' and file_extension.lower() not in COMPRESSIBLE_DATA_FILE_EXTENSIONS:
+                raise DbdUnsupportedDataFile(f"Compressed data files with extension '{file_extension}' "
+                                             f"aren't supported.")
             if file_extension.lower() == '.csv':
-                return pd.read_csv(absolute_file_name, dtype=str)
+                with open_data_file(absolute_file_name) as f:
+                    if chunk_size:
+                        with pd.read_csv(f, dtype=str, chunksize=chunk_size) as reader:
+                            for chunk in reader:
+                                yield chunk
+                    else:
+                        yield pd.read_csv(f, dtype=str)
+            elif file_extension.lower() in {'.jsonl', '.ndjson'}:
+                yield from self.__read_json_lines_file_to_dataframes(absolute_file_name, chunk_size)
+            elif file_extension.lower() == '.json' and (self.process_def().get('json_path') is not None
+                                                        or self.process_def().get('json_columns') is not None):
+                # JSON documents can't be parsed incrementally, only the loading is chunked
+                with open_data_file(absolute_file_name, encoding='utf-8') as f:
+                    df = self.__json_records_to_dataframe(json.load(f))
+                if chunk_size:
+                    for start in range(0, max(len(df), 1), chunk_size):
+                        yield df.iloc[start:start + chunk_size]
+                else:
+                    yield df
             elif file_extension.lower() == '.json':
-                # noinspection PyTypeChecker
-                return pd.read_json(absolute_file_name)
+                with open_data_file(absolute_file_name, encoding='utf-8') as f:
+                    # noinspection PyTypeChecker
+                    yield pd.read_json(f)
             elif file_extension.lower() in {'.xls', '.xlsx', '.xlsm', '.xlsb', '.odf', '.ods', '.odt'}:
-                return pd.read_excel(absolute_file_name)
+                with open_data_file(absolute_file_name) as f:
+                    yield pd.read_excel(f)
             elif file_extension.lower() == '.parquet':
-                return pd.read_parquet(absolute_file_name, use_nullable_dtypes=True)
+                yield from self.__read_parquet_file_to_dataframes(absolute_file_name, chunk_size)
             else:
                 raise DbdUnsupportedDataFile(f"Data files with extension '{file_extension}' aren't supported.")
         except ValueError as e:
             raise DbdInvalidDataFileFormatException(f"Error parsing file '{absolute_file_name}': {e}")
         except (FileNotFoundError, HTTPError) as e:
             raise DbdInvalidDataFileReferenceException(f"Referenced file '{absolute_file_name}' doesn't exist: {e}")
+        except (OSError, EOFError) as e:
+            # e.g. corrupted or truncated compressed file
+            raise DbdInvalidDataFileFormatException(f"Error reading file '{absolute_file_name}': {e}")
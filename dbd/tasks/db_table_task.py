@@ -1,11 +1,14 @@
-from typing import Dict, List, Any, TypeVar, Tuple
-
+import hashlib
+import json
 import logging
+from typing import Dict, List, Any, TypeVar, Tuple
 
 import sqlalchemy.engine
 from cerberus import Validator
 
-from dbd.db.db_table import DbTable
+from dbd.db.db_connection import connection_scope
+from dbd.db.db_metadata import metadata_lock
+from dbd.db.db_table import DbTable, SWAP_TABLE_SUFFIX, SWAP_OLD_TABLE_SUFFIX
 from dbd.tasks.task import Task, InvalidTaskDefinition
 from dbd.utils.sql_parser import SqlParser
 from dbd.utils.text_utils import fully_qualified_table_name
@@ -72,6 +75,79 @@ class DbTableTask(Task):
         """
         return self.__task_def.get('process', {})
 
+    def swap_load(self) -> bool:
+        """
+        Returns True if the task loads a shadow table that replaces the target table after the load (mode: swap).
+        Views are always dropped and created again.
+        :return: True if the task loads a shadow table
+        :rtype: bool
+        """
+        process_def = self.process_def()
+        return process_def.get('mode', 'drop') == 'swap' and process_def.get('materialization', 'table') != 'view'
+
+    def incremental_column(self) -> str:
+        """
+        Returns the monotonic column (e.g. a timestamp or an id) of the incremental load (process: incremental: column)
+        :return: incremental column name or None if the task isn't incremental
+        :rtype: str
+        """
+        return self.process_def().get('incremental', {}).get('column')
+
+    def watermark(self, alchemy_engine: sqlalchemy.engine.Engine,
+                  connection: sqlalchemy.engine.Connection = None) -> Any:
+        """
+        Returns the incremental load's watermark, i.e. the maximal value of the incremental column in the target table.
+        Only the rows above the watermark are loaded.
+        :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        :return: watermark or None if the task isn't incremental or the target table doesn't exist or is empty
+        :rtype: Any
+        """
+        column = self.incremental_column()
+        if column is None:
+            return None
+        with connection_scope(alchemy_engine, connection) as conn:
+            if not sqlalchemy.inspect(conn).has_table(self.target(), self.target_schema()):
+                return None
+            target_table = sqlalchemy.table(self.target(), sqlalchemy.column(column), schema=self.target_schema())
+            return conn.execute(sqlalchemy.select(sqlalchemy.func.max(target_table.c[column]))).scalar()
+
+    def merge_load(self) -> bool:
+        """
+        Returns True if the task loads a shadow table that is merged (upserted) to the target table by its primary key
+        after the load (mode: merge). Views can't be merged, the mode is ignored for them.
+        :return: True if the task loads a shadow table that is merged to the target table
+        :rtype: bool
+        """
+        process_def = self.process_def()
+        return process_def.get('mode', 'drop') == 'merge' and process_def.get('materialization', 'table') != 'view'
+
+    def shadow_load(self) -> bool:
+        """
+        Returns True if the task loads a shadow table instead of the target table (the swap and merge modes)
+        :return: True if the task loads a shadow table
+        :rtype: bool
+        """
+        return self.swap_load() or self.merge_load()
+
+    def load_target(self) -> str:
+        """
+        Returns name of the table that the task loads (the target table or its shadow table for the swap and merge
+        modes)
+        :return: loaded table name
+        :rtype: str
+        """
+        return f"{self.target()}{SWAP_TABLE_SUFFIX}" if self.shadow_load() else self.target()
+
+    def fully_qualified_load_target(self, quoted: bool) -> str:
+        """
+        Returns fully qualified name of the table that the task loads
+        :param bool quoted: True if the name should be quoted, False otherwise
+        :return: fully qualified loaded table name
+        :rtype: str
+        """
+        return fully_qualified_table_name(self.target_schema(), self.load_target(), quoted)
+
     def db_table(self) -> DbTable:
         """
         Underlying DbTable
@@ -87,35 +163,104 @@ class DbTableTask(Task):
         """
         self.__target_db_table = db_table
 
-    def drop(self, alchemy_metadata: sqlalchemy.MetaData, alchemy_engine: sqlalchemy.engine.Engine):
+    def drop(self, alchemy_metadata: sqlalchemy.MetaData, alchemy_engine: sqlalchemy.engine.Engine,
+             connection: sqlalchemy.engine.Connection = None):
         """
         Drops the target table in the database
         :param sqlalchemy.MetaData alchemy_metadata: SqlAlchemy metadata
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
         if self.__target_db_table is None:
             alchemy_table = alchemy_metadata.tables.get(self.fully_qualified_target(quoted=False))
             if alchemy_table is not None:
                 self.__target_db_table = DbTable.from_alchemy_table(alchemy_table)
-                self.__target_db_table.drop(alchemy_engine)
+                self.__target_db_table.drop(alchemy_engine, connection)
         else:
-            self.__target_db_table.drop(alchemy_engine)
+            self.__target_db_table.drop(alchemy_engine, connection)
         self.__target_db_table = None
 
-    def truncate(self, alchemy_metadata: sqlalchemy.MetaData, alchemy_engine: sqlalchemy.engine.Engine):
+    def drop_shadow_tables(self, alchemy_engine: sqlalchemy.engine.Engine,
+                           connection: sqlalchemy.engine.Connection = None):
+        """
+        Drops the shadow tables left behind by a failed swap or merge mode task
+        :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        """
+        quoted = alchemy_engine.dialect.name != 'bigquery'
+        with connection_scope(alchemy_engine, connection) as conn:
+            for suffix in [SWAP_TABLE_SUFFIX, SWAP_OLD_TABLE_SUFFIX]:
+                table_name = fully_qualified_table_name(self.target_schema(), f"{self.target()}{suffix}", quoted)
+                conn.execute(sqlalchemy.text(f"DROP TABLE IF EXISTS {table_name}"))
+
+    def swap(self, alchemy_metadata: sqlalchemy.MetaData, alchemy_engine: sqlalchemy.engine.Engine,
+             connection: sqlalchemy.engine.Connection = None):
+        """
+        Replaces the target table with the loaded shadow table (mode: swap)
+        :param sqlalchemy.MetaData alchemy_metadata: SqlAlchemy metadata
+        :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        """
+        if self.__target_db_table is None:
+            return
+        self.__target_db_table.swap(alchemy_engine, connection)
+        self.__forget_shadow_table(alchemy_metadata)
+
+    def merge(self, alchemy_metadata: sqlalchemy.MetaData, alchemy_engine: sqlalchemy.engine.Engine,
+              connection: sqlalchemy.engine.Connection = None) -> int:
+        """
+        Merges (upserts) the loaded shadow table to the target table by the primary key (mode: merge)
+        :param sqlalchemy.MetaData alchemy_metadata: SqlAlchemy metadata
+        :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        :return: number of inserted or updated rows (0 if the database doesn't report it)
+        :rtype: int
+        """
+        if self.__target_db_table is None:
+            return 0
+        rows = self.__target_db_table.merge(alchemy_engine, connection)
+        self.__forget_shadow_table(alchemy_metadata)
+        return rows
+
+    def __forget_shadow_table(self, alchemy_metadata: sqlalchemy.MetaData):
+        """
+        Removes the shadow table and the target table from the metadata after a swap or merge
+        (the target must be reflected again)
+        :param sqlalchemy.MetaData alchemy_metadata: SqlAlchemy metadata
+        """
+        with metadata_lock(alchemy_metadata):
+            for table_name in [self.fully_qualified_load_target(quoted=False),
+                               self.fully_qualified_target(quoted=False)]:
+                alchemy_table = alchemy_metadata.tables.get(table_name)
+                if alchemy_table is not None:
+                    alchemy_metadata.remove(alchemy_table)
+        self.__target_db_table = None
+
+    def truncate(self, alchemy_metadata: sqlalchemy.MetaData, alchemy_engine: sqlalchemy.engine.Engine,
+                 connection: sqlalchemy.engine.Connection = None):
         """
         Truncates the target table
         :param sqlalchemy.MetaData alchemy_metadata: SqlAlchemy metadata
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
         if self.__target_db_table is None:
             # TODO: fix the SQL statement to work for all DBs
             alchemy_table = alchemy_metadata.tables.get(self.fully_qualified_target(quoted=False))
             if alchemy_table is not None:
                 self.__target_db_table = DbTable.from_alchemy_table(alchemy_table)
-                self.__target_db_table.truncate(alchemy_engine)
+                self.__target_db_table.truncate(alchemy_engine, connection)
         else:
-            self.__target_db_table.truncate(alchemy_engine)
+            self.__target_db_table.truncate(alchemy_engine, connection)
+
+    def content_hash(self, **kwargs) -> str:
+        """
+        Returns hash of the task's inputs (the rendered YAML task definition and the task data)
+        :return: hex digest of the task's inputs
+        :rtype: str
+        """
+        content = json.dumps([self.__task_def, self.task_data()], sort_keys=True, default=str)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
     def depends_on(self) -> List[str]:
         """
@@ -162,17 +307,29 @@ class DbTableTask(Task):
         process_validator = Validator(
             {
                 'materialization': {'type': 'string'},
-                'mode': {'type': 'string'}
+                'mode': {'type': 'string'},
+                'chunk_size': {'type': 'integer', 'min': 1},
+                'copy_buffer_size': {'type': 'integer', 'min': 1},
+                'copy_format': {'type': 'string', 'allowed': ['csv', 'binary']},
+                'json_path': {'type': 'string'},
+                'json_columns': {'type': 'dict', 'valuesrules': {'type': 'string'}},
+                'incremental': {'type': 'dict', 'schema': {'column': {'type': 'string', 'required': True}}}
             })
         process_validation_result = process_validator.validate(self.process_def())
         if not process_validation_result:
             task_errors['process'] = process_validator.errors
             validation_result = False
+        elif self.incremental_column() is not None and self.process_def().get('mode', 'drop') not in ['keep', 'merge']:
+            # the other modes empty or replace the table, so the load would keep the rows above the watermark only
+            task_errors['process'] = {'incremental': ["Incremental load is supported only in the 'keep' and 'merge' "
+                                                      "modes."]}
+            validation_result = False
 
         runtime_validator = Validator(
             {
                 'schema': {'type': 'string', 'nullable': True},
-                'table': {'type': 'string'}
+                'table': {'type': 'string'},
+                'sql_file': {'type': 'string'}
             })
         runtime_validation_result = runtime_validator.validate(self.runtime_def())
         if not runtime_validation_result:
@@ -3,7 +3,9 @@ from typing import TypeVar
 import sqlalchemy.engine
 from sqlalchemy import text
 
+from dbd.db.db_connection import connection_scope
 from dbd.tasks.task import Task
+from dbd.utils.profiling_utils import RunReport, PHASE_DDL
 
 DdlTaskType = TypeVar('DdlTaskType', bound='DdlTask')
 
@@ -42,11 +44,16 @@ class DdlTask(Task):
         Executes / creates the task
         :param sqlalchemy.MetaData target_alchemy_metadata: MetaData SQLAlchemy MetaData
         :param sqlalchemy.engine.Engine alchemy_engine:
+        :param RunReport run_report: run report that records the executed DDL statements
+        :param sqlalchemy.engine.Connection connection: connection that the executor holds for the task
         """
-        for statement in self.sql_text():
-            if statement:
-                with alchemy_engine.connect() as conn:
-                    conn.execute(text(statement))
+        run_report = kwargs.get('run_report') or RunReport()
+        # all statements run in a single session (e.g. SET statements affect the following statements)
+        with connection_scope(alchemy_engine, kwargs.get('connection')) as conn:
+            for statement in self.sql_text():
+                if statement:
+                    with run_report.phase(self.task_id(), PHASE_DDL):
+                        conn.execute(text(statement))
 
     @classmethod
     def from_code(cls, target: str, target_schema: str) -> DdlTaskType:
@@ -7,8 +7,13 @@ import sqlalchemy.engine
 from sqlalchemy import select, Column
 from sqlalchemy.testing.schema import Table
 
+from dbd.db.db_connection import connection_scope
+from dbd.db.db_introspection import sql_result_columns
+from dbd.db.db_metadata import metadata_lock
 from dbd.db.db_table import DbTable
 from dbd.tasks.db_table_task import DbTableTask
+from dbd.utils.profiling_utils import RunReport, PHASE_INTROSPECT, PHASE_CREATE_TABLE, PHASE_CREATE_VIEW, \
+    PHASE_INSERT_SELECT
 from dbd.utils.sql_parser import SqlParser
 from dbd.utils.text_utils import fully_qualified_table_name
 
@@ -31,40 +36,62 @@ class EltTask(DbTableTask):
         :param Dict[str, Any] task_def: Target table definition
         """
         super().__init__(task_def)
+        # SQL parsing is expensive and the dependencies are requested many times during planning
+        self.__sql_tables_cache = (None, [])
 
-    def __create_tmp_reflection_view(self, fully_qualified_view_name: str,
-                                     alchemy_engine: sqlalchemy.engine.Engine):
+    def __create_tmp_reflection_view(self, fully_qualified_view_name: str, alchemy_engine: sqlalchemy.engine.Engine,
+                                     connection: sqlalchemy.engine.Connection = None):
         """
         Creates a temporary helper database view for introspecting the ELT task's
         SELECT result's structure (columns and types)
-        TODO: some more clever way of introspection without creating a database view
         :param str fully_qualified_view_name: str fully qualified view name
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy Engine
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
         view_sql_create = f"CREATE VIEW {fully_qualified_view_name} AS {self.sql()}"
         log.debug(f"Creating temporary view sql='{view_sql_create}'")
-        with alchemy_engine.connect() as conn:
+        with connection_scope(alchemy_engine, connection) as conn:
             conn.execute(view_sql_create)
 
-    def __drop_tmp_reflection_view(self, fully_qualified_view_name: str, alchemy_engine: sqlalchemy.engine.Engine):
+    def __drop_tmp_reflection_view(self, fully_qualified_view_name: str, alchemy_engine: sqlalchemy.engine.Engine,
+                                   connection: sqlalchemy.engine.Connection = None):
         """
         Drops the temporary helper database view for introspecting the ELT task's
         SELECT result's structure (columns and types)
-        TODO: some more clever way of introspection without creating a database view
         :param str fully_qualified_view_name: fully qualified view name
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy Engine
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
         view_sql_drop = f"DROP VIEW IF EXISTS {fully_qualified_view_name}"
-        with alchemy_engine.connect() as conn:
+        with connection_scope(alchemy_engine, connection) as conn:
             conn.execute(view_sql_drop)
 
-    def __sql_columns(self, target_alchemy_metadata: sqlalchemy.MetaData,
-                      alchemy_engine: sqlalchemy.engine.Engine) -> List[sqlalchemy.Column]:
+    def __sql_columns(self, target_alchemy_metadata: sqlalchemy.MetaData, alchemy_engine: sqlalchemy.engine.Engine,
+                      connection: sqlalchemy.engine.Connection = None) -> List[sqlalchemy.Column]:
         """
-        Introspects ETL task SELECT statement structure (result's column names and types)
-        TODO: some more clever way of introspection without creating a database view
+        Introspects ETL task SELECT statement structure (result's column names and types). The columns are
+        read from the description of a query that returns no rows. The temporary view is the fallback.
         :param sqlalchemy.MetaData target_alchemy_metadata: SQLAlchemy MetaData
         :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy Engine
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
+        :return: list of the SELECT result columns (SQLAlchemy Column[])
+        :rtype: List[sqlalchemy.Column]
+        """
+        columns = sql_result_columns(self.sql(), alchemy_engine, connection)
+        if columns is not None:
+            return columns
+        log.debug(f"Introspecting SQL of '{self.task_id()}' with a temporary view.")
+        return self.__sql_columns_from_tmp_view(target_alchemy_metadata, alchemy_engine, connection)
+
+    def __sql_columns_from_tmp_view(self, target_alchemy_metadata: sqlalchemy.MetaData,
+                                    alchemy_engine: sqlalchemy.engine.Engine,
+                                    connection: sqlalchemy.engine.Connection = None) -> List[sqlalchemy.Column]:
+        """
+        Introspects ETL task SELECT statement structure (result's column names and types) by reflecting
+        a temporary view. Used for dialects that can't report the result types of a query (e.g. SQLite).
+        :param sqlalchemy.MetaData target_alchemy_metadata: SQLAlchemy MetaData
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy Engine
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         :return: list of the SELECT result columns (SQLAlchemy Column[])
         :rtype: List[sqlalchemy.Column]
         """
@@ -77,39 +104,49 @@ class EltTask(DbTableTask):
         else:
             fully_qualified_view_name = fully_qualified_table_name(target_db_schema, view_name, quoted=True)
         try:
-            self.__drop_tmp_reflection_view(fully_qualified_view_name, alchemy_engine)
-            self.__create_tmp_reflection_view(fully_qualified_view_name, alchemy_engine)
-            # SQLAlchemy reflection / autoload doesn't work with fully qualified view name
-            try:
-                tmp_reflection_view = Table(view_name, target_alchemy_metadata, autoload=True, quote=True)
-            except KeyError:
-                # Snowflake case sensitivity fix
+            self.__drop_tmp_reflection_view(fully_qualified_view_name, alchemy_engine, connection)
+            self.__create_tmp_reflection_view(fully_qualified_view_name, alchemy_engine, connection)
+            # the view is reflected on the task's connection (it may not be visible to other connections yet)
+            autoload_with = connection if connection is not None else alchemy_engine
+            with metadata_lock(target_alchemy_metadata):
+                # SQLAlchemy reflection / autoload doesn't work with fully qualified view name
                 try:
-                    tmp_reflection_view = Table(view_name.upper(), target_alchemy_metadata, autoload=True, quote=True,
-                                                schema=target_db_schema.upper())
+                    tmp_reflection_view = Table(view_name, target_alchemy_metadata, autoload_with=autoload_with,
+                                                quote=True)
                 except KeyError:
-                    tmp_reflection_view = Table(view_name.lower(), target_alchemy_metadata, autoload=True, quote=True,
-                                                schema=target_db_schema.lower())
+                    # Snowflake case sensitivity fix
+                    try:
+                        tmp_reflection_view = Table(view_name.upper(), target_alchemy_metadata,
+                                                    autoload_with=autoload_with, quote=True,
+                                                    schema=target_db_schema.upper())
+                    except KeyError:
+                        tmp_reflection_view = Table(view_name.lower(), target_alchemy_metadata,
+                                                    autoload_with=autoload_with, quote=True,
+                                                    schema=target_db_schema.lower())
+                columns = [Column(c.name, c.type) for c in tmp_reflection_view.columns]
+                # the view is gone, don't leave it in the (possibly persisted) metadata
+                target_alchemy_metadata.remove(tmp_reflection_view)
         finally:
-            self.__drop_tmp_reflection_view(fully_qualified_view_name, alchemy_engine)
-        temp_view_select_all_columns = select(tmp_reflection_view.columns).select_from(tmp_reflection_view)
-        return [Column(c.name, c.type) for c in temp_view_select_all_columns.selected_columns]
+            self.__drop_tmp_reflection_view(fully_qualified_view_name, alchemy_engine, connection)
+        return columns
 
     # noinspection DuplicatedCode
     def __override_sql_column_definitions(self, target_alchemy_metadata: sqlalchemy.MetaData,
-                                          alchemy_engine: sqlalchemy.engine.Engine) -> Dict[str, Any]:
+                                          alchemy_engine: sqlalchemy.engine.Engine,
+                                          connection: sqlalchemy.engine.Connection = None) -> Dict[str, Any]:
         """
         Merges the SQL result column definitions with the column definitions from the ELT task.
         The column definitions override the introspected SQL types
         :param sqlalchemy.MetaData target_alchemy_metadata: MetaData SQLAlchemy MetaData
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy Engine
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         :return: ETL task definition merged from the SELECT result structure overridden
             with the ELT task's explicit column definitions
         :rtype: Dict[str, Any]
         """
         table_def = self.table_def()
         column_overrides = table_def.get('columns', {})
-        tmp_reflection_view_columns = self.__sql_columns(target_alchemy_metadata, alchemy_engine)
+        tmp_reflection_view_columns = self.__sql_columns(target_alchemy_metadata, alchemy_engine, connection)
         ordered_columns = {}
         for c in tmp_reflection_view_columns:
             overridden_column = column_overrides.get(c.name)
@@ -130,12 +167,16 @@ class EltTask(DbTableTask):
         """
         return self.task_data()
 
-    def set_sql(self, sql: str):
+    def set_sql(self, sql: str, sql_tables: List[str] = None):
         """
         Sets task SQL
         :param sql: SQL statement
+        :param List[str] sql_tables: tables that the SQL statement depends on (if they are already known, e.g. from
+            the model cache). The SQL statement is parsed on demand if None.
         """
         self.set_task_data(sql)
+        if sql_tables is not None:
+            self.__sql_tables_cache = (sql, sql_tables)
 
     @classmethod
     def from_code(cls, task_def: Dict[str, Any]) -> EltTaskType:
@@ -153,26 +194,38 @@ class EltTask(DbTableTask):
         Executes / creates the task
         :param sqlalchemy.MetaData target_alchemy_metadata: MetaData SQLAlchemy MetaData
         :param sqlalchemy.engine.Engine alchemy_engine:
+        :param RunReport run_report: run report that records the task phases (introspect, insert-select, etc.)
+        :param sqlalchemy.engine.Connection connection: connection that the executor holds for the task
         """
+        run_report = kwargs.get('run_report') or RunReport()
         process_def = self.process_def()
         materialization = process_def.get('materialization', 'table')
         quoted = True if alchemy_engine.dialect.name != 'bigquery' else False
-        if materialization == 'view':
-            sql_text = f"CREATE VIEW  {self.fully_qualified_target(quoted=quoted)} AS {self.sql()}"
-            with alchemy_engine.connect() as conn:
-                click.echo(f"\tCreating view '{self.fully_qualified_target(quoted=False)}'.")
-                conn.execute(sql_text)
-        else:
-            overridden_def = self.__override_sql_column_definitions(target_alchemy_metadata, alchemy_engine)
-            db_table = DbTable.from_code(self.target(), overridden_def, target_alchemy_metadata, self.target_schema())
-            self.set_db_table(db_table)
-            click.echo(f"\tCreating table '{self.fully_qualified_target(quoted=False)}'.")
-            db_table.create()
-            columns = [f'{c.name()}' for c in db_table.columns()]
-            click.echo(f"\tExecuting SQL.")
-            sql_text = f"INSERT INTO {self.fully_qualified_target(quoted=quoted)}({','.join(columns)}) {self.sql()}"
-            with alchemy_engine.connect() as conn:
-                conn.execute(sql_text)
+        with connection_scope(alchemy_engine, kwargs.get('connection')) as conn:
+            if materialization == 'view':
+                sql_text = f"CREATE VIEW  {self.fully_qualified_target(quoted=quoted)} AS {self.sql()}"
+                with run_report.phase(self.task_id(), PHASE_CREATE_VIEW):
+                    click.echo(f"\tCreating view '{self.fully_qualified_target(quoted=False)}'.")
+                    conn.execute(sql_text)
+            else:
+                with run_report.phase(self.task_id(), PHASE_INTROSPECT):
+                    overridden_def = self.__override_sql_column_definitions(target_alchemy_metadata, alchemy_engine,
+                                                                            conn)
+                with run_report.phase(self.task_id(), PHASE_CREATE_TABLE):
+                    db_table = DbTable.from_code(self.target(), overridden_def, target_alchemy_metadata,
+                                                 self.target_schema(), shadow_table=self.shadow_load())
+                    self.set_db_table(db_table)
+                    click.echo(f"\tCreating table '{self.fully_qualified_load_target(quoted=False)}'.")
+                    db_table.create(conn)
+                columns = [f'{c.name()}' for c in db_table.columns()]
+                click.echo(f"\tExecuting SQL.")
+                sql_text = f"INSERT INTO {self.fully_qualified_load_target(quoted=quoted)}({','.join(columns)}) " \
+                           f"{self.sql()}"
+                with run_report.phase(self.task_id(), PHASE_INSERT_SELECT) as insert_select:
+                    result = conn.execute(sql_text)
+                    # some drivers don't report the number of inserted rows (-1)
+                    if result.rowcount is not None and result.rowcount > 0:
+                        insert_select.add(rows=result.rowcount)
 
     def depends_on(self) -> List[str]:
         """
@@ -182,7 +235,11 @@ class EltTask(DbTableTask):
         """
         target_db_schema = self.target_schema()
         foreign_key_tables = super(EltTask, self).depends_on()
-        sql_tables = SqlParser.extract_tables(self.sql())
+        sql = self.sql()
+        cached_sql, sql_tables = self.__sql_tables_cache
+        if sql is None or sql != cached_sql:
+            sql_tables = SqlParser.extract_tables(sql)
+            self.__sql_tables_cache = (sql, sql_tables)
         return foreign_key_tables + [
             f"{fully_qualified_table_name(target_db_schema, t, quoted=False)}" if len(t.split('.')) < 2 else t for t in
             sql_tables]
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from typing import Any, List, TypeVar, Tuple, Dict
 
 import sqlalchemy
@@ -100,6 +102,14 @@ class Task:
         """
         pass
 
+    def content_hash(self, **kwargs) -> str:
+        """
+        Returns hash of the task's inputs. The task yields the same result as long as its hash doesn't change.
+        :return: hex digest of the task's inputs or None if the inputs can't be hashed (the task always executes)
+        :rtype: str
+        """
+        return hashlib.sha256(json.dumps(self.task_data(), sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
     def __eq__(self, other: TaskType) -> bool:
         """
         Comparator
@@ -127,13 +137,16 @@ class Task:
         :param sqlalchemy.MetaData target_alchemy_metadata: MetaData SQLAlchemy MetaData
         :param sqlalchemy.engine.Engine alchemy_engine:
         :param Dict[str, str] copy_stage_storage: copy stage storage parameters e.g. AWS S3 dict(url, access_key, secret_key)
+        :param sqlalchemy.engine.Connection connection: connection that the executor holds for the task
         """
         pass
 
-    def drop(self, alchemy_metadata: sqlalchemy.MetaData, alchemy_engine: sqlalchemy.engine.Engine):
+    def drop(self, alchemy_metadata: sqlalchemy.MetaData, alchemy_engine: sqlalchemy.engine.Engine,
+             connection: sqlalchemy.engine.Connection = None):
         """
         Drops the target table in the database
         :param sqlalchemy.MetaData alchemy_metadata: SqlAlchemy metadata
         :param sqlalchemy.engine.Engine alchemy_engine: Engine SQLAlchemy engine database connection
+        :param sqlalchemy.engine.Connection connection: connection to use instead of a new one from the engine
         """
         pass
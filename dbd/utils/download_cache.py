@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Any, Set
+
+from requests import ConnectionError, Timeout
+
+from dbd.utils.io_utils import download_file, url_to_filename, download_kaggle
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DOWNLOAD_CACHE_SIZE_MB = 10240
+DOWNLOAD_CACHE_ENTRY_FILE = 'entry.json'
+DOWNLOAD_CACHE_DATA_DIR = 'data'
+
+
+def default_cache_directory() -> str:
+    """
+    Returns the default download cache directory (~/.cache/dbd or $XDG_CACHE_HOME/dbd)
+    :return: default download cache directory
+    :rtype: str
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'dbd')
+
+
+class DownloadCache:
+    """
+    Persistent download cache. The downloaded files are stored under a directory derived from the SHA-256 hash
+    of their URL together with the ETag and Last-Modified response headers. Cached URLs are revalidated with
+    conditional GET requests, so an unchanged file costs a 304 response instead of a new download.
+    The least recently used entries are evicted when the cache grows over its maximal size.
+    """
+
+    def __init__(self, directory: str, max_size_mb: int = DEFAULT_DOWNLOAD_CACHE_SIZE_MB):
+        """
+        Constructor
+        :param str directory: cache directory
+        :param int max_size_mb: maximal cache size in megabytes
+        """
+        self.__directory = directory
+        self.__max_size = max_size_mb * 1024 * 1024
+        # entries used by this process are never evicted
+        self.__pinned: Set[str] = set()
+        self.__lock = threading.Lock()
+
+    def directory(self) -> str:
+        """
+        Returns the cache directory
+        :return: cache directory
+        :rtype: str
+        """
+        return self.__directory
+
+    def __entry_directory(self, key: str) -> str:
+        """
+        Returns the cache entry directory
+        :param str key: cache entry key (URL)
+        :return: cache entry directory
+        :rtype: str
+        """
+        return os.path.join(self.__directory, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def __read_entry(self, entry_directory: str) -> Dict[str, Any]:
+        """
+        Reads the cache entry metadata
+        :param str entry_directory: cache entry directory
+        :return: cache entry metadata or None if the entry doesn't exist or is corrupted
+        :rtype: Dict[str, Any]
+        """
+        try:
+            with open(os.path.join(entry_directory, DOWNLOAD_CACHE_ENTRY_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def __write_entry(self, entry_directory: str, entry: Dict[str, Any]):
+        """
+        Writes the cache entry metadata
+        :param str entry_directory: cache entry directory
+        :param Dict[str, Any] entry: cache entry metadata
+        """
+        entry['last_used'] = time.time()
+        entry_file = os.path.join(entry_directory, DOWNLOAD_CACHE_ENTRY_FILE)
+        with open(f"{entry_file}.tmp", 'w') as f:
+            json.dump(entry, f)
+        os.replace(f"{entry_file}.tmp", entry_file)
+
+    def fetch(self, url: str) -> str:
+        """
+        Returns the local file with the URL content. Downloads the URL if it isn't cached or if it changed
+        since it was cached.
+        :param str url: URL
+        :return: local file name
+        :rtype: str
+        """
+        entry_directory = self.__entry_directory(url)
+        with self.__lock:
+            self.__pinned.add(entry_directory)
+        data_directory = os.path.join(entry_directory, DOWNLOAD_CACHE_DATA_DIR)
+        local_file_name = os.path.join(data_directory, url_to_filename(url))
+        entry = self.__read_entry(entry_directory)
+        headers = {}
+        if entry is not None and os.path.exists(local_file_name):
+            if entry.get('etag') is not None:
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified') is not None:
+                headers['If-Modified-Since'] = entry['last_modified']
+        else:
+            entry = None
+        os.makedirs(data_directory, exist_ok=True)
+        try:
+            response_headers = download_file(url, f"{local_file_name}.part", headers=headers)
+        except (ConnectionError, Timeout) as e:
+            if entry is not None:
+                log.warning(f"Can't revalidate '{url}' because of '{e}'. Using the cached file.")
+                self.__write_entry(entry_directory, entry)
+                return local_file_name
+            raise
+        if response_headers is None:
+            log.debug(f"Cached file for '{url}' is up to date.")
+        else:
+            os.replace(f"{local_file_name}.part", local_file_name)
+            log.debug(f"Cached '{url}' to '{local_file_name}'.")
+            entry = dict(url=url, etag=response_headers.get('ETag'),
+                         last_modified=response_headers.get('Last-Modified'))
+        self.__write_entry(entry_directory, entry)
+        self.evict()
+        return local_file_name
+
+    def fetch_kaggle(self, dataset_id: str) -> str:
+        """
+        Returns the local directory with the Kaggle dataset ZIP file. The Kaggle API downloads the dataset only
+        if it isn't cached or if it's newer than the cached file.
+        :param str dataset_id: Kaggle dataset id
+        :return: local directory with the dataset ZIP file
+        :rtype: str
+        """
+        key = f"kaggle://{dataset_id}"
+        entry_directory = self.__entry_directory(key)
+        with self.__lock:
+            self.__pinned.add(entry_directory)
+        data_directory = os.path.join(entry_directory, DOWNLOAD_CACHE_DATA_DIR)
+        os.makedirs(data_directory, exist_ok=True)
+        download_kaggle(dataset_id, data_directory)
+        self.__write_entry(entry_directory, dict(url=key))
+        self.evict()
+        return data_directory
+
+    def size(self) -> int:
+        """
+        Returns the total size of the cached files
+        :return: size in bytes
+        :rtype: int
+        """
+        return sum(self.__entry_sizes().values())
+
+    def __entry_sizes(self) -> Dict[str, int]:
+        """
+        Returns sizes of all cache entries
+        :return: entry directories and their sizes in bytes
+        :rtype: Dict[str, int]
+        """
+        sizes = {}
+        if os.path.isdir(self.__directory):
+            for name in os.listdir(self.__directory):
+                entry_directory = os.path.join(self.__directory, name)
+                if os.path.isdir(entry_directory):
+                    size = 0
+                    for root, _, files in os.walk(entry_directory):
+                        for file in files:
+                            try:
+                                size += os.path.getsize(os.path.join(root, file))
+                            except OSError:
+                                pass
+                    sizes[entry_directory] = size
+        return sizes
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache size is below its maximal size.
+        Entries used by this process are never deleted.
+        """
+        with self.__lock:
+            sizes = self.__entry_sizes()
+            total_size = sum(sizes.values())
+            if total_size <= self.__max_size:
+                return
+            last_used = {}
+            for entry_directory in sizes.keys():
+                entry = self.__read_entry(entry_directory)
+                last_used[entry_directory] = entry.get('last_used', 0) if entry is not None else 0
+            for entry_directory in sorted(sizes.keys(), key=lambda d: last_used[d]):
+                if total_size <= self.__max_size:
+                    break
+                if entry_directory not in self.__pinned:
+                    log.debug(f"Evicting download cache entry '{entry_directory}'.")
+                    shutil.rmtree(entry_directory, ignore_errors=True)
+                    total_size -= sizes[entry_directory]
@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, TypeVar
+
+from dbd.utils.download_cache import DownloadCache
+from dbd.utils.io_utils import download_file, url_to_filename, is_kaggle, extract_kaggle_dataset_id_and_zip_name, \
+    download_kaggle
+
+log = logging.getLogger(__name__)
+
+DownloadManagerType = TypeVar('DownloadManagerType', bound='DownloadManager')
+
+DEFAULT_DOWNLOAD_WORKERS = 4
+
+
+class DownloadManager:
+    """
+    Downloads files and Kaggle datasets concurrently on a bounded thread pool. Each URL (or Kaggle dataset)
+    is downloaded once, no matter how many times it's requested, so e.g. all tasks that read members of the same
+    ZIP archive share a single download. Downloaded files are deleted when they are released by all their users
+    (unless they are stored in a persistent download cache).
+    """
+
+    def __init__(self, directory: str, workers: int = DEFAULT_DOWNLOAD_WORKERS, cache: DownloadCache = None):
+        """
+        Constructor
+        :param str directory: directory for downloaded files
+        :param int workers: maximal number of concurrent downloads
+        :param DownloadCache cache: persistent download cache. Files are downloaded to the directory if it's None.
+        """
+        self.__directory = directory
+        self.__cache = cache
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dbd-download')
+        self.__downloads: Dict[str, Future] = {}
+        self.__references: Dict[str, int] = {}
+        self.__lock = threading.Lock()
+
+    def __enter__(self) -> DownloadManagerType:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def cache(self) -> DownloadCache:
+        """
+        Returns the persistent download cache
+        :return: persistent download cache or None if the downloads aren't cached
+        :rtype: DownloadCache
+        """
+        return self.__cache
+
+    def __local_file_name(self, url: str) -> str:
+        """
+        Returns local file name for the URL. Each URL gets its own subdirectory, so URLs with the same
+        file name don't collide.
+        :param str url: URL
+        :return: local file name
+        :rtype: str
+        """
+        url_hash = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.__directory, url_hash, url_to_filename(url))
+
+    def __download(self, url: str) -> str:
+        """
+        Downloads the URL to the local file
+        :param str url: URL or Kaggle dataset URL (e.g. 'kaggle://owner/dataset')
+        :return: local file name (the dataset's ZIP file for Kaggle datasets)
+        :rtype: str
+        """
+        if is_kaggle(url):
+            return self.__download_kaggle(url)
+        if self.__cache is not None:
+            return self.__cache.fetch(url)
+        local_file_name = self.__local_file_name(url)
+        os.makedirs(os.path.dirname(local_file_name), exist_ok=True)
+        log.debug(f"Downloading '{url}' to '{local_file_name}'.")
+        download_file(url, local_file_name)
+        log.debug(f"Downloaded '{url}'.")
+        return local_file_name
+
+    def __download_kaggle(self, url: str) -> str:
+        """
+        Downloads the Kaggle dataset's ZIP file
+        :param str url: Kaggle dataset URL (e.g. 'kaggle://owner/dataset')
+        :return: local ZIP file name
+        :rtype: str
+        """
+        kaggle_dataset_id, kaggle_zip_name = extract_kaggle_dataset_id_and_zip_name(url)
+        if self.__cache is not None:
+            kaggle_dir = self.__cache.fetch_kaggle(kaggle_dataset_id)
+        else:
+            kaggle_dir = os.path.dirname(self.__local_file_name(url))
+            os.makedirs(kaggle_dir, exist_ok=True)
+            log.debug(f"Downloading Kaggle dataset '{kaggle_dataset_id}' to '{kaggle_dir}'.")
+            download_kaggle(kaggle_dataset_id, kaggle_dir)
+        return os.path.join(kaggle_dir, f"{kaggle_zip_name}.zip")
+
+    def prefetch(self, url: str) -> Future:
+        """
+        Starts downloading the URL in background (unless it's already downloading) and registers a new user
+        of the downloaded file. Each prefetch must be paired with a release.
+        :param str url: URL or Kaggle dataset URL
+        :return: future of the local file name
+        :rtype: Future
+        """
+        with self.__lock:
+            future = self.__downloads.get(url)
+            if future is None:
+                future = self.__executor.submit(self.__download, url)
+                self.__downloads[url] = future
+            self.__references[url] = self.__references.get(url, 0) + 1
+            return future
+
+    def file(self, url: str) -> str:
+        """
+        Waits until the URL is downloaded and returns the local file name. Downloads the URL if it hasn't been
+        prefetched.
+        :param str url: URL or Kaggle dataset URL
+        :return: local file name
+        :rtype: str
+        """
+        with self.__lock:
+            future = self.__downloads.get(url)
+        if future is None:
+            future = self.prefetch(url)
+        return future.result()
+
+    def release(self, url: str):
+        """
+        Unregisters a user of the downloaded file. The file is deleted when it has no users.
+        :param str url: URL or Kaggle dataset URL
+        """
+        with self.__lock:
+            references = self.__references.get(url, 0) - 1
+            if references > 0:
+                self.__references[url] = references
+                return
+            self.__references.pop(url, None)
+            future = self.__downloads.pop(url, None)
+        if self.__cache is None and future is not None and future.done() and future.exception() is None:
+            shutil.rmtree(os.path.dirname(future.result()), ignore_errors=True)
+
+    def shutdown(self):
+        """
+        Cancels pending downloads and waits for the running ones
+        """
+        # ThreadPoolExecutor.shutdown(cancel_futures=True) requires Python 3.9
+        with self.__lock:
+            futures = list(self.__downloads.values())
+        for future in futures:
+            future.cancel()
+        self.__executor.shutdown(wait=True)
@@ -1,24 +1,39 @@
-from typing import List, Tuple
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
+import os
+from contextlib import contextmanager, ExitStack
+from typing import List, Tuple, Dict, IO, Iterator
 from zipfile import ZipFile
 import logging
 
-from requests import get as get_url
+from requests import get as get_url, head as head_url, RequestException
+
+from dbd.log.dbd_exception import DbdException
 
 log = logging.getLogger(__name__)
 
-try:
-    from kaggle import KaggleApi
-except ImportError:
+
+class DbdInvalidRef(Exception):
     pass
-except OSError:
-    logging.debug("Kaggle API not initialized. Please create ~/.kaggle/kaggle.json.")
 
 
-class DbdInvalidRef(Exception):
+class DbdUnsupportedCompression(DbdException):
     pass
 
 
 ZIP_LOCATOR_SEPARATOR = '>'
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# extensions of the compressed data files (e.g. population.csv.gz)
+COMPRESSION_EXTENSIONS = ['.gz', '.bz2', '.xz', '.zst']
+# magic numbers of the compression formats
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
 
 
 def is_url(url: str) -> bool:
@@ -86,18 +101,86 @@ def zip_to_url_and_locator(url: str) -> List[str]:
     return components
 
 
-def download_file(url: str, local_filename: str):
+def data_file_url(data_file: str) -> str:
+    """
+    Returns the URL that a data file reference (e.g. a line of a REF file) downloads
+    :param str data_file: data file reference (local file, URL, Kaggle dataset, ZIP file locator)
+    :return: URL or None if the reference doesn't point to a URL
+    :rtype: str
+    """
+    if is_zip(data_file):
+        data_file = zip_to_url_and_locator(data_file)[0]
+    return data_file if is_url(data_file) else None
+
+
+def data_file_download(data_file: str) -> str:
+    """
+    Returns the URL or Kaggle dataset that a data file reference (e.g. a line of a REF file) downloads
+    :param str data_file: data file reference (local file, URL, Kaggle dataset, ZIP file locator)
+    :return: URL, Kaggle dataset URL (e.g. 'kaggle://owner/dataset') or None if the reference doesn't download
+        anything
+    :rtype: str
+    """
+    if is_zip(data_file):
+        data_file = zip_to_url_and_locator(data_file)[0]
+    return data_file if is_url(data_file) or is_kaggle(data_file) else None
+
+
+def download_file(url: str, local_filename: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                  headers: Dict[str, str] = None) -> Dict[str, str]:
     """
     Downloads a file from a URL to a local file
     :param str url: url of the file to download
     :param str local_filename: local filename to save the file to
-    :return: None 
+    :param int chunk_size: size of the chunks written to the local file
+    :param Dict[str, str] headers: additional request headers (e.g. If-None-Match for conditional requests)
+    :return: response headers or None if the server responded with 304 Not Modified (nothing is downloaded)
+    :rtype: Dict[str, str]
     """
-    with get_url(url, stream=True) as r:
+    with get_url(url, stream=True, headers=headers) as r:
         r.raise_for_status()
+        if r.status_code == 304:
+            return None
         with open(local_filename, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
+            for chunk in r.iter_content(chunk_size=chunk_size):
                 f.write(chunk)
+        return dict(r.headers)
+
+
+def file_hash(file_name: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> str:
+    """
+    Returns SHA-256 hash of the file content
+    :param str file_name: file name
+    :param int chunk_size: size of the chunks read from the file
+    :return: hex digest of the file content
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def url_validators(url: str) -> str:
+    """
+    Returns the URL's validators (ETag, Last-Modified and Content-Length response headers) that change
+    when the remote file changes
+    :param str url: URL
+    :return: validators or None if the server doesn't return them or can't be reached
+    :rtype: str
+    """
+    try:
+        with head_url(url, allow_redirects=True, timeout=30) as r:
+            r.raise_for_status()
+            etag = r.headers.get('ETag')
+            last_modified = r.headers.get('Last-Modified')
+            if etag is None and last_modified is None:
+                return None
+            return f"{etag}|{last_modified}|{r.headers.get('Content-Length')}"
+    except RequestException as e:
+        log.debug(f"Can't get validators of URL '{url}': {e}")
+        return None
 
 
 def download_kaggle(dataset_id: str, tmpdir: str):
@@ -107,18 +190,92 @@ def download_kaggle(dataset_id: str, tmpdir: str):
     :param str tmpdir: dir to save the file to
     :return: None
     """
+    # Kaggle API is loaded (and authenticated) only when a Kaggle dataset is downloaded
+    try:
+        from kaggle import KaggleApi
+    except OSError as e:
+        raise DbdInvalidRef(f"Kaggle API not initialized. Please create ~/.kaggle/kaggle.json. ({e})")
     api = KaggleApi()
     api.authenticate()
     api.dataset_download_files(dataset_id, tmpdir, unzip=False, force=False)
 
 
-def extract_zip_file(zip_file: str, zip_locator: str, local_filename: str):
+def split_compression_extension(file_name: str) -> Tuple[str, str]:
     """
-    Downloads a file from a ZIP file locator to a local file
-    :param str zip_file: ZIP file
-    :param str zip_locator: ZIP file locator
-    :param str local_filename: local filename to save the file to
-    :return: None
+    Splits the compression extension from a file name (e.g. 'population.csv.gz' -> ('population.csv', '.gz'))
+    :param str file_name: file name
+    :return: file name without the compression extension and the compression extension ('' if there is none)
+    :rtype: Tuple[str, str]
+    """
+    root, extension = os.path.splitext(file_name)
+    if extension.lower() in COMPRESSION_EXTENSIONS:
+        return root, extension.lower()
+    return file_name, ''
+
+
+def zip_member_locator(zip_file: str, zip_member: str) -> str:
+    """
+    Returns the ZIP file locator of a member of a local ZIP file (e.g. '/tmp/archive.zip>population.csv')
+    :param str zip_file: local ZIP file
+    :param str zip_member: name of the file in the ZIP file
+    :return: ZIP file locator
+    :rtype: str
+    """
+    return f"{zip_file}{ZIP_LOCATOR_SEPARATOR}{zip_member}"
+
+
+def data_file_size(file_name: str) -> int:
+    """
+    Returns the size of a local data file or of a member of a local ZIP file (uncompressed)
+    :param str file_name: file name or ZIP file locator (see zip_member_locator)
+    :return: size in bytes
+    :rtype: int
+    """
+    if is_zip(file_name):
+        zip_file, zip_member = zip_to_url_and_locator(file_name)
+        with ZipFile(zip_file, 'r') as archive:
+            return archive.getinfo(zip_member).file_size
+    return os.path.getsize(file_name)
+
+
+@contextmanager
+def open_data_file(file_name: str, encoding: str = None) -> Iterator[IO]:
+    """
+    Opens a data file for reading. Members of ZIP files (see zip_member_locator) are streamed from the archive
+    without extracting them. Compressed files (see COMPRESSION_EXTENSIONS) are decompressed while they are read.
+    The compression format is detected from the file's content, so a file that was already decompressed
+    (e.g. by the HTTP transport) is read as it is.
+    :param str file_name: file name or ZIP file locator
+    :param str encoding: text encoding. The file is opened in binary mode if None.
+    :return: file object
+    :rtype: Iterator[IO]
     """
-    with ZipFile(zip_file, 'r') as zipObj:
-        zipObj.extract(zip_locator, local_filename)
+    with ExitStack() as stack:
+        if is_zip(file_name):
+            zip_file, zip_member = zip_to_url_and_locator(file_name)
+            # the member stays readable after the archive is closed
+            with ZipFile(zip_file, 'r') as archive:
+                stream = stack.enter_context(archive.open(zip_member, 'r'))
+        else:
+            stream = stack.enter_context(open(file_name, 'rb'))
+        if split_compression_extension(file_name)[1] != '':
+            magic = stream.read(len(XZ_MAGIC))
+            stream.seek(0)
+            if magic.startswith(GZIP_MAGIC):
+                stream = stack.enter_context(gzip.GzipFile(fileobj=stream, mode='rb'))
+            elif magic.startswith(BZIP2_MAGIC):
+                stream = stack.enter_context(bz2.BZ2File(stream, 'rb'))
+            elif magic.startswith(XZ_MAGIC):
+                stream = stack.enter_context(lzma.LZMAFile(stream, 'rb'))
+            elif magic.startswith(ZSTD_MAGIC):
+                # zstandard is an optional dependency needed for .zst files only
+                try:
+                    import zstandard
+                except ImportError:
+                    raise DbdUnsupportedCompression(f"Reading '{file_name}' requires the 'zstandard' package. "
+                                                    f"Install it with 'pip install zstandard'.")
+                stream = stack.enter_context(zstandard.ZstdDecompressor().stream_reader(stream,
+                                                                                        read_across_frames=True))
+        if encoding is not None:
+            stream = stack.enter_context(io.TextIOWrapper(stream, encoding=encoding))
+        yield stream
@@ -1,6 +1,52 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from timeit import default_timer as timer
+from typing import Dict, Any, Iterator, Iterable, TypeVar, List, Optional
 
 import click
+import sqlalchemy.engine
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+PHASE_DROP = 'drop'
+PHASE_DDL = 'ddl'
+PHASE_DOWNLOAD = 'download'
+PHASE_PARSE = 'parse'
+PHASE_COERCE = 'coerce'
+PHASE_INTROSPECT = 'introspect'
+PHASE_CREATE_TABLE = 'create table'
+PHASE_CREATE_VIEW = 'create view'
+PHASE_LOAD = 'load'
+PHASE_INSERT_SELECT = 'insert-select'
+PHASE_SWAP = 'swap'
+PHASE_MERGE = 'merge'
+
+# phases that write rows to the task's target table
+TARGET_PHASES = [PHASE_LOAD, PHASE_INSERT_SELECT]
+
+TASK_STATUS_SUCCEEDED = 'succeeded'
+TASK_STATUS_FAILED = 'failed'
+# e.g. the tasks after a failed one, they have only the drop phase
+TASK_STATUS_NOT_RUN = 'not run'
+
+RUN_REPORT_VERSION = 1
+RUN_REPORT_SUMMARY_TASKS = 20
+
+STATEMENT_TIMER_TOP_STATEMENTS = 20
+STATEMENT_TIMER_SUMMARY_LENGTH = 200
+STATEMENT_TIMER_START_KEY = 'dbd_statement_start'
+
+T = TypeVar('T')
+
+# ID of the task that the current thread executes
+__current_task = threading.local()
 
 
 def profile_method(method_name, method_to_profile):
@@ -9,3 +55,356 @@ def profile_method(method_name, method_to_profile):
     end = timer()
     click.echo(f"{method_name} took {end - start} seconds")
     return result
+
+
+def current_task_id() -> Optional[str]:
+    """
+    Returns ID of the task that the current thread executes
+    :return: task ID or None if the thread doesn't execute any task
+    :rtype: str
+    """
+    return getattr(__current_task, 'task_id', None)
+
+
+@contextmanager
+def executing_task(task_id: str) -> Iterator[None]:
+    """
+    Marks the current thread as executing the task (e.g. for attributing the executed SQL statements to the task)
+    :param str task_id: task ID
+    """
+    previous_task_id = current_task_id()
+    __current_task.task_id = task_id
+    try:
+        yield
+    finally:
+        __current_task.task_id = previous_task_id
+
+
+def rows_per_second(rows: int, seconds: float) -> float:
+    """
+    Computes throughput
+    :param int rows: number of rows
+    :param float seconds: wall time
+    :return: rows per second or None if the wall time is zero
+    :rtype: float
+    """
+    return rows / seconds if seconds > 0 else None
+
+
+class PhaseTimer:
+    """
+    Measures a single execution of a task phase. Time spent in nested phases (e.g. parsing a data file that
+    is read while it's being loaded) is subtracted, so each phase reports its exclusive wall time.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.rows = 0
+        self.bytes = 0
+        self.nested_seconds = 0.0
+
+    def add(self, rows: int = 0, bytes_count: int = 0):
+        """
+        Adds processed rows and bytes to the phase
+        :param int rows: number of rows
+        :param int bytes_count: number of bytes
+        """
+        self.rows += int(rows)
+        self.bytes += int(bytes_count)
+
+
+class RunReport:
+    """
+    Collects wall time, rows, and bytes of each task and each task's phases (download, parse, load, etc.)
+    during a model execution. It's thread-safe, so tasks executed in parallel can share it.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.__started_at = datetime.now(timezone.utc)
+        self.__start = timer()
+        self.__wall_time = None
+        self.__tasks: Dict[str, Dict[str, Any]] = {}
+        self.__statements: List[Dict[str, Any]] = None
+        self.__lock = threading.Lock()
+        # stack of the running phases in each thread
+        self.__running = threading.local()
+
+    def __task(self, task_id: str) -> Dict[str, Any]:
+        """
+        Returns the task's record (must be called under the lock)
+        :param str task_id: task ID
+        :return: task record
+        :rtype: Dict[str, Any]
+        """
+        return self.__tasks.setdefault(task_id, dict(status=TASK_STATUS_NOT_RUN, wall_time=0.0, phases={}))
+
+    def add(self, task_id: str, phase: str, seconds: float = 0.0, rows: int = 0, bytes_count: int = 0):
+        """
+        Records a task phase execution
+        :param str task_id: task ID
+        :param str phase: phase name
+        :param float seconds: wall time
+        :param int rows: number of processed rows
+        :param int bytes_count: number of processed bytes
+        """
+        with self.__lock:
+            phases = self.__task(task_id)['phases']
+            stats = phases.setdefault(phase, dict(wall_time=0.0, rows=0, bytes=0, count=0))
+            stats['wall_time'] += seconds
+            stats['rows'] += rows
+            stats['bytes'] += bytes_count
+            stats['count'] += 1
+
+    @contextmanager
+    def phase(self, task_id: str, phase: str) -> Iterator[PhaseTimer]:
+        """
+        Measures a task phase
+        :param str task_id: task ID
+        :param str phase: phase name
+        :return: phase timer for recording the processed rows and bytes
+        :rtype: Iterator[PhaseTimer]
+        """
+        running = getattr(self.__running, 'phases', None)
+        if running is None:
+            running = self.__running.phases = []
+        phase_timer = PhaseTimer()
+        running.append(phase_timer)
+        start = timer()
+        try:
+            with executing_task(task_id):
+                yield phase_timer
+        finally:
+            elapsed = timer() - start
+            running.pop()
+            if len(running) > 0:
+                running[-1].nested_seconds += elapsed
+            self.add(task_id, phase, elapsed - phase_timer.nested_seconds, phase_timer.rows, phase_timer.bytes)
+
+    def timed(self, task_id: str, phase: str, items: Iterable[T]) -> Iterator[T]:
+        """
+        Measures producing of each item of an iterable (e.g. reading chunks of a data file) as a task phase.
+        The length of each item (if it has one) is recorded as the number of rows.
+        :param str task_id: task ID
+        :param str phase: phase name
+        :param Iterable[T] items: iterable
+        :return: iterator of the items
+        :rtype: Iterator[T]
+        """
+        iterator = iter(items)
+        while True:
+            with self.phase(task_id, phase) as phase_timer:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                if hasattr(item, '__len__'):
+                    phase_timer.add(rows=len(item))
+            yield item
+
+    @contextmanager
+    def task(self, task_id: str) -> Iterator[None]:
+        """
+        Measures a task execution and records its status
+        :param str task_id: task ID
+        """
+        start = timer()
+        status = TASK_STATUS_FAILED
+        try:
+            with executing_task(task_id):
+                yield
+            status = TASK_STATUS_SUCCEEDED
+        finally:
+            with self.__lock:
+                task = self.__task(task_id)
+                task['wall_time'] += timer() - start
+                task['status'] = status
+
+    def set_statements(self, statements: List[Dict[str, Any]]):
+        """
+        Sets the slowest SQL statements of the run (see StatementTimer)
+        :param List[Dict[str, Any]] statements: statements
+        """
+        self.__statements = statements
+
+    def finish(self):
+        """
+        Stops measuring the run's wall time
+        """
+        self.__wall_time = timer() - self.__start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the report as a JSON serializable dict. Tasks are sorted by their wall time (the slowest first).
+        :return: report
+        :rtype: Dict[str, Any]
+        """
+        with self.__lock:
+            tasks = []
+            phase_totals = {}
+            for task_id, task in self.__tasks.items():
+                phases = {}
+                for phase, stats in task['phases'].items():
+                    phases[phase] = dict(stats, rows_per_sec=rows_per_second(stats['rows'], stats['wall_time']))
+                    totals = phase_totals.setdefault(phase, dict(wall_time=0.0, rows=0, bytes=0, count=0))
+                    for key in totals.keys():
+                        totals[key] += stats[key]
+                rows = sum(phases[p]['rows'] for p in TARGET_PHASES if p in phases)
+                bytes_count = sum(phases[p]['bytes'] for p in TARGET_PHASES if p in phases)
+                tasks.append(dict(task_id=task_id, status=task['status'], wall_time=task['wall_time'], rows=rows,
+                                  bytes=bytes_count, rows_per_sec=rows_per_second(rows, task['wall_time']),
+                                  phases=phases))
+            for totals in phase_totals.values():
+                totals['rows_per_sec'] = rows_per_second(totals['rows'], totals['wall_time'])
+        wall_time = self.__wall_time if self.__wall_time is not None else timer() - self.__start
+        report = dict(version=RUN_REPORT_VERSION, started_at=self.__started_at.isoformat(), wall_time=wall_time,
+                      tasks=sorted(tasks, key=lambda t: t['wall_time'], reverse=True), phases=phase_totals)
+        if self.__statements is not None:
+            report['statements'] = self.__statements
+        return report
+
+    def save(self, report_file: str):
+        """
+        Writes the report to a JSON file
+        :param str report_file: report file
+        """
+        report_directory = os.path.dirname(os.path.abspath(report_file))
+        os.makedirs(report_directory, exist_ok=True)
+        with open(report_file, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def echo_summary(self, tasks_limit: int = RUN_REPORT_SUMMARY_TASKS):
+        """
+        Prints the slowest tasks with their phases and the total wall time of each phase
+        :param int tasks_limit: maximal number of printed tasks
+        """
+        report = self.to_dict()
+        if len(report['tasks']) == 0:
+            return
+        click.echo(f"Run finished in {report['wall_time']:.2f}s. Slowest tasks:")
+        for task in report['tasks'][:tasks_limit]:
+            phases = sorted(task['phases'].items(), key=lambda p: p[1]['wall_time'], reverse=True)
+            phases_summary = ', '.join(f"{p} {s['wall_time']:.2f}s" for p, s in phases)
+            throughput = f" ({task['rows_per_sec']:.0f} rows/s)" if task['rows_per_sec'] is not None else ''
+            click.echo(f"\t'{task['task_id']}' {task['status']}: {task['wall_time']:.2f}s, {task['rows']} rows"
+                       f"{throughput}{' - ' if phases_summary else ''}{phases_summary}")
+        phases = sorted(report['phases'].items(), key=lambda p: p[1]['wall_time'], reverse=True)
+        phases_summary = ', '.join(f"{p} {s['wall_time']:.2f}s" for p, s in phases)
+        click.echo(f"Phases: {phases_summary}")
+
+
+class StatementTimer:
+    """
+    Measures SQL statements executed by SQLAlchemy engines. It hooks the engine's before_cursor_execute and
+    after_cursor_execute events, logs each statement with its duration, row count, and the task that executed it,
+    and keeps the slowest statements. Engines without an attached timer have no overhead.
+    """
+
+    def __init__(self, top_statements: int = STATEMENT_TIMER_TOP_STATEMENTS):
+        """
+        Constructor
+        :param int top_statements: number of the slowest statements that are kept
+        """
+        self.__top_statements = top_statements
+        # min-heap of (seconds, sequence, statement record)
+        self.__slowest = []
+        self.__sequence = itertools.count()
+        self.__count = 0
+        self.__total_seconds = 0.0
+        self.__lock = threading.Lock()
+
+    def attach(self, alchemy_engine: sqlalchemy.engine.Engine):
+        """
+        Starts measuring the engine's statements
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        """
+        event.listen(alchemy_engine, 'before_cursor_execute', self.__before_cursor_execute)
+        event.listen(alchemy_engine, 'after_cursor_execute', self.__after_cursor_execute)
+        event.listen(alchemy_engine, 'handle_error', self.__handle_error)
+
+    def detach(self, alchemy_engine: sqlalchemy.engine.Engine):
+        """
+        Stops measuring the engine's statements
+        :param sqlalchemy.engine.Engine alchemy_engine: SQLAlchemy engine
+        """
+        event.remove(alchemy_engine, 'before_cursor_execute', self.__before_cursor_execute)
+        event.remove(alchemy_engine, 'after_cursor_execute', self.__after_cursor_execute)
+        event.remove(alchemy_engine, 'handle_error', self.__handle_error)
+
+    # noinspection PyUnusedLocal
+    def __before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        """
+        SQLAlchemy before_cursor_execute listener. Stores the statement's start time in the connection's info.
+        """
+        conn.info.setdefault(STATEMENT_TIMER_START_KEY, []).append(timer())
+
+    # noinspection PyUnusedLocal
+    def __after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        """
+        SQLAlchemy after_cursor_execute listener. Records the statement's duration.
+        """
+        starts = conn.info.get(STATEMENT_TIMER_START_KEY)
+        if not starts:
+            return
+        seconds = timer() - starts.pop()
+        rowcount = getattr(cursor, 'rowcount', None)
+        task_id = current_task_id()
+        log.debug(f"Statement of task '{task_id}' took {seconds:.3f}s, rowcount={rowcount}: '{statement}'")
+        record = dict(task_id=task_id, seconds=seconds, rowcount=rowcount, statement=statement)
+        with self.__lock:
+            self.__count += 1
+            self.__total_seconds += seconds
+            item = (seconds, next(self.__sequence), record)
+            if len(self.__slowest) < self.__top_statements:
+                heapq.heappush(self.__slowest, item)
+            elif seconds > self.__slowest[0][0]:
+                heapq.heapreplace(self.__slowest, item)
+
+    def __handle_error(self, exception_context):
+        """
+        SQLAlchemy handle_error listener. Forgets the start time of the failed statement.
+        """
+        conn = exception_context.connection
+        if conn is not None and exception_context.cursor is not None:
+            starts = conn.info.get(STATEMENT_TIMER_START_KEY)
+            if starts:
+                starts.pop()
+
+    def count(self) -> int:
+        """
+        Returns the number of measured statements
+        :return: number of measured statements
+        :rtype: int
+        """
+        with self.__lock:
+            return self.__count
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        """
+        Returns the slowest statements (the slowest first)
+        :return: list of statement records (task_id, seconds, rowcount, statement)
+        :rtype: List[Dict[str, Any]]
+        """
+        with self.__lock:
+            return [record for _, _, record in sorted(self.__slowest, key=lambda i: (-i[0], i[1]))]
+
+    def echo_summary(self):
+        """
+        Prints the slowest statements
+        """
+        slowest = self.slowest()
+        if len(slowest) == 0:
+            return
+        with self.__lock:
+            count, total_seconds = self.__count, self.__total_seconds
+        click.echo(f"Executed {count} SQL statements in {total_seconds:.2f}s. Slowest statements:")
+        for record in slowest:
+            statement = ' '.join(record['statement'].split())
+            if len(statement) > STATEMENT_TIMER_SUMMARY_LENGTH:
+                statement = f"{statement[:STATEMENT_TIMER_SUMMARY_LENGTH]}..."
+            rowcount = record['rowcount'] if record['rowcount'] is not None and record['rowcount'] >= 0 else '?'
+            click.echo(f"\t{record['seconds']:.3f}s, {rowcount} rows, task '{record['task_id'] or '-'}': {statement}")
@@ -0,0 +1,188 @@
+import math
+import struct
+from datetime import date, datetime
+from typing import Iterator, List, Callable, Any, Union
+
+import pandas as pd
+import sqlalchemy
+
+PSQL_COPY_BUFFER_SIZE = 1024 * 1024
+
+PSQL_BINARY_COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+PSQL_BINARY_COPY_TRAILER = struct.pack('!h', -1)
+PSQL_EPOCH_DATE = date(2000, 1, 1)
+PSQL_EPOCH_DATETIME = datetime(2000, 1, 1)
+PSQL_EPOCH_UNIX_MICROSECONDS = 946684800000000
+PSQL_NULL_FIELD = struct.pack('!i', -1)
+
+
+def is_null(value: Any) -> bool:
+    """
+    Returns True if the value represents NULL (None, NaN, NaT, NA)
+    :param Any value: value to check
+    :return: True if the value represents NULL
+    :rtype: bool
+    """
+    return value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and math.isnan(value))
+
+
+def __encode_text(value: Any) -> bytes:
+    return str(value).encode('utf-8')
+
+
+def __encode_bool(value: Any) -> bytes:
+    return b'\x01' if value else b'\x00'
+
+
+def __encode_int16(value: Any) -> bytes:
+    return struct.pack('!h', int(value))
+
+
+def __encode_int32(value: Any) -> bytes:
+    return struct.pack('!i', int(value))
+
+
+def __encode_int64(value: Any) -> bytes:
+    return struct.pack('!q', int(value))
+
+
+def __encode_float32(value: Any) -> bytes:
+    return struct.pack('!f', float(value))
+
+
+def __encode_float64(value: Any) -> bytes:
+    return struct.pack('!d', float(value))
+
+
+def __encode_date(value: Any) -> bytes:
+    if isinstance(value, datetime):
+        value = value.date()
+    return struct.pack('!i', (value - PSQL_EPOCH_DATE).days)
+
+
+def __encode_timestamp(value: Any) -> bytes:
+    if isinstance(value, pd.Timestamp):
+        # Timestamp.value is nanoseconds since the Unix epoch (UTC)
+        return struct.pack('!q', value.value // 1000 - PSQL_EPOCH_UNIX_MICROSECONDS)
+    if isinstance(value, datetime):
+        delta = value.replace(tzinfo=None) - PSQL_EPOCH_DATETIME
+    else:
+        delta = datetime(value.year, value.month, value.day) - PSQL_EPOCH_DATETIME
+    return struct.pack('!q', (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+
+
+def binary_field_encoder(column_type: sqlalchemy.types.TypeEngine) -> Callable[[Any], bytes]:
+    """
+    Returns function that encodes a value to the Postgres binary COPY field format
+    :param sqlalchemy.types.TypeEngine column_type: target column type
+    :return: encoding function or None if the binary format of the type isn't supported
+    :rtype: Callable[[Any], bytes]
+    """
+    if isinstance(column_type, sqlalchemy.types.Boolean):
+        return __encode_bool
+    elif isinstance(column_type, sqlalchemy.types.SmallInteger):
+        return __encode_int16
+    elif isinstance(column_type, sqlalchemy.types.BigInteger):
+        return __encode_int64
+    elif isinstance(column_type, sqlalchemy.types.Integer):
+        return __encode_int32
+    elif isinstance(column_type, sqlalchemy.types.REAL) or (
+            isinstance(column_type, sqlalchemy.types.Float) and column_type.precision is not None
+            and column_type.precision <= 24):
+        return __encode_float32
+    elif isinstance(column_type, sqlalchemy.types.Float):
+        return __encode_float64
+    elif isinstance(column_type, sqlalchemy.types.DateTime):
+        return __encode_timestamp
+    elif isinstance(column_type, sqlalchemy.types.Date):
+        return __encode_date
+    elif isinstance(column_type, sqlalchemy.types.String):
+        return __encode_text
+    return None
+
+
+class PsqlCopyStream:
+    """
+    File-like object that serializes a stream of dataframes to Postgres COPY format (CSV or binary).
+    It is passed to the psycopg2 cursor's copy_expert, so all dataframes are loaded with a single COPY statement.
+    """
+
+    def __init__(self, data_frames: Iterator[pd.DataFrame], columns: List[str],
+                 column_types: List[sqlalchemy.types.TypeEngine] = None):
+        """
+        Constructor
+        :param Iterator[pd.DataFrame] data_frames: dataframes to serialize
+        :param List[str] columns: target table column names (dataframes' columns are serialized in this order)
+        :param List[sqlalchemy.types.TypeEngine] column_types: target table column types. The binary COPY
+            format is used if specified. Otherwise, the stream uses CSV format.
+        """
+        self.__data_frames = data_frames
+        self.__columns = columns
+        self.__encoders = [binary_field_encoder(t) for t in column_types] if column_types is not None else None
+        self.__buffer = PSQL_BINARY_COPY_HEADER if self.__encoders is not None else ''
+        self.__position = 0
+        self.__finished = False
+
+    @classmethod
+    def binary_format_supported(cls, column_types: List[sqlalchemy.types.TypeEngine]) -> bool:
+        """
+        Checks if all column types can be serialized to the binary COPY format
+        :param List[sqlalchemy.types.TypeEngine] column_types: target table column types
+        :return: True if all column types are supported
+        :rtype: bool
+        """
+        return all([binary_field_encoder(t) is not None for t in column_types])
+
+    def copy_options(self) -> str:
+        """
+        Returns COPY statement options that match the stream format
+        :return: COPY statement options
+        :rtype: str
+        """
+        return 'WITH (FORMAT binary)' if self.__encoders is not None else 'WITH CSV'
+
+    def __serialize(self, df: pd.DataFrame) -> Union[str, bytes]:
+        """
+        Serializes dataframe to the COPY format
+        :param pd.DataFrame df: dataframe
+        :return: serialized dataframe
+        :rtype: Union[str, bytes]
+        """
+        df = df[self.__columns]
+        if self.__encoders is None:
+            return df.to_csv(index=False, header=False)
+        field_count = struct.pack('!h', len(self.__columns))
+        rows = []
+        for row in zip(*[df[c].tolist() for c in self.__columns]):
+            fields = [field_count]
+            for value, encoder in zip(row, self.__encoders):
+                if is_null(value):
+                    fields.append(PSQL_NULL_FIELD)
+                else:
+                    encoded = encoder(value)
+                    fields.append(struct.pack('!i', len(encoded)))
+                    fields.append(encoded)
+            rows.append(b''.join(fields))
+        return b''.join(rows)
+
+    def read(self, size: int = -1) -> Union[str, bytes]:
+        """
+        Reads up to size characters (CSV) or bytes (binary) from the stream
+        :param int size: maximal number of characters or bytes returned. Reads everything if negative.
+        :return: serialized data (empty if the stream is exhausted)
+        :rtype: Union[str, bytes]
+        """
+        while not self.__finished and (size < 0 or len(self.__buffer) - self.__position < size):
+            df = next(self.__data_frames, None)
+            if df is None:
+                self.__finished = True
+                if self.__encoders is not None:
+                    self.__buffer = self.__buffer[self.__position:] + PSQL_BINARY_COPY_TRAILER
+                    self.__position = 0
+            else:
+                self.__buffer = self.__buffer[self.__position:] + self.__serialize(df)
+                self.__position = 0
+        end = len(self.__buffer) if size < 0 else self.__position + size
+        data = self.__buffer[self.__position:end]
+        self.__position += len(data)
+        return data
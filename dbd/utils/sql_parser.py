@@ -1,21 +1,14 @@
+import importlib
 import logging
 import re
-import sys
 from datetime import date, datetime
-from typing import List
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple, Type
 
 import math
+import numpy as np
 import pandas as pd
-# noinspection PyUnresolvedReferences
-import sqlalchemy.dialects.mysql
-# noinspection PyUnresolvedReferences
-import sqlalchemy.dialects.postgresql
-# noinspection PyUnresolvedReferences
-import sqlalchemy.dialects.sqlite
-# noinspection PyUnresolvedReferences
-import sqlalchemy.sql.sqltypes
-# noinspection PyUnresolvedReferences
-import sqlalchemy_bigquery
+import sqlalchemy.types
 from dateutil import parser as date_parser
 from math import nan
 from sql_metadata import Parser
@@ -29,6 +22,17 @@ class SQlParserException(DbdException):
     pass
 
 
+TRUE_VALUES = ('true', '1', 't', 'y', 'yes')
+
+# modules searched for data types (the first module with the type wins). The modules are imported on demand,
+# so e.g. the BigQuery stack is loaded only for types that the SQLAlchemy dialects don't have.
+DATA_TYPE_MODULES = ['sqlalchemy.sql.sqltypes', 'sqlalchemy.dialects.postgresql', 'sqlalchemy.dialects.sqlite',
+                     'sqlalchemy.dialects.mysql', 'sqlalchemy_bigquery']
+# type name with optional length (precision) and scale, e.g. VARCHAR(255) or DECIMAL(10,2)
+DATA_TYPE_PATTERN = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(?:\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\))?')
+DATA_TYPE_CACHE_SIZE = 1024
+
+
 class SqlParser:
     """ Parses SQL and extracts different parts from the parsed SQL statement."""
 
@@ -93,6 +97,57 @@ class SqlParser:
             raise SQlParserException(f"Invalid SQL query '{sql}'")
         return parsed_sql
 
+    @classmethod
+    @lru_cache(maxsize=None)
+    def __data_type_factories(cls, module_name: str) -> Dict[str, Type[sqlalchemy.types.TypeEngine]]:
+        """
+        Collects data types from a data type module
+        :param str module_name: data type module
+        :return: data type names and their classes (empty if the module isn't installed)
+        :rtype: Dict[str, Type[sqlalchemy.types.TypeEngine]]
+        """
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            log.debug(f"Data type module '{module_name}' isn't installed.")
+            return {}
+        return {name: tp for name, tp in vars(module).items()
+                if isinstance(tp, type) and issubclass(tp, sqlalchemy.types.TypeEngine)}
+
+    @classmethod
+    @lru_cache(maxsize=DATA_TYPE_CACHE_SIZE)
+    def __resolve_data_type(cls, data_type: str) -> Tuple[Type[sqlalchemy.types.TypeEngine], Dict[str, Any]]:
+        """
+        Resolves data type class and its constructor parameters from string
+        :param str data_type: SQLAlchemy data type as string
+        :return: data type class and its constructor parameters
+        :rtype: Tuple[Type[sqlalchemy.types.TypeEngine], Dict[str, Any]]
+        """
+        match = DATA_TYPE_PATTERN.match(data_type)
+        if match is None:
+            raise SQlParserException(f"Unsupported data type {data_type}.")
+        core_data_type = match.group(1)
+        length = int(match.group(2)) if match.group(2) is not None else None
+        scale = int(match.group(3)) if match.group(3) is not None else None
+
+        tp = next((cls.__data_type_factories(m)[core_data_type] for m in DATA_TYPE_MODULES
+                   if core_data_type in cls.__data_type_factories(m)), None)
+        if tp is None:
+            log.debug(f"Unsupported data type {core_data_type}.")
+            raise SQlParserException(f"Unsupported data type {core_data_type}.")
+        try:
+            params = dict(scale=scale, length=length) if scale and length \
+                else dict(scale=scale) if scale else dict(length=length) if length else {}
+            tp(**params)
+        except TypeError:
+            try:
+                params = dict(scale=scale, precision=length) if scale and length \
+                    else dict(scale=scale) if scale else dict(precision=length) if length else {}
+                tp(**params)
+            except TypeError:
+                raise SQlParserException(f"Unsupported data type {core_data_type} with parameters {params}.")
+        return tp, params
+
     @classmethod
     def parse_alchemy_data_type(cls, data_type: str) -> sqlalchemy.types.TypeEngine:
         """
@@ -101,32 +156,9 @@ class SqlParser:
         :return: SQLAlchemy data type
         :rtype:  sqlalchemy.types.TypeEngine subclass
         """
-        parsed_data_type = Parser(f"CREATE TABLE a( c {data_type} )")
-        core_data_type = parsed_data_type.tokens[5].value
-        length = int(parsed_data_type.tokens[7].value) if len(
-            parsed_data_type.tokens) > 7 and parsed_data_type.tokens[7].is_integer else None
-        scale = int(parsed_data_type.tokens[9].value) if len(
-            parsed_data_type.tokens) > 9 and parsed_data_type.tokens[9].is_integer else None
-
-        for modules in ['sqlalchemy.sql.sqltypes', 'sqlalchemy.dialects.postgresql', 'sqlalchemy.dialects.sqlite',
-                        'sqlalchemy.dialects.mysql', 'sqlalchemy_bigquery']:
-            if hasattr(sys.modules[modules], core_data_type):
-                try:
-                    params = dict(scale=scale, length=length) if scale and length \
-                        else dict(scale=scale) if scale else dict(length=length) if length else {}
-                    log.debug(f"Serching for type {core_data_type}({dict}) in {modules}.")
-                    tp = getattr(sys.modules[modules], core_data_type)(**params)
-                except TypeError:
-                    try:
-                        params = dict(scale=scale, precision=length) if scale and length \
-                            else dict(scale=scale) if scale else dict(precision=length) if length else {}
-                        log.debug(f"Serching for type {core_data_type}({dict}) in {modules}.")
-                        tp = getattr(sys.modules[modules], core_data_type)(**params)
-                    except TypeError:
-                        raise SQlParserException(f"Unsupported data type {core_data_type} with parameters {params}.")
-                return tp
-        log.debug(f"Unsupported data type {core_data_type}.")
-        raise SQlParserException(f"Unsupported data type {core_data_type}.")
+        # the parsing is cached, but each column gets its own type instance
+        tp, params = cls.__resolve_data_type(str(data_type))
+        return tp(**params)
 
     @classmethod
     def parse_date(cls, dt: str) -> date:
@@ -161,7 +193,7 @@ class SqlParser:
         :rtype: bool
         """
         if isinstance(b, str):
-            return b.lower() in ('true', '1', 't', 'y', 'yes')
+            return b.lower() in TRUE_VALUES
         elif isinstance(b, bool):
             return b
         elif isinstance(b, int):
@@ -180,7 +212,7 @@ class SqlParser:
         :rtype: int
         """
         if isinstance(b, str):
-            return 1 if b.lower() in ('true', '1', 't', 'y', 'yes') else 0
+            return 1 if b.lower() in TRUE_VALUES else 0
         elif isinstance(b, bool):
             return 1 if b else 0
         elif isinstance(b, int):
@@ -225,6 +257,65 @@ class SqlParser:
         else:
             return str(i)
 
+    @classmethod
+    def parse_bool_series(cls, s: pd.Series) -> pd.Series:
+        """
+        Parses a series of bool values. Vectorized version of parse_bool
+        :param pd.Series s: series of bool strings (or bools, or numbers)
+        :return: parsed bools
+        :rtype: pd.Series of 'boolean' dtype
+        """
+        if pd.api.types.is_bool_dtype(s.dtype):
+            return s.astype('boolean')
+        elif pd.api.types.is_numeric_dtype(s.dtype):
+            return (s != 0).astype('boolean').mask(s.isna())
+        elif pd.api.types.infer_dtype(s, skipna=True) in ('string', 'empty'):
+            # bool columns have few distinct values, so parse each distinct value only once
+            codes, uniques = pd.factorize(s.astype('object'))
+            parsed = pd.Series(uniques, dtype='object').str.lower().isin(TRUE_VALUES).to_numpy()
+            # nulls have code -1, they pick the appended value and are masked
+            parsed = np.append(parsed, False)
+            return pd.Series(parsed[codes], index=s.index, dtype='boolean').mask(codes < 0)
+        else:
+            # mixed types
+            return s.map(lambda x: cls.parse_bool(x)).astype('boolean')
+
+    @classmethod
+    def parse_bool_int_series(cls, s: pd.Series) -> pd.Series:
+        """
+        Parses a series of bool values. Vectorized version of parse_bool_int
+        :param pd.Series s: series of bool strings (or bools, or numbers)
+        :return: parsed bools as ints (1/0)
+        :rtype: pd.Series of 'Int64' dtype
+        """
+        return cls.parse_bool_series(s).astype('Int64')
+
+    @classmethod
+    def parse_string_series(cls, s: pd.Series) -> pd.Series:
+        """
+        Resolves string nans. Vectorized version of parse_string
+        :param pd.Series s: series of strings
+        :return: strings with empty strings and nulls replaced by nan
+        :rtype: pd.Series of 'object' dtype
+        """
+        if pd.api.types.infer_dtype(s, skipna=True) in ('string', 'empty'):
+            values = s.astype('object')
+            return values.where(~(values.isna() | (values == '')), nan)
+        else:
+            # mixed types
+            return s.map(lambda x: cls.parse_string(x)).astype('object')
+
+    @classmethod
+    def parse_datetime_series(cls, s: pd.Series, datetime_format: str = None) -> pd.Series:
+        """
+        Parses a series of datetime strings
+        :param pd.Series s: series of datetime strings
+        :param str datetime_format: strftime format of the strings (e.g. '%Y-%m-%d'). The format is inferred if None.
+        :return: parsed datetimes
+        :rtype: pd.Series of 'datetime64[ns]' dtype
+        """
+        return pd.to_datetime(s, format=datetime_format)
+
     @classmethod
     def remove_sql_comments(cls, sql_text: str) -> str:
         """
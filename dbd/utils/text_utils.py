@@ -1,4 +1,6 @@
 import os
+from decimal import Decimal
+from typing import Any
 
 
 def remove_prefix(text: str, prefix: str) -> str:
@@ -64,3 +66,20 @@ def fully_qualified_table_name(schema: str, table: str, quoted: bool) -> str:
         return f'"{table}"' if quoted else table
     else:
         return f'"{schema}"."{table}"' if quoted else f"{schema}.{table}"
+
+
+def sql_literal(value: Any) -> str:
+    """
+    Returns SQL literal of a value (e.g. 42, 'text', '2021-01-31 12:00:00')
+    :param Any value: number, boolean, string, date, timestamp or None
+    :return: SQL literal
+    :rtype: str
+    """
+    if value is None:
+        return 'NULL'
+    elif isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    elif isinstance(value, (int, float, Decimal)):
+        return str(value)
+    else:
+        return "'" + str(value).replace("'", "''") + "'"
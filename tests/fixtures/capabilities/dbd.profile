@@ -13,3 +13,5 @@ databases:
     db.url: "sqlite:///tmp/ref_file.db"
   jinja_template:
     db.url: "sqlite:///tmp/jinja_template.db"
+  chunked:
+    db.url: "sqlite:///tmp/chunked.db"
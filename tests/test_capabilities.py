@@ -1,9 +1,23 @@
+import bz2
+import gzip
+import json
+import lzma
 import os
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
 
 from dbd.config.dbd_profile import DbdProfile
 from dbd.config.dbd_project import DbdProject
 from dbd.db.db_schema import DbSchema
+from dbd.executors.metadata_snapshot import MetadataSnapshot
 from dbd.executors.model_executor import ModelExecutor, ModelExecutionException
+from dbd.log.dbd_exception import DbdException
+from dbd.utils.profiling_utils import StatementTimer
 
 
 def __delete_db_file(dbfile='./tmp/basic.db'):
@@ -11,6 +25,23 @@ def __delete_db_file(dbfile='./tmp/basic.db'):
         os.remove(dbfile)
 
 
+@pytest.fixture
+def model_directory(tmp_path):
+    """
+    Empty model directory of a project in tmp_path that loads the 'chunked' database (see __model_project)
+    """
+    __delete_db_file('./tmp/chunked.db')
+    model_directory = tmp_path / 'model'
+    model_directory.mkdir()
+    return model_directory
+
+
+def __model_project(model_directory, **config):
+    profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
+    return DbdProject(profile, str(model_directory.parent / 'dbd.project'),
+                      dict(model='model', database='chunked', **config))
+
+
 def test_zip_on_kaggle():
     __delete_db_file('./tmp/zip_on_kaggle.db')
     profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
@@ -176,6 +207,500 @@ def test_basic_model():
         'state_area_sq_mi').alchemy_column().nullable
 
 
+def test_basic_model_parallel():
+    __delete_db_file()
+    profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
+    project = DbdProject.load(profile, 'tests/fixtures/capabilities/basic/dbd.project')
+    model = ModelExecutor(project)
+    engine = project.alchemy_engine_from_project()
+    model.execute(engine, jobs=4)
+
+    schema = DbSchema.from_alchemy_engine(None, engine)
+    assert len(schema.tables()) == 4
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM us_states").fetchone()[0] > 0
+
+
+def test_data_formats_model_parallel():
+    __delete_db_file('./tmp/data_formats.db')
+    profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
+    project = DbdProject.load(profile, 'tests/fixtures/capabilities/data_formats/dbd.project')
+    model = ModelExecutor(project)
+    engine = project.alchemy_engine_from_project()
+    model.execute(engine, jobs=3)
+
+    schema = DbSchema.from_alchemy_engine(None, engine)
+    assert len(schema.tables()) == 5
+
+
+def test_chunked_model():
+    __delete_db_file('./tmp/chunked.db')
+    profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
+    project = DbdProject.load(profile, 'tests/fixtures/capabilities/chunked/dbd.project')
+    model = ModelExecutor(project)
+    engine = project.alchemy_engine_from_project()
+    model.execute(engine)
+
+    schema = DbSchema.from_alchemy_engine(None, engine)
+    assert str(schema.table('population').column('population').alchemy_column().type) == "INTEGER"
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM population").fetchone()[0] == 52
+        assert conn.execute("SELECT COUNT(*) FROM area").fetchone()[0] == 52
+        assert conn.execute("SELECT population FROM population WHERE state = 'AK'").fetchone()[0] == 735132
+        # the loading PRAGMAs are restored after the load
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+
+
+def test_incremental_run(tmp_path):
+    __delete_db_file('./tmp/chunked.db')
+    profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
+    project = DbdProject(profile, str(tmp_path / 'dbd.project'),
+                         dict(model=os.path.abspath('./tests/fixtures/capabilities/chunked/model'), database='chunked',
+                              metadata_snapshot=True))
+    state_file = project.run_state_file_from_project()
+    engine = project.alchemy_engine_from_project()
+    ModelExecutor(project).execute(engine)
+    assert os.path.exists(state_file)
+    with engine.connect() as conn:
+        conn.execute("INSERT INTO area (state_name, area_sq_mi) VALUES ('XX', 1)")
+
+    # nothing changed, the tables are kept
+    ModelExecutor(project).execute(engine)
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM area").fetchone()[0] == 53
+
+    # missing tables are rebuilt
+    with engine.connect() as conn:
+        conn.execute("DROP TABLE population")
+    ModelExecutor(project).execute(engine)
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM population").fetchone()[0] == 52
+        assert conn.execute("SELECT COUNT(*) FROM area").fetchone()[0] == 53
+
+    # full refresh rebuilds everything
+    ModelExecutor(project).execute(engine, full_refresh=True)
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM area").fetchone()[0] == 52
+
+    # tasks that read tables outside the model always execute
+    model_directory = tmp_path / 'model'
+    model_directory.mkdir()
+    (model_directory / 'target.sql').write_text("SELECT id FROM raw_source")
+    project = __model_project(model_directory)
+    with engine.connect() as conn:
+        conn.execute("CREATE TABLE raw_source (id INTEGER)")
+        conn.execute("INSERT INTO raw_source (id) VALUES (1)")
+    ModelExecutor(project).execute(engine)
+    with engine.connect() as conn:
+        conn.execute("INSERT INTO raw_source (id) VALUES (2)")
+    ModelExecutor(project).execute(engine)
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM target").fetchone()[0] == 2
+
+
+def test_metadata_snapshot(tmp_path):
+    __delete_db_file('./tmp/chunked.db')
+    snapshot_file = str(tmp_path / 'metadata_snapshot.pickle')
+    state_file = str(tmp_path / 'run_state.json')
+    profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
+    project = DbdProject(profile, os.path.normpath('tests/fixtures/capabilities/chunked/dbd.project'),
+                         dict(model='model', database='chunked', metadata_snapshot=True,
+                              metadata_snapshot_file=snapshot_file, run_state_file=state_file))
+    engine = project.alchemy_engine_from_project()
+    with engine.connect() as conn:
+        conn.execute("CREATE TABLE unrelated (id INTEGER)")
+    ModelExecutor(project).execute(engine)
+    assert os.path.exists(snapshot_file)
+    database = engine.url.render_as_string(hide_password=True)
+    with open(snapshot_file, 'rb') as f:
+        snapshot_content = f.read()
+    # snapshots of another dialect (or SQLAlchemy version) aren't used
+    assert MetadataSnapshot(snapshot_file, database, 'postgresql').load(engine) == ({}, {})
+    with open(snapshot_file, 'wb') as f:
+        f.write(snapshot_content)
+    metadata_cache, reflected_names = MetadataSnapshot(snapshot_file, database, 'sqlite').load(engine)
+    # the snapshot is consumed by loading
+    assert not os.path.exists(snapshot_file)
+    assert set(metadata_cache['*'].tables.keys()) == {'area', 'population'}
+    assert reflected_names['*'] == {'area', 'population'}
+    # broken snapshots are ignored
+    with open(snapshot_file, 'wb') as f:
+        f.write(snapshot_content[:len(snapshot_content) // 2])
+    assert MetadataSnapshot(snapshot_file, database, 'sqlite').load(engine) == ({}, {})
+
+    # the tables are dropped and created again with the metadata from the snapshot
+    ModelExecutor(project).execute(engine, full_refresh=True)
+    ModelExecutor(project).execute(engine)
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM area").fetchone()[0] == 52
+        assert conn.execute("SELECT COUNT(*) FROM population").fetchone()[0] == 52
+    assert os.path.exists(snapshot_file)
+
+
+def test_model_cache(model_directory):
+    (model_directory / 'source.csv').write_text("id\n1\n2\n")
+    (model_directory / 'target.sql').write_text("SELECT id FROM source")
+    (model_directory / 'target.yaml').write_text("table:\n  columns:\n    id:\n      type: INTEGER\n")
+    project = __model_project(model_directory, model_cache=True)
+    cache_file = project.model_cache_file_from_project()
+
+    tasks = {t.task_id(): t for t in ModelExecutor(project).plan()}
+    assert os.path.exists(cache_file)
+    assert tasks['*.target'].sql() == "SELECT id FROM source"
+    assert tasks['*.target'].depends_on() == ['source']
+
+    # unchanged files are loaded from the cache
+    cache_mtime = os.path.getmtime(cache_file)
+    tasks = {t.task_id(): t for t in ModelExecutor(project).plan()}
+    assert tasks['*.target'].depends_on() == ['source']
+    assert tasks['*.target'].table_def()['columns']['id']['type'] == 'INTEGER'
+    assert os.path.getmtime(cache_file) == cache_mtime
+
+    # changed files are parsed again
+    (model_directory / 'target.sql').write_text("SELECT id * 2 AS id FROM source")
+    tasks = {t.task_id(): t for t in ModelExecutor(project).plan()}
+    assert tasks['*.target'].sql() == "SELECT id * 2 AS id FROM source"
+
+    # files are parsed again when the templates they include change
+    (model_directory / 'columns.jinja').write_text("id")
+    (model_directory / 'target.sql').write_text("SELECT {% include 'columns.jinja' %} FROM source")
+    assert {t.task_id(): t for t in ModelExecutor(project).plan()}['*.target'].sql() == "SELECT id FROM source"
+    (model_directory / 'columns.jinja').write_text("id * 3 AS id")
+    tasks = {t.task_id(): t for t in ModelExecutor(project).plan()}
+    assert tasks['*.target'].sql() == "SELECT id * 3 AS id FROM source"
+
+    # the model cache is opt-in
+    project = __model_project(model_directory)
+    assert project.model_cache_file_from_project() is None
+    assert len(ModelExecutor(project).plan()) == 2
+
+
+def test_run_report(tmp_path, model_directory):
+    (model_directory / 'source.csv').write_text("id\n1\n2\n3\n")
+    (model_directory / 'source.yaml').write_text("process:\n  chunk_size: 2\n")
+    (model_directory / 'target.sql').write_text("SELECT id FROM source WHERE id > 1")
+    project = __model_project(model_directory)
+    engine = project.alchemy_engine_from_project()
+    report_file = str(tmp_path / 'report' / 'run.json')
+    ModelExecutor(project).execute(engine, report_file=report_file)
+
+    with open(report_file) as f:
+        report = json.load(f)
+    tasks = {t['task_id']: t for t in report['tasks']}
+    assert set(tasks.keys()) == {'*.source', '*.target'}
+    assert all(t['status'] == 'succeeded' for t in tasks.values())
+    source_phases = tasks['*.source']['phases']
+    assert {'parse', 'coerce', 'create table', 'load'} <= set(source_phases.keys())
+    assert source_phases['load']['rows'] == 3
+    assert source_phases['parse']['rows'] == 3
+    assert source_phases['parse']['bytes'] == os.path.getsize(model_directory / 'source.csv')
+    assert tasks['*.source']['rows'] == 3
+    assert {'introspect', 'create table', 'insert-select'} <= set(tasks['*.target']['phases'].keys())
+    assert tasks['*.target']['phases']['insert-select']['rows'] == 2
+    # exclusive phase times don't exceed the task's wall time
+    for task in tasks.values():
+        assert sum(p['wall_time'] for p in task['phases'].values()) <= task['wall_time'] + 0.01
+    assert [t['wall_time'] for t in report['tasks']] == sorted([t['wall_time'] for t in report['tasks']],
+                                                               reverse=True)
+
+    # the tasks after a failed one are reported as not run
+    (model_directory / 'target.sql').write_text("SELECT missing_column FROM source")
+    (model_directory / 'final.sql').write_text("SELECT * FROM target")
+    with pytest.raises(ModelExecutionException):
+        ModelExecutor(project).execute(engine, report_file=report_file, full_refresh=True)
+    with open(report_file) as f:
+        tasks = {t['task_id']: t['status'] for t in json.load(f)['tasks']}
+    assert tasks == {'*.source': 'succeeded', '*.target': 'failed', '*.final': 'not run'}
+
+
+def test_sql_timing(tmp_path):
+    __delete_db_file('./tmp/chunked.db')
+    profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
+    project = DbdProject(profile, os.path.normpath('tests/fixtures/capabilities/chunked/dbd.project'),
+                         dict(model='model', database='chunked', run_state_file=str(tmp_path / 'run_state.json')))
+    statement_timer = StatementTimer(top_statements=3)
+    engine = project.alchemy_engine_from_project(statement_timer)
+    report_file = str(tmp_path / 'run.json')
+    ModelExecutor(project).execute(engine, report_file=report_file, statement_timer=statement_timer)
+
+    slowest = statement_timer.slowest()
+    assert len(slowest) == 3
+    assert statement_timer.count() > 3
+    assert [s['seconds'] for s in slowest] == sorted([s['seconds'] for s in slowest], reverse=True)
+    with open(report_file) as f:
+        assert json.load(f)['statements'] == json.loads(json.dumps(slowest))
+    # the statements are attributed to the tasks that executed them
+    statement_timer = StatementTimer(top_statements=1000)
+    engine = project.alchemy_engine_from_project(statement_timer)
+    ModelExecutor(project).execute(engine, full_refresh=True, statement_timer=statement_timer)
+    create_statements = [s for s in statement_timer.slowest() if s['statement'].strip().startswith('CREATE TABLE')]
+    assert {s['task_id'] for s in create_statements} == {'*.area', '*.population'}
+
+    statement_timer.detach(engine)
+    with engine.connect() as conn:
+        conn.execute("SELECT 1")
+    assert statement_timer.count() == len(statement_timer.slowest())
+
+
+def test_ddl_single_session(model_directory):
+    # temporary tables exist only in the session that created them
+    (model_directory / 'prolog.ddl').write_text("CREATE TEMP TABLE session_values (id INTEGER);\n"
+                                                "INSERT INTO session_values VALUES (1), (2);\n"
+                                                "CREATE TABLE ddl_values AS SELECT id FROM session_values;\n")
+    project = __model_project(model_directory)
+    engine = project.alchemy_engine_from_project()
+    ModelExecutor(project).execute(engine)
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM ddl_values").fetchone()[0] == 2
+
+
+def test_swap_mode(model_directory):
+    (model_directory / 'source.csv').write_text("id,name\n1,a\n2,b\n")
+    (model_directory / 'source.yaml').write_text("table:\n  columns:\n    id:\n      type: INTEGER\n"
+                                                 "      primary_key: true\n    name:\n      type: TEXT\n"
+                                                 "  indexes:\n    - columns: [name]\n"
+                                                 "process:\n  mode: swap\n")
+    (model_directory / 'target.sql').write_text("SELECT id, name FROM source")
+    (model_directory / 'target.yaml').write_text("process:\n  mode: swap\n")
+    project = __model_project(model_directory)
+    engine = project.alchemy_engine_from_project()
+
+    def tables():
+        with engine.connect() as conn:
+            return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    def indexes():
+        with engine.connect() as conn:
+            return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                               "AND name NOT LIKE 'sqlite_autoindex%'")}
+
+    ModelExecutor(project).execute(engine)
+    assert tables() == {'source', 'target'}
+    assert indexes() == {'idx_source_1'}
+
+    (model_directory / 'source.csv').write_text("id,name\n1,a\n2,b\n3,c\n")
+    ModelExecutor(project).execute(engine)
+    assert tables() == {'source', 'target'}
+    assert indexes() == {'idx_source_1'}
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM target").fetchone()[0] == 3
+
+    # a failed load keeps the old data
+    (model_directory / 'source.csv').write_text("id,name\n1,a\n1,b\n")
+    try:
+        ModelExecutor(project).execute(engine)
+    except DbdException:
+        pass
+    else:
+        assert False
+    with engine.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM source").fetchone()[0] == 3
+
+    # the next run drops the shadow table of the failed run
+    (model_directory / 'source.csv').write_text("id,name\n5,e\n")
+    ModelExecutor(project).execute(engine)
+    assert tables() == {'source', 'target'}
+    with engine.connect() as conn:
+        assert conn.execute("SELECT id FROM target").fetchall() == [(5,)]
+
+
+def test_merge_mode(model_directory):
+    (model_directory / 'source.csv').write_text("id,name\n1,a\n2,b\n")
+    (model_directory / 'source.yaml').write_text("table:\n  columns:\n    id:\n      type: INTEGER\n"
+                                                 "      primary_key: true\n    name:\n      type: TEXT\n"
+                                                 "process:\n  mode: merge\n")
+    (model_directory / 'target.sql').write_text("SELECT id, name FROM source")
+    (model_directory / 'target.yaml').write_text("table:\n  columns:\n    id:\n      primary_key: true\n"
+                                                 "process:\n  mode: merge\n")
+    project = __model_project(model_directory)
+    engine = project.alchemy_engine_from_project()
+
+    def rows(table_name):
+        with engine.connect() as conn:
+            return conn.execute(f"SELECT id, name FROM {table_name} ORDER BY id").fetchall()
+
+    ModelExecutor(project).execute(engine)
+    assert rows('source') == [(1, 'a'), (2, 'b')]
+    assert rows('target') == [(1, 'a'), (2, 'b')]
+
+    # the rows with new keys are inserted, the existing ones are updated, and the other ones are kept
+    (model_directory / 'source.csv').write_text("id,name\n2,x\n3,c\n")
+    ModelExecutor(project).execute(engine)
+    assert rows('source') == [(1, 'a'), (2, 'x'), (3, 'c')]
+    assert rows('target') == [(1, 'a'), (2, 'x'), (3, 'c')]
+    with engine.connect() as conn:
+        assert {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")} == \
+               {'source', 'target'}
+
+    # merge requires a primary key
+    (model_directory / 'source.yaml').write_text("process:\n  mode: merge\n")
+    try:
+        ModelExecutor(project).execute(engine)
+    except DbdException:
+        pass
+    else:
+        assert False
+    assert rows('source') == [(1, 'a'), (2, 'x'), (3, 'c')]
+
+
+def test_incremental_load(model_directory):
+    (model_directory / 'events.csv').write_text("id,created_at\n1,2021-01-01 10:00:00\n2,2021-01-02 10:00:00\n")
+    (model_directory / 'events.yaml').write_text("table:\n  columns:\n    id:\n      type: INTEGER\n"
+                                                 "    created_at:\n      type: TIMESTAMP\n"
+                                                 "process:\n  mode: keep\n  incremental:\n"
+                                                 "    column: created_at\n")
+    (model_directory / 'event_ids.sql').write_text("SELECT id FROM events\n"
+                                                   "{% if watermark is not none %}WHERE id > {{ watermark }}"
+                                                   "{% endif %}")
+    (model_directory / 'event_ids.yaml').write_text("process:\n  mode: keep\n  incremental:\n    column: id\n")
+    project = __model_project(model_directory)
+    engine = project.alchemy_engine_from_project()
+
+    def ids(table_name):
+        with engine.connect() as conn:
+            return [r[0] for r in conn.execute(f"SELECT id FROM {table_name} ORDER BY id")]
+
+    ModelExecutor(project).execute(engine)
+    assert ids('events') == [1, 2]
+    assert ids('event_ids') == [1, 2]
+
+    # only the rows above the watermark are appended
+    (model_directory / 'events.csv').write_text("id,created_at\n1,2021-01-01 10:00:00\n2,2021-01-02 10:00:00\n"
+                                                "3,2021-01-03 10:00:00\n")
+    ModelExecutor(project).execute(engine)
+    assert ids('events') == [1, 2, 3]
+    assert ids('event_ids') == [1, 2, 3]
+
+
+def test_incremental_mode_invalid(model_directory):
+    (model_directory / 'events.csv').write_text("id\n1\n")
+    project = __model_project(model_directory)
+    # the default 'drop' mode, 'truncate', and 'swap' empty or replace the table before the watermark is read
+    for mode in ['', '  mode: drop\n', '  mode: truncate\n', '  mode: swap\n']:
+        (model_directory / 'events.yaml').write_text(f"process:\n{mode}  incremental:\n    column: id\n")
+        result, errors = ModelExecutor(project).validate()
+        assert not result
+        assert any('incremental' in e.get('process', {}) for e in errors.values())
+    (model_directory / 'events.yaml').write_text("process:\n  mode: keep\n  incremental:\n    column: id\n")
+    assert ModelExecutor(project).validate()[0]
+
+
+def test_parquet_row_groups(tmp_path, model_directory):
+    events = pa.table({'id': pa.array([1, 2, 3, None], pa.int64()),
+                       'amount': pa.array([Decimal('1.10'), None, Decimal('3.30'), Decimal('4.40')],
+                                          pa.decimal128(10, 2)),
+                       'valid': pa.array([True, False, None, True]),
+                       'name': pa.array(['a', None, 'c', 'd']),
+                       'created_at': pa.array([datetime(2021, 1, 1, 10), datetime(2021, 1, 2, 10), None,
+                                               datetime(2021, 1, 4, 10)], pa.timestamp('us'))})
+    pq.write_table(events, str(model_directory / 'events.parquet'), row_group_size=2)
+    project = __model_project(model_directory)
+    engine = project.alchemy_engine_from_project()
+    report_file = str(tmp_path / 'report.json')
+    ModelExecutor(project).execute(engine, report_file=report_file)
+
+    # the column types are taken from the Parquet schema
+    schema = DbSchema.from_alchemy_engine(None, engine)
+    column_types = {c.name(): str(c.alchemy_column().type) for c in schema.table('events').columns()}
+    assert column_types == {'id': 'BIGINT', 'amount': 'NUMERIC(10, 2)', 'valid': 'BOOLEAN', 'name': 'TEXT',
+                            'created_at': 'TIMESTAMP'}
+    with engine.connect() as conn:
+        assert conn.execute("SELECT id, valid, name, created_at FROM events").fetchall() == \
+               [(1, 1, 'a', '2021-01-01 10:00:00.000000'), (2, 0, None, '2021-01-02 10:00:00.000000'),
+                (3, None, 'c', None), (None, 1, 'd', '2021-01-04 10:00:00.000000')]
+        assert conn.execute("SELECT COUNT(*), SUM(id), SUM(amount) FROM events").fetchone() == (4, 6, 8.8)
+
+    # each row group is read to a separate dataframe
+    with open(report_file) as f:
+        report = json.load(f)
+    assert report['tasks'][0]['phases']['coerce']['count'] == 2
+    assert report['tasks'][0]['rows'] == 4
+
+
+def test_json_lines(model_directory, caplog):
+    (model_directory / 'users.jsonl').write_text(
+        '{"id": 1, "user": {"name": "a", "address": {"city": "x"}}, "tags": ["t1"]}\n'
+        '{"id": 2, "user": {"name": "b", "address": {"city": "y"}}, "tags": []}\n'
+        '\n'
+        '{"id": 3, "user": {"name": "c"}, "extra": true}\n')
+    (model_directory / 'users.yaml').write_text("process:\n  chunk_size: 2\n")
+    (model_directory / 'items.ndjson').write_text('{"data": {"items": [{"id": 1}, {"id": 2}]}}\n'
+                                                  '{"data": {"items": [{"id": 3}]}}\n')
+    (model_directory / 'items.yaml').write_text("process:\n  json_path: data.items\n")
+    # columns of the keys that appear only in later chunks are declared in the YAML file
+    (model_directory / 'events.jsonl').write_text('{"id": 1}\n{"id": 2, "note": "x"}\n')
+    (model_directory / 'events.yaml').write_text("table:\n  columns:\n    note:\n      type: VARCHAR(10)\n"
+                                                 "process:\n  chunk_size: 1\n")
+    (model_directory / 'cities.jsonl').write_text('{"id": 1, "user": {"address": {"city": "x"}}, "tags": ["t"]}\n'
+                                                  '{"id": 2}\n')
+    (model_directory / 'cities.yaml').write_text("process:\n  json_columns:\n    id: id\n"
+                                                 "    city: user.address.city\n")
+    project = __model_project(model_directory)
+    engine = project.alchemy_engine_from_project()
+    ModelExecutor(project).execute(engine)
+
+    with engine.connect() as conn:
+        # nested objects are flattened, lists are stored as JSON, and the keys missing in the first chunk are ignored
+        assert conn.execute("SELECT id, user_name, user_address_city, tags FROM users ORDER BY id").fetchall() == \
+               [(1, 'a', 'x', '["t1"]'), (2, 'b', 'y', '[]'), (3, 'c', None, None)]
+        assert any("['extra']" in r.getMessage() for r in caplog.records if r.levelname == 'WARNING')
+        assert conn.execute("SELECT id FROM items ORDER BY id").fetchall() == [(1,), (2,), (3,)]
+        assert conn.execute("SELECT id, note FROM events ORDER BY id").fetchall() == [(1, None), (2, 'x')]
+        assert conn.execute("SELECT * FROM cities ORDER BY id").fetchall() == [(1, 'x'), (2, None)]
+
+
+def test_compressed_data_files(model_directory):
+    csv = 'id,name\n1,a\n2,b\n3,c\n'
+    with gzip.open(model_directory / 'gzipped.csv.gz', 'wt') as f:
+        f.write(csv)
+    with bz2.open(model_directory / 'bzipped.csv.bz2', 'wt') as f:
+        f.write(csv)
+    with lzma.open(model_directory / 'xzipped.csv.xz', 'wt') as f:
+        f.write(csv)
+    with gzip.open(model_directory / 'events.jsonl.gz', 'wt') as f:
+        f.write('{"id": 1}\n{"id": 2}\n')
+    # a file that the HTTP transport already decompressed is read as it is
+    (model_directory / 'plain.csv.gz').write_text(csv)
+    (model_directory / 'gzipped.yaml').write_text("process:\n  chunk_size: 2\n")
+    project = __model_project(model_directory)
+    engine = project.alchemy_engine_from_project()
+    ModelExecutor(project).execute(engine)
+
+    with engine.connect() as conn:
+        for table_name in ['gzipped', 'bzipped', 'xzipped', 'plain']:
+            assert conn.execute(f"SELECT id, name FROM {table_name} ORDER BY id").fetchall() == \
+                   [('1', 'a'), ('2', 'b'), ('3', 'c')]
+        assert conn.execute("SELECT id FROM events ORDER BY id").fetchall() == [(1,), (2,)]
+
+
+def test_zip_members(tmp_path, model_directory):
+    parquet_file = pa.BufferOutputStream()
+    pq.write_table(pa.table({'id': pa.array([1, 2], pa.int64())}), parquet_file, row_group_size=1)
+    archive = tmp_path / 'archive.zip'
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as f:
+        f.writestr('data/state.csv', 'id,name\n1,a\n2,b\n')
+        f.writestr('data/county.csv.gz', gzip.compress(b'id,name\n3,c\n'))
+        f.writestr('events.parquet', parquet_file.getvalue().to_pybytes())
+    (model_directory / 'state.ref').write_text(f"{archive}>data/state.csv\n")
+    (model_directory / 'county.ref').write_text(f"{archive}>data/county.csv.gz\n")
+    (model_directory / 'events.ref').write_text(f"{archive}>events.parquet\n")
+    project = __model_project(model_directory)
+    engine = project.alchemy_engine_from_project()
+    report_file = str(tmp_path / 'report.json')
+    ModelExecutor(project).execute(engine, report_file=report_file)
+
+    with engine.connect() as conn:
+        assert conn.execute("SELECT id, name FROM state ORDER BY id").fetchall() == [('1', 'a'), ('2', 'b')]
+        assert conn.execute("SELECT id, name FROM county").fetchall() == [('3', 'c')]
+        assert conn.execute("SELECT id FROM events ORDER BY id").fetchall() == [(1,), (2,)]
+    # the members are streamed from the archive, the parsed bytes are the members' uncompressed sizes
+    with open(report_file) as f:
+        report = json.load(f)
+    tasks = {t['task_id']: t for t in report['tasks']}
+    assert tasks['*.state']['phases']['parse']['bytes'] == len('id,name\n1,a\n2,b\n')
+    assert tasks['*.events']['phases']['coerce']['count'] == 2
+
+
 def test_data_formats_model():
     __delete_db_file('./tmp/data_formats.db')
     profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
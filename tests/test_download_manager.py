@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+from requests import HTTPError
+
+from dbd.utils.download_cache import DownloadCache
+from dbd.utils.download_manager import DownloadManager
+
+
+@pytest.fixture
+def http_server():
+    handler = partial(SimpleHTTPRequestHandler, directory='./tests/fixtures/capabilities/basic/model')
+    server = HTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_manager(http_server, tmp_path):
+    url = f"{http_server}/state.csv"
+    with DownloadManager(str(tmp_path), workers=2) as download_manager:
+        first = download_manager.prefetch(url)
+        second = download_manager.prefetch(url)
+        assert first is second
+        local_file = download_manager.file(url)
+        assert os.path.basename(local_file) == 'state.csv'
+        with open(local_file, 'rb') as f, open('./tests/fixtures/capabilities/basic/model/state.csv', 'rb') as o:
+            assert f.read() == o.read()
+        download_manager.release(url)
+        assert os.path.exists(local_file)
+        download_manager.release(url)
+        assert not os.path.exists(local_file)
+
+
+def test_download_manager_error(http_server, tmp_path):
+    with DownloadManager(str(tmp_path)) as download_manager:
+        with pytest.raises(HTTPError):
+            download_manager.file(f"{http_server}/missing.csv")
+
+
+def test_download_cache(http_server, tmp_path):
+    url = f"{http_server}/state.csv"
+    cache = DownloadCache(str(tmp_path / 'cache'))
+    local_file = cache.fetch(url)
+    with open(local_file, 'rb') as f, open('./tests/fixtures/capabilities/basic/model/state.csv', 'rb') as o:
+        assert f.read() == o.read()
+    modified = os.path.getmtime(local_file)
+    time.sleep(0.01)
+    # the server responds with 304 Not Modified, the cached file isn't downloaded again
+    assert cache.fetch(url) == local_file
+    assert os.path.getmtime(local_file) == modified
+
+
+def test_download_cache_eviction(http_server, tmp_path):
+    cache = DownloadCache(str(tmp_path / 'cache'), max_size_mb=0)
+    local_file = cache.fetch(f"{http_server}/state.csv")
+    # entries used by the current cache instance aren't evicted
+    assert os.path.exists(local_file)
+    assert cache.size() > 0
+    DownloadCache(str(tmp_path / 'cache'), max_size_mb=0).evict()
+    assert not os.path.exists(local_file)
+
+
+def test_download_manager_with_cache(http_server, tmp_path):
+    url = f"{http_server}/state.csv"
+    cache = DownloadCache(str(tmp_path / 'cache'))
+    with DownloadManager(str(tmp_path / 'downloads'), cache=cache) as download_manager:
+        local_file = download_manager.file(url)
+        assert local_file.startswith(str(tmp_path / 'cache'))
+        download_manager.release(url)
+        # cached files survive the release
+        assert os.path.exists(local_file)
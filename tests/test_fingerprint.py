@@ -0,0 +1,34 @@
+import pytest
+import sqlalchemy
+
+from dbd.db.db_schema import DbSchema
+from dbd.db.db_table import DbTableFingerprintException
+
+
+@pytest.fixture
+def engine():
+    engine = sqlalchemy.create_engine('sqlite://')
+    with engine.connect() as conn:
+        conn.execute("CREATE TABLE t (s TEXT, i INTEGER, f FLOAT, d DATE, b BOOLEAN)")
+        conn.execute("INSERT INTO t VALUES ('ab', 1, 1.5, '2020-01-01', 1), ('abcd', 3, 2.25, '2021-06-30', 0), "
+                     "(NULL, NULL, NULL, NULL, NULL)")
+    return engine
+
+
+def test_fingerprint(engine):
+    table = DbSchema.from_alchemy_engine(None, engine).table('t')
+    assert table.fingerprint(engine) == {
+        's': {'null_count': '1', 'not_null_count': 2, 'sum_length': '6', 'max_length': '4', 'min_length': '2'},
+        'i': {'null_count': '1', 'not_null_count': 2, 'sum': '4', 'max': '3', 'min': '1'},
+        'f': {'null_count': '1', 'not_null_count': 2, 'sum': '3.75', 'max': '2.25', 'min': '1.5'},
+        'd': {'null_count': '1', 'not_null_count': 2, 'max': '2021-06-30', 'min': '2020-01-01'},
+        'b': {'null_count': '1', 'not_null_count': 2},
+    }
+
+
+def test_sampled_fingerprint(engine):
+    table = DbSchema.from_alchemy_engine(None, engine).table('t')
+    fingerprint = table.fingerprint(engine, sample_rows=1)
+    assert fingerprint['i'] == {'null_count': '0', 'not_null_count': 1, 'sum': '1', 'max': '1', 'min': '1'}
+    with pytest.raises(DbTableFingerprintException):
+        table.fingerprint(engine, sample_percent=10)
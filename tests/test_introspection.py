@@ -0,0 +1,31 @@
+import sqlalchemy
+
+from dbd.db.db_introspection import description_to_columns, sql_result_columns
+
+
+def test_postgres_description():
+    description = [('id', 23, None, 4, None, None, None),
+                   ('name', 1043, None, 50, None, None, None),
+                   ('amount', 1700, None, 65535, 10, 2, None),
+                   ('created', 1114, None, 8, None, None, None)]
+    columns = description_to_columns('postgresql', description)
+    assert [c.name for c in columns] == ['id', 'name', 'amount', 'created']
+    assert [str(c.type) for c in columns] == ['INTEGER', 'VARCHAR(50)', 'NUMERIC(10, 2)', 'TIMESTAMP']
+
+
+def test_snowflake_description():
+    description = [('ID', 0, None, None, 38, 0, True), ('PRICE', 0, None, None, 12, 4, True),
+                   ('NAME', 2, None, 16777216, None, None, True), ('FLAG', 13, None, None, None, None, True)]
+    columns = description_to_columns('snowflake', description)
+    assert [str(c.type) for c in columns] == ['INTEGER', 'NUMERIC(12, 4)', 'TEXT', 'BOOLEAN']
+
+
+def test_unsupported_description():
+    # unknown type code (e.g. Postgres JSON) falls back to the temporary view introspection
+    assert description_to_columns('postgresql', [('doc', 114, None, None, None, None, None)]) is None
+    assert description_to_columns('sqlite', [('id', None, None, None, None, None, None)]) is None
+
+
+def test_sqlite_introspection():
+    engine = sqlalchemy.create_engine('sqlite://')
+    assert sql_result_columns("SELECT 1 AS a", engine) is None
@@ -1,12 +1,24 @@
 import glob
 import os
 import shutil
+import subprocess
+import sys
+import tempfile
+from timeit import default_timer as timer
+
+import pandas as pd
 
 from dbd.config.dbd_profile import DbdProfile
 from dbd.config.dbd_project import DbdProject
 from dbd.executors.model_executor import ModelExecutor
+from dbd.tasks.data_task import DataTask
+from dbd.tasks.task import Task
 from dbd.utils.io_utils import download_file
 from dbd.utils.profiling_utils import profile_method
+from dbd.utils.sql_parser import SqlParser
+
+# wall-clock assertions fail at random on loaded machines, they are checked only if DBD_BENCHMARK_TIMING is set
+TIMING_ASSERTIONS = os.environ.get('DBD_BENCHMARK_TIMING') is not None
 
 
 def download_all_ref_files(project):
@@ -58,3 +70,135 @@ def test_all():
             print(f"{engine.dialect.name}: {counts}")
     print(all_counts)
     print("Executing performance test disabled for now.")
+
+
+def test_coercion_benchmark(monkeypatch):
+    rows = 500000
+    bools = pd.Series(['true', 'False', 'yes', 'n', '1', None] * (rows // 6), dtype=object)
+    strings = pd.Series(['Prague', '', None, 'Brno', 'Ostrava', ''] * (rows // 6), dtype=object)
+    dates = pd.Series(['2021-03-01', '2021-12-31', None] * (rows // 3), dtype=object)
+
+    start = timer()
+    per_cell_bools = bools.map(lambda x: SqlParser.parse_bool(x)).astype('boolean')
+    per_cell_strings = strings.map(lambda x: SqlParser.parse_string(x)).astype('object')
+    per_cell_dates = pd.to_datetime(dates)
+    per_cell_time = timer() - start
+
+    per_cell_calls = []
+    for method_name in ['parse_bool', 'parse_string']:
+        method = getattr(SqlParser, method_name)
+        monkeypatch.setattr(SqlParser, method_name,
+                            lambda x, m=method, n=method_name: per_cell_calls.append(n) or m(x))
+    start = timer()
+    vectorized_bools = SqlParser.parse_bool_series(bools)
+    vectorized_strings = SqlParser.parse_string_series(strings)
+    vectorized_dates = SqlParser.parse_datetime_series(dates, '%Y-%m-%d')
+    vectorized_time = timer() - start
+    monkeypatch.undo()
+
+    print(f"Per cell coercion took {per_cell_time} seconds, vectorized coercion took {vectorized_time} seconds "
+          f"({per_cell_time / vectorized_time:.1f}x speedup).")
+    assert per_cell_bools.equals(vectorized_bools)
+    assert per_cell_strings.equals(vectorized_strings)
+    assert per_cell_dates.equals(vectorized_dates)
+    # the vectorized coercion doesn't fall back to the per cell parsing
+    assert per_cell_calls == []
+    if TIMING_ASSERTIONS:
+        assert vectorized_time < per_cell_time
+
+
+def synthetic_tasks(tasks_count):
+    tasks = []
+    for i in range(tasks_count):
+        # every table references the previous table and the table in the middle of the model
+        foreign_keys = sorted({f"t{j}.id" for j in [i - 1, i // 2] if 0 <= j < i})
+        column = dict(type='INTEGER', foreign_keys=foreign_keys) if foreign_keys else dict(type='INTEGER')
+        tasks.append(DataTask.from_code(dict(runtime=dict(table=f"t{i}", schema=None),
+                                             table=dict(columns=dict(id=column)))))
+    return tasks
+
+
+def test_planning_benchmark(monkeypatch):
+    profile = DbdProfile.load('./tests/fixtures/capabilities/dbd.profile')
+    # task attribute lookups during the planning, they grow linearly with the number of tasks
+    lookups = dict(count=0)
+
+    def counted(method):
+        def counted_method(*args, **kwargs):
+            lookups['count'] += 1
+            return method(*args, **kwargs)
+        return counted_method
+
+    for method_name in ['task_id', 'target', 'fully_qualified_target']:
+        monkeypatch.setattr(Task, method_name, counted(getattr(Task, method_name)))
+    lookups_per_task = []
+    for tasks_count in [1000, 10000, 50000]:
+        tasks = synthetic_tasks(tasks_count)
+        with tempfile.TemporaryDirectory() as project_dir:
+            os.mkdir(os.path.join(project_dir, 'model'))
+            project = DbdProject(profile, os.path.join(project_dir, 'dbd.project'), dict(model='model'))
+
+            model = ModelExecutor(project)
+            model.add_tasks(tasks)
+            lookups['count'] = 0
+            start = timer()
+            ordered_tasks = model.plan()
+            plan_time = timer() - start
+            lookups_per_task.append(lookups['count'] / tasks_count)
+            assert len(ordered_tasks) == tasks_count
+            positions = {t.task_id(): i for i, t in enumerate(ordered_tasks)}
+            # dependencies are at the end of the list
+            assert positions['*.t1'] > positions['*.t2']
+
+            model = ModelExecutor(project)
+            model.add_tasks(tasks)
+            start = timer()
+            filtered_tasks = model.plan([f"t{tasks_count - 1}"])
+            filter_time = timer() - start
+            assert len(filtered_tasks) == 3
+
+        print(f"Planning {tasks_count} tasks took {plan_time} seconds, filtering took {filter_time} seconds.")
+        if TIMING_ASSERTIONS:
+            # the planning is linear, it must not take more than a few milliseconds per task
+            assert plan_time < tasks_count * 0.002
+    # the planning is linear, the number of lookups per task doesn't grow with the model size
+    assert max(lookups_per_task) <= min(lookups_per_task) * 1.1
+
+
+# warehouse driver stacks that must be loaded only when the active dialect needs them
+STARTUP_FORBIDDEN_MODULES = ['snowflake', 's3fs', 'sqlalchemy_bigquery', 'google.cloud', 'kaggle', 'boto3']
+
+
+def cli_import_times(args):
+    """
+    Runs dbd CLI with python -X importtime and returns the cumulative import times of the top level imports
+    """
+    script = "import sys; from click.testing import CliRunner; from dbd.cli.dbdcli import cli; " \
+             "CliRunner().invoke(cli, sys.argv[1:])"
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script] + args, capture_output=True, text=True,
+                            env=env)
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:'):
+            _, cumulative, module = line.split('|')
+            if cumulative.strip().isdigit():
+                # nested imports are indented
+                import_times[module.rstrip()] = int(cumulative)
+    return import_times
+
+
+def test_startup_benchmark():
+    for args, budget_ms in [(['--version'], 1000),
+                            (['--profile', 'tests/fixtures/capabilities/dbd.profile', 'validate',
+                              'tests/fixtures/capabilities/basic'], 2500)]:
+        import_times = cli_import_times(args)
+        modules = [m.strip() for m in import_times.keys()]
+        for forbidden_module in STARTUP_FORBIDDEN_MODULES:
+            assert not any(m == forbidden_module or m.startswith(f"{forbidden_module}.") for m in modules), \
+                f"'dbd {' '.join(args)}' imports '{forbidden_module}'"
+        total_ms = sum(t for m, t in import_times.items() if not m.startswith('  ')) / 1000
+        print(f"Imports of 'dbd {' '.join(args)}' took {total_ms} ms.")
+        if TIMING_ASSERTIONS:
+            assert total_ms < budget_ms
+    assert 'pandas' not in [m.strip() for m in cli_import_times(['--version']).keys()]
@@ -14,3 +14,11 @@ def test_profile_connection_engines():
     assert str(basic_engine.url) == profile.db_connections().get('basic').get('db.url')
     data_formats_engine = profile.alchemy_engine_from_profile('data_formats')
     assert str(data_formats_engine.url) == profile.db_connections().get('data_formats').get('db.url')
+
+
+def test_profile_connection_pool():
+    profile = DbdProfile('dbd.profile', dict(databases=dict(
+        memory=dict({'db.url': 'sqlite://', 'db.pool_pre_ping': 'false'}),
+        pinged=dict({'db.url': 'sqlite://', 'db.pool_pre_ping': 'true'}))))
+    assert not profile.alchemy_engine_from_profile('memory').pool._pre_ping
+    assert profile.alchemy_engine_from_profile('pinged').pool._pre_ping
@@ -0,0 +1,58 @@
+import struct
+from math import nan
+
+import pandas as pd
+from sqlalchemy import TEXT, INT, FLOAT, BOOLEAN, DATE, TIMESTAMP, NUMERIC
+
+from dbd.utils.psql_copy import PsqlCopyStream, PSQL_BINARY_COPY_HEADER, PSQL_BINARY_COPY_TRAILER
+
+
+def data_frames():
+    return [
+        pd.DataFrame({'name': ['a', None], 'n': [1, 2], 'x': [1.5, nan]}),
+        pd.DataFrame({'x': [3.0], 'n': [3], 'name': ['c,d']}),
+    ]
+
+
+def read_all(stream, size):
+    data = []
+    chunk = stream.read(size)
+    while len(chunk) > 0:
+        data.append(chunk)
+        chunk = stream.read(size)
+    return data
+
+
+def test_csv_stream():
+    stream = PsqlCopyStream(iter(data_frames()), ['name', 'n', 'x'])
+    assert stream.copy_options() == 'WITH CSV'
+    assert ''.join(read_all(stream, 4)) == 'a,1,1.5\n,2,\n"c,d",3,3.0\n'
+
+
+def test_binary_stream():
+    stream = PsqlCopyStream(iter(data_frames()), ['name', 'n', 'x'], [TEXT(), INT(), FLOAT()])
+    assert stream.copy_options() == 'WITH (FORMAT binary)'
+    data = b''.join(read_all(stream, 5))
+    assert data.startswith(PSQL_BINARY_COPY_HEADER)
+    assert data.endswith(PSQL_BINARY_COPY_TRAILER)
+    body = data[len(PSQL_BINARY_COPY_HEADER):-len(PSQL_BINARY_COPY_TRAILER)]
+    row = struct.pack('!h', 3) + struct.pack('!i', 1) + b'a' + struct.pack('!ii', 4, 1) + \
+        struct.pack('!id', 8, 1.5)
+    row += struct.pack('!h', 3) + struct.pack('!i', -1) + struct.pack('!ii', 4, 2) + struct.pack('!i', -1)
+    row += struct.pack('!h', 3) + struct.pack('!i', 3) + b'c,d' + struct.pack('!ii', 4, 3) + \
+        struct.pack('!id', 8, 3.0)
+    assert body == row
+
+
+def test_binary_dates():
+    df = pd.DataFrame({'d': pd.to_datetime(['2000-01-02']), 't': pd.to_datetime(['2000-01-01 00:00:01']),
+                       'b': [True]})
+    stream = PsqlCopyStream(iter([df]), ['d', 't', 'b'], [DATE(), TIMESTAMP(), BOOLEAN()])
+    body = stream.read()[len(PSQL_BINARY_COPY_HEADER):-len(PSQL_BINARY_COPY_TRAILER)]
+    assert body == struct.pack('!h', 3) + struct.pack('!ii', 4, 1) + struct.pack('!iq', 8, 1000000) + \
+        struct.pack('!i', 1) + b'\x01'
+
+
+def test_binary_supported_types():
+    assert PsqlCopyStream.binary_format_supported([TEXT(), INT(), FLOAT(), BOOLEAN(), DATE(), TIMESTAMP()])
+    assert not PsqlCopyStream.binary_format_supported([TEXT(), NUMERIC(10, 2)])
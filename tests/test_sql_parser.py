@@ -1,3 +1,7 @@
+from math import nan
+
+import pandas as pd
+
 from dbd.utils.sql_parser import SqlParser, SQlParserException
 
 
@@ -39,6 +43,29 @@ def test_datatype_parser():
     assert str(SqlParser.parse_alchemy_data_type("TIMESTAMP")) == "TIMESTAMP"
     assert str(SqlParser.parse_alchemy_data_type("DATE")) == "DATE"
     assert str(SqlParser.parse_alchemy_data_type("TEXT")) == "TEXT"
+    assert str(SqlParser.parse_alchemy_data_type("NUMERIC(10, 0)")) == "NUMERIC(10)"
+    assert str(SqlParser.parse_alchemy_data_type("TIMESTAMP WITH TIME ZONE")) == "TIMESTAMP"
+    assert str(SqlParser.parse_alchemy_data_type("JSONB")) == "JSONB"
+    # the parsing is cached, but every call returns a new type instance
+    assert SqlParser.parse_alchemy_data_type("VARCHAR(20)") is not SqlParser.parse_alchemy_data_type("VARCHAR(20)")
+    for unsupported_type in ["UNKNOWN", "varchar(20)", "(20)"]:
+        try:
+            SqlParser.parse_alchemy_data_type(unsupported_type)
+            assert False
+        except SQlParserException:
+            assert True
+
+
+def test_series_parser():
+    bools = pd.Series(['true', 'Yes', 'no', '', None, nan, 'T', '0', '1'])
+    assert SqlParser.parse_bool_series(bools).equals(bools.map(lambda x: SqlParser.parse_bool(x)).astype('boolean'))
+    assert list(SqlParser.parse_bool_int_series(bools).fillna(-1)) == [1, 1, 0, 0, -1, -1, 1, 0, 1]
+    assert list(SqlParser.parse_bool_series(pd.Series([2, 0, nan])).fillna(False)) == [True, False, False]
+    strings = pd.Series(['a', '', None, nan, 'b'])
+    assert SqlParser.parse_string_series(strings).equals(strings.map(lambda x: SqlParser.parse_string(x)))
+    dates = SqlParser.parse_datetime_series(pd.Series(['31.12.2021', None]), '%d.%m.%Y')
+    assert dates[0] == pd.Timestamp(2021, 12, 31)
+    assert pd.isna(dates[1])
 
 
 def test_remove_comments():